@@ -0,0 +1,59 @@
+"""
+hand-off cost of a message to another process: fix.binary to_buffer /
+from_buffer against pickle and against bytes() / Message.parse, for a
+flat new order and a security list with nested groups
+
+    python -m benchmarks.bench_binary [n]
+"""
+import pickle
+import sys
+import timeit
+
+import fix
+from fix.binary import to_buffer, from_buffer
+
+ORDER = (b'8=FIX.4.2\x019=0\x0135=D\x0134=43\x0149=Client2\x01'
+         b'52=20170725-09:29:51.624\x0156=EMS\x011=JPM\x01'
+         b'11=HKG-12-QA.00:00:00:00\x0121=1\x0138=80\x0140=7\x0144=80\x01'
+         b'54=1\x0155=5\x0159=0\x0160=20170725-09:29:51\x01115=ABC\x01'
+         b'47=A\x01528=A\x0110=140\x01')
+
+
+def security_list(n_entries=20):
+    body = b'35=y\x0134=5\x0149=OMS\x0156=Client\x01320=req1\x01146=' + \
+        str(n_entries).encode() + b'\x01' + b''.join(
+            b'55=%d\x0148=%d\x01107=MAIN\x01167=CS\x01'
+            b'1206=1\x011207=1\x011208=100\x011206=2\x011207=2\x01' % (i, i)
+            for i in range(n_entries)) + b'893=Y\x01'
+    header = b'8=FIX.4.2\x019=' + str(len(body)).encode() + b'\x01'
+    checksum = str(sum(header + body) % 256).zfill(3).encode()
+    return header + body + b'10=' + checksum + b'\x01'
+
+
+def run(name, raw, group_struct, n):
+    msg = fix.Message.parse(raw, group_struct, validation='none',
+                            reset_id_time=False, reset_ht=False)
+    buf, pickled = to_buffer(msg), pickle.dumps(msg)
+    cases = [
+        ('fix.binary', lambda: to_buffer(msg),
+         lambda: from_buffer(buf, msgtype_cls=fix.Message), len(buf)),
+        ('pickle', lambda: pickle.dumps(msg), lambda: pickle.loads(pickled),
+         len(pickled)),
+        ('raw fix', lambda: bytes(msg),
+         lambda: fix.Message.parse(raw, group_struct, validation='none',
+                                   reset_id_time=False, reset_ht=False),
+         len(raw)),
+    ]
+    print(name)
+    for label, encode, decode, size in cases:
+        enc = timeit.timeit(encode, number=n) / n * 1e6
+        dec = timeit.timeit(decode, number=n) / n * 1e6
+        print('  {:10} {:6d} bytes  encode {:8.2f} us  decode {:8.2f} us'
+              .format(label, size, enc, dec))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    run('new order', ORDER, None, n)
+    run('security list, 20 entries', security_list(),
+        fix.SecurityListMessage.GROUP_STRUCT, n // 10)
@@ -0,0 +1,66 @@
+"""
+serialization cost of NewOrderSingles: bytes() per message against
+build_into() of a batch into one reused buffer, and FixClient.send() per
+message against send_batch() over a loopback transport
+
+    python -m benchmarks.bench_build_into [n] [batch]
+"""
+import configparser
+import logging
+import os
+import sys
+import timeit
+from collections import OrderedDict
+
+import fix
+from fixclient import FixClient
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+FIELDS = OrderedDict([(49, b'Client'), (56, b'OMS'), (34, b'2'),
+                      (38, b'100'), (40, b'2'), (44, b'10'), (54, b'1'),
+                      (55, b'5'), (59, b'0')])
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    msgs = [fix.NewOrderMessage(fix.Group(OrderedDict(FIELDS)),
+                                validation='none') for _ in range(batch)]
+    buf = bytearray()
+
+    def to_bytes():
+        return b''.join([bytes(m) for m in msgs])
+
+    def into_buffer():
+        del buf[:]
+        offset = 0
+        for m in msgs:
+            offset += m.build_into(buf, offset)
+        return offset
+
+    assert into_buffer() == len(to_bytes())
+
+    config = configparser.ConfigParser()
+    config.read(CONFIG)
+    config['default']['TrafficLog'] = ''
+    client_end, acceptor_end = loopback_pair()
+    # nothing reads the other end, drop what is sent
+    acceptor_end.handler = lambda data: None
+    cli = FixClient(config, transport=client_end, log_level=logging.WARNING)
+    cli.connect()
+
+    def send():
+        for m in msgs:
+            cli.send(m)
+
+    def send_batch():
+        cli.send_batch(msgs)
+
+    rounds = max(1, n // batch)
+    for label, f in (('bytes()', to_bytes), ('build_into()', into_buffer),
+                     ('send()', send), ('send_batch()', send_batch)):
+        print('{:14} {:8.2f} us/msg'.format(
+            label, timeit.timeit(f, number=rounds) / (rounds * batch) * 1e6))
+    cli.close()
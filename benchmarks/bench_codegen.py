@@ -0,0 +1,44 @@
+"""
+build and parse cost of a NewOrderSingle: the generic NewOrderMessage
+against the slot backed class fix.codegen generates from it, both writing
+the same bytes
+
+    python -m benchmarks.bench_codegen [n]
+"""
+import sys
+import timeit
+from collections import OrderedDict
+
+import fix
+from fix.codegen import SlotNewOrderMessage
+
+FIELDS = OrderedDict([(49, b'Client'), (56, b'OMS'), (34, b'2'),
+                      (38, b'100'), (40, b'2'), (44, b'10'), (54, b'1'),
+                      (55, b'5'), (59, b'0')])
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    raw = bytes(fix.NewOrderMessage(fix.Group(OrderedDict(FIELDS))))
+    assert bytes(SlotNewOrderMessage.parse(raw)) == raw
+
+    def build_generic():
+        return bytes(fix.NewOrderMessage(fix.Group(OrderedDict(FIELDS)),
+                                         validation='none'))
+
+    def build_slot():
+        return bytes(SlotNewOrderMessage(FIELDS))
+
+    def parse_generic():
+        return fix.NewOrderMessage.parse(raw, received=True,
+                                         validation='none')[44]
+
+    def parse_slot():
+        return SlotNewOrderMessage.parse(raw).px
+
+    for label, f in (('generic build', build_generic),
+                     ('generated build', build_slot),
+                     ('generic parse', parse_generic),
+                     ('generated parse', parse_slot)):
+        print('{:16} {:8.2f} us/msg'.format(
+            label, timeit.timeit(f, number=n) / n * 1e6))
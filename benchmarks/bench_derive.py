@@ -0,0 +1,33 @@
+"""
+cost of an amend of a live order: derive_amend() against building the
+35=G from its fields as FixClient.new_msg() does, both validated and
+serialized
+
+    python -m benchmarks.bench_derive [n]
+"""
+import sys
+import timeit
+from collections import OrderedDict
+
+import fix
+
+FIELDS = [(49, b'Client'), (56, b'OMS'), (34, b'2'), (38, b'100'),
+          (40, b'2'), (44, b'10'), (54, b'1'), (55, b'5'), (59, b'0')]
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    order = fix.NewOrderMessage(fix.Group(OrderedDict(FIELDS)))
+    bytes(order)
+
+    def rebuild():
+        g = fix.Group(OrderedDict(FIELDS + [(44, b'10.5'), (41, order[11])]))
+        return bytes(fix.AmendOrderMessage(g))
+
+    def derive():
+        return bytes(order.derive_amend(px=b'10.5', seqnum=3))
+
+    for label, f in (('rebuild', rebuild), ('derive_amend', derive)):
+        t = timeit.timeit(f, number=n) / n
+        print('{:14} {:8.2f} us/amend {:10.0f} amends/s'.format(
+            label, t * 1e6, 1 / t))
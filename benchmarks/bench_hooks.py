@@ -0,0 +1,34 @@
+"""
+cost of the fix.hooks points on bytes() of a NewOrderSingle: nothing
+registered, TimingHook and TraceRing
+
+    python -m benchmarks.bench_hooks [n]
+"""
+import sys
+import timeit
+from collections import OrderedDict
+
+import fix
+from fix.hooks import HOOKS, TimingHook, TraceRing
+
+FIELDS = OrderedDict([(49, b'Client'), (56, b'OMS'), (34, b'2'),
+                      (38, b'100'), (40, b'2'), (44, b'10'), (54, b'1'),
+                      (55, b'5'), (59, b'0')])
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    msg = fix.NewOrderMessage(fix.Group(OrderedDict(FIELDS)))
+    group = msg._initialized_group
+
+    def build():
+        return group.build(validation=fix.ValidationLevel.NONE)
+
+    for label, hook in (('no hook', None), ('TimingHook', TimingHook()),
+                        ('TraceRing', TraceRing())):
+        HOOKS.clear()
+        if hook is not None:
+            HOOKS.register(hook)
+        print('{:12} {:8.2f} us/build'.format(
+            label, timeit.timeit(build, number=n) / n * 1e6))
+    HOOKS.clear()
@@ -0,0 +1,64 @@
+"""
+finding the order chain of one ClOrdID in a large traffic.log: a full scan
+with iter_traffic_log and a prefilter against fixclient.logindex (time to
+build the index once, then per query)
+
+    python -m benchmarks.bench_logindex [orders] [workers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from fix.prefilter import Tag
+from fixclient.acceptor import frame_message
+from fixclient.journal import TRAFFIC_LOG_PREFIXES, iter_traffic_log
+from fixclient.logindex import LogIndex
+
+
+def write_log(path, n_orders):
+    out, inb = (TRAFFIC_LOG_PREFIXES[d].encode() for d in (0, 1))
+    seq = 1
+    with open(path, 'wb') as f:
+        for i in range(n_orders):
+            clordid = b'ORD%08d' % i
+            body = [(49, b'Client'), (56, b'OMS'),
+                    (52, b'20240102-09:%02d:%02d.000' % (i // 6000 % 60,
+                                                         i // 100 % 60)),
+                    (38, b'100'), (40, b'2'), (44, b'10'), (54, b'1'),
+                    (55, b'5'), (59, b'0')]
+            f.write(out + frame_message(
+                [(35, b'D'), (34, b'%d' % seq), (11, clordid), *body]) + b'\n')
+            f.write(inb + frame_message(
+                [(35, b'8'), (34, b'%d' % seq), (37, b'%d' % i),
+                 (11, clordid), (17, b'E%d' % i), (39, b'0'), (150, b'0'),
+                 *body]) + b'\n')
+            seq += 1
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    target = b'ORD%08d' % (n // 2)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log = os.path.join(tmpdir, 'traffic.log')
+        write_log(log, n)
+        print('{} messages, {:.0f} MB'.format(
+            2 * n, os.path.getsize(log) / 2 ** 20))
+
+        t = time.perf_counter()
+        found = list(iter_traffic_log(log, Tag(11) == target))
+        print('  scan with prefilter  {:10.1f} ms'.format(
+            (time.perf_counter() - t) * 1e3))
+
+        with LogIndex(os.path.join(tmpdir, 'index.db')) as index:
+            t = time.perf_counter()
+            index.update([log], workers=workers, chunk_size=8 << 20)
+            print('  build index          {:10.1f} ms'.format(
+                (time.perf_counter() - t) * 1e3))
+            t = time.perf_counter()
+            chain = [raw for _, raw in index.messages(
+                index.order_chain(target))]
+            print('  order_chain          {:10.1f} ms'.format(
+                (time.perf_counter() - t) * 1e3))
+            assert chain == [m for _, _, m in found]
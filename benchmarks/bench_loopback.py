@@ -0,0 +1,50 @@
+"""
+CPU cost of the session and message layers: FixClient over an in-process
+loopback transport against SimulatedAcceptor, no kernel networking, with
+and without metrics
+
+    python -m benchmarks.bench_loopback [n_orders]
+"""
+import configparser
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import fix
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+
+
+def run(n_orders, metrics=False):
+    config = configparser.ConfigParser()
+    config.read(CONFIG)
+    config['default']['Metrics'] = '1' if metrics else '0'
+    client_end, acceptor_end = loopback_pair()
+    SimulatedAcceptor(acceptor_end)
+    order = {38: b'100', 40: b'2', 44: b'10', 54: b'1', 55: b'5', 59: b'0'}
+    with FixClient(config, transport=client_end,
+                   log_level=logging.WARNING) as cli:
+        t0 = time.perf_counter()
+        for _ in range(n_orders):
+            msg = cli.new_msg(fix.NewOrderMessage, order)
+            cli.send_msg(bytes(msg))
+            cli.parse_inbound(cli.recv_fix())
+        elapsed = time.perf_counter() - t0
+    print('{} orders in {:.3f}s: {:.1f} us/round trip, {:.0f} orders/s{}'
+          .format(n_orders, elapsed, elapsed / n_orders * 1e6,
+                  n_orders / elapsed, ' (metrics)' if metrics else ''))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    # the client appends to traffic.log in the working directory
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        run(n)
+        run(n, metrics=True)
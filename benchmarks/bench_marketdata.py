@@ -0,0 +1,61 @@
+"""
+cost of applying IncrementalRefresh (35=X) messages: MarketDataBooks.apply
+on the raw frame against Message.parse with the NoMDEntries structure, and
+the cost of a top of book read
+
+    python -m benchmarks.bench_marketdata [n]
+"""
+import random
+import sys
+import timeit
+
+import fix
+from fix.marketdata import MarketDataBooks, INCREMENTAL_GROUP_STRUCT
+from fixclient.acceptor import frame_message
+
+SYMBOLS = [b'SYM%d' % i for i in range(20)]
+
+
+def refreshes(n, n_entries=5, levels=50, seed=1):
+    rnd = random.Random(seed)
+    seqs = dict.fromkeys(SYMBOLS, 0)
+    out = []
+    for i in range(n):
+        fields = [(35, b'X'), (49, b'MD'), (56, b'C'), (34, str(i).encode()),
+                  (268, str(n_entries).encode())]
+        for _ in range(n_entries):
+            symbol = rnd.choice(SYMBOLS)
+            seqs[symbol] += 1
+            px = b'%d.%02d' % (100 + rnd.randrange(levels) // 4,
+                               rnd.randrange(4) * 25)
+            fields += [(279, rnd.choice((b'0', b'0', b'1', b'2'))),
+                       (269, rnd.choice((b'0', b'1'))), (55, symbol),
+                       (270, px), (271, str(rnd.randrange(1, 1000)).encode()),
+                       (83, str(seqs[symbol]).encode())]
+        out.append(frame_message(fields))
+    return out
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    msgs = refreshes(n)
+    books = MarketDataBooks()
+
+    def apply():
+        for raw in msgs:
+            books.apply(raw)
+
+    def parse():
+        for raw in msgs:
+            fix.Message.parse(raw, INCREMENTAL_GROUP_STRUCT,
+                              validate_construct=False, validation='none',
+                              received=True)
+
+    for label, f in (('MarketDataBooks.apply', apply),
+                     ('Message.parse', parse)):
+        print('{:22} {:8.2f} us/msg'.format(
+            label, timeit.timeit(f, number=1) / n * 1e6))
+    print('{:22} {:8.3f} us'.format('top()', timeit.timeit(
+        lambda: books.top(b'SYM0'), number=n) / n * 1e6))
+    print('levels per book: {}'.format(
+        sorted(len(books[s].bids) + len(books[s].offers) for s in books)))
@@ -0,0 +1,52 @@
+"""
+inbound throughput: parsing execution reports in this process against
+fixclient.pipeline.InboundPipeline spreading them over worker processes
+
+    python -m benchmarks.bench_pipeline [n_messages] [workers]
+"""
+import os
+import sys
+import time
+
+import fix
+from fixclient.acceptor import frame_message
+from fixclient.pipeline import InboundPipeline
+
+
+def handle(msg):
+    # stand-in for real drop copy handling
+    return None if msg[39] != b'8' else msg[11]
+
+
+def reports(n):
+    return [frame_message(
+        [(35, b'8'), (49, b'OMS'), (56, b'Client'), (34, str(i).encode()),
+         (37, str(i % 500).encode()), (11, 'c{}'.format(i % 500).encode()),
+         (17, str(i).encode()), (150, b'F'), (39, b'1'), (55, b'0005'),
+         (54, b'1'), (38, b'1000'), (32, b'100'), (31, b'80.25'),
+         (14, b'100'), (151, b'900'), (6, b'80.25')])
+        for i in range(1, n + 1)]
+
+
+def run(n, workers):
+    msgs = reports(n)
+    t0 = time.perf_counter()
+    for raw in msgs:
+        handle(fix.Message.parse(raw, validation='none', reset_id_time=False,
+                                 reset_ht=False))
+    inline = time.perf_counter() - t0
+    pipeline = InboundPipeline(handle, workers)
+    t0 = time.perf_counter()
+    for raw in msgs:
+        pipeline.feed(raw)
+    pipeline.close()
+    piped = time.perf_counter() - t0
+    print('{} msgs: inline {:.0f} msg/s, {} workers {:.0f} msg/s '
+          '({} cpus)'.format(n, n / inline, workers, n / piped,
+                             os.cpu_count()))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    run(n, workers)
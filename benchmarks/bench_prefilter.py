@@ -0,0 +1,73 @@
+"""
+finding the acks of one order in a busy session: Message.parse of every
+inbound ExecutionReport then a tag 11 comparison, as recv_linked_ack_*
+did, against a fix.prefilter predicate on the raw frame that only lets
+the matches through to Message.parse; also over a journal file with
+iter_capture(match=...)
+
+    python -m benchmarks.bench_prefilter [n] [share of matching reports]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+import fix
+from fix.prefilter import compile_predicate
+from fixclient.acceptor import frame_message
+from fixclient.journal import Journal, iter_capture, INBOUND
+
+
+def reports(n, share):
+    every = max(1, round(1 / share))
+    out = []
+    for i in range(n):
+        clordid = b'MINE' if i % every == 0 else b'ORD%08d' % i
+        out.append(frame_message([
+            (35, b'8'), (49, b'OMS'), (56, b'Client'),
+            (34, str(i + 1).encode()), (52, b'20240102-09:30:00.000'),
+            (37, b'%d' % i), (11, clordid), (17, b'E%d' % i), (20, b'0'),
+            (39, b'0'), (150, b'0'), (14, b'0'), (6, b'0'), (151, b'100'),
+            (38, b'100'), (40, b'2'), (44, b'10.5'), (54, b'1'),
+            (55, b'5'), (59, b'0'), (60, b'20240102-09:30:00.000')]))
+    return out
+
+
+def parse(raw):
+    return fix.Message.parse(raw, validation='none', received=True)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    msgs = reports(n, share)
+    match = compile_predicate('35 in {8,9} and 11 == $clordid',
+                              clordid=b'MINE')
+
+    def parse_all():
+        return [m for m in map(parse, msgs)
+                if m.get(35) in (b'8', b'9') and m.get(11) == b'MINE']
+
+    def prefiltered():
+        return [parse(raw) for raw in msgs if match(raw)]
+
+    assert len(parse_all()) == len(prefiltered())
+    print('{} reports, {} for the order'.format(n, len(prefiltered())))
+    for label, f in (('parse all', parse_all), ('prefilter', prefiltered)):
+        print('  {:12} {:8.2f} us/msg'.format(
+            label, timeit.timeit(f, number=1) / n * 1e6))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'journal')
+        journal = Journal(path)
+        for raw in msgs:
+            journal.write(INBOUND, raw)
+        journal.close()
+        for label, f in (
+                ('journal, parse all', lambda: [
+                    m for m in (parse(r) for _, _, r in iter_capture(path))
+                    if m.get(11) == b'MINE']),
+                ('journal, prefilter', lambda: [
+                    parse(r) for _, _, r in iter_capture(path, match)])):
+            print('  {:20} {:8.2f} us/msg'.format(
+                label, timeit.timeit(f, number=1) / n * 1e6))
@@ -0,0 +1,85 @@
+"""
+round trip latency of a 35=D and its ack over 127.0.0.1 TCP, default vs
+low_latency SocketProfile; the acceptor runs in a separate process
+
+    python -m benchmarks.bench_socket_profile [n_round_trips]
+"""
+import multiprocessing
+import socket
+import statistics
+import sys
+import time
+
+from fixclient.acceptor import SimulatedAcceptor, frame_message
+from fixclient.transport import SocketProfile, TcpTransport
+
+
+class _SocketEnd():
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.handler = None
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+
+def serve(server):
+    while True:
+        conn, _ = server.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        end = _SocketEnd(conn)
+        acceptor = SimulatedAcceptor(end)
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                break
+            acceptor.on_data(data)
+        conn.close()
+
+
+def recv_frame(transport):
+    buf = transport.recv(4096)
+    # 8=FIX.4.2\x019=<len>\x01 ... 10=xxx\x01
+    start = buf.find(b'\x019=') + 3
+    end = buf.find(b'\x01', start)
+    total = end + 1 + int(buf[start:end]) + 7
+    while len(buf) < total:
+        buf += transport.recv(total - len(buf))
+    return buf
+
+
+def measure(address, profile, n):
+    transport = TcpTransport(*address, profile=profile)
+    transport.connect()
+    order = frame_message([(35, b'D'), (49, b'C'), (56, b'OMS'),
+                           (34, b'1'), (11, b'c1'), (38, b'100'),
+                           (40, b'2'), (44, b'10'), (54, b'1'), (55, b'5')])
+    samples = []
+    for i in range(n + n // 10):
+        t0 = time.perf_counter_ns()
+        transport.sendall(order)
+        recv_frame(transport)
+        if i >= n // 10:  # warm up
+            samples.append(time.perf_counter_ns() - t0)
+    transport.close()
+    samples.sort()
+    return {'mean': statistics.fmean(samples) / 1e3,
+            'p50': samples[len(samples) // 2] / 1e3,
+            'p99': samples[int(len(samples) * .99)] / 1e3,
+            'max': samples[-1] / 1e3}
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    proc = multiprocessing.Process(target=serve, args=(server,), daemon=True)
+    proc.start()
+    for name, profile in (('default', SocketProfile()),
+                          ('low_latency', SocketProfile.low_latency())):
+        r = measure(server.getsockname(), profile, n)
+        print('{:12} mean {mean:8.1f}us  p50 {p50:8.1f}us  '
+              'p99 {p99:8.1f}us  max {max:9.1f}us'.format(name, **r))
+    proc.terminate()
@@ -1,5 +1,6 @@
 from fix.group import (
-    Group, RepeatedTagError, GroupStructure, is_intersecting_groups)
+    Group, RepeatedTagError, GroupStructure, is_intersecting_groups,
+    ValidationLevel, validation_level)
 from fix.message import (
     Message,
     MessageWithHeader,
@@ -12,4 +13,12 @@ from fix.message import (
     TestRequestMessage,
     SecurityListMessage,
     SecurityListRequestMessage)
-
+from fix.pool import MessagePool
+from fix.stream import iter_group_entries
+from fix.seclist import SecurityListAssembler
+from fix.orderstate import OrderState, OrderStateStore
+from fix.binary import to_buffer, from_buffer
+from fix.dispatch import Dispatcher
+from fix.prefilter import Tag, Predicate, compile_predicate
+from fix.codegen import generate_message_class
+from fix.hooks import HOOKS, TimingHook, TraceRing, ProfileWindow
@@ -0,0 +1,160 @@
+from array import array
+from collections import OrderedDict
+from itertools import accumulate, islice
+import struct
+
+from fix.group import Group, ValidationLevel
+
+# record layout:
+#   header  magic, version, flags, number of entries, length of the values
+#   tags    int16/int32 per entry, native byte order: tag > 0 is a field,
+#           -id_tag opens the next group of the list of id_tag in the
+#           current group, 0 closes it
+#   lengths uint16/uint32 per entry, 0 for group markers; left out when
+#           DELIMITED
+#   values  the field values, concatenated or, when DELIMITED, joined with
+#           SOH (no value contains one) so they are read back with a split
+MAGIC = b'FX'
+VERSION = 1
+HEADER = struct.Struct('<2sBBII')
+# flags
+WIDE_TAGS = 1
+WIDE_LENGTHS = 2
+DELIMITED = 4
+
+
+def _flatten(group, tags, values):
+    for t, v in group._d.items():
+        if isinstance(v, list):
+            for g in v:
+                tags.append(-t)
+                values.append(b'')
+                _flatten(g, tags, values)
+                tags.append(0)
+                values.append(b'')
+        else:
+            tags.append(t)
+            values.append(v)
+
+
+def _encode(obj):
+    group = getattr(obj, '_initialized_group', obj)
+    d = group._d
+    values = list(d.values())
+    if list in map(type, values):
+        tags, values = [], []
+        _flatten(group, tags, values)
+    else:
+        tags = list(d)
+    flags = 0
+    if tags and (max(tags) > 32767 or min(tags) < -32767):
+        flags |= WIDE_TAGS
+    data = b'\x01'.join(values)
+    if data.count(b'\x01') == len(values) - 1:
+        flags |= DELIMITED
+        lengths = b''
+    else:
+        # raw data fields holding SOH
+        data = b''.join(values)
+        lengths = list(map(len, values))
+        if max(lengths, default=0) > 65535:
+            flags |= WIDE_LENGTHS
+        lengths = array('I' if flags & WIDE_LENGTHS else 'H',
+                        lengths).tobytes()
+    return (HEADER.pack(MAGIC, VERSION, flags, len(tags), len(data)),
+            array('i' if flags & WIDE_TAGS else 'h', tags).tobytes(),
+            lengths, data)
+
+
+def to_buffer(obj, buffer=None, offset=0):
+    """
+    compact encoding of a Message or Group, for other processes to rebuild
+    with from_buffer() instead of unpickling or re-parsing it. Returns
+    bytes, or with buffer (bytearray, memoryview,
+    shared_memory.SharedMemory.buf ...) writes at offset and returns the
+    number of bytes written; ValueError when it does not fit
+    """
+    parts = _encode(obj)
+    if buffer is None:
+        return b''.join(parts)
+    size = sum(map(len, parts))
+    if offset + size > len(buffer):
+        raise ValueError('{} bytes do not fit at offset {} of a {} byte '
+                         'buffer'.format(size, offset, len(buffer)))
+    for part in parts:
+        buffer[offset:offset + len(part)] = part
+        offset += len(part)
+    return size
+
+
+def record_size(buffer, offset=0):
+    """ size of the encoded record at offset of buffer """
+    magic, version, flags, n, data_len = HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('no encoded message at offset {}'.format(offset))
+    size = HEADER.size + n * (4 if flags & WIDE_TAGS else 2) + data_len
+    if not flags & DELIMITED:
+        size += n * (4 if flags & WIDE_LENGTHS else 2)
+    return size
+
+
+def _unflatten(tags, values):
+    top = cur = Group(is_top_level=True)
+    d = cur._d
+    stack = []
+    for t, v in zip(tags, values):
+        if t > 0:
+            d[t] = v
+        elif t < 0:
+            g = Group()
+            groups = d.get(-t)
+            if groups is None:
+                groups = d[-t] = []
+            groups.append(g)
+            g._link(cur)
+            stack.append(cur)
+            cur = g
+            d = g._d
+        else:
+            cur = stack.pop()
+            d = cur._d
+    return top
+
+
+def from_buffer(buffer, offset=0, *, msgtype_cls=None, **msg_kwargs):
+    """
+    decode the record at offset of buffer into a msgtype_cls (e.g.
+    fix.Message) built without validation nor id/time/header resets unless
+    msg_kwargs say otherwise, or into the top level Group when msgtype_cls
+    is None. req_tags/req_cond are not encoded, msgtype_cls sets them again
+    """
+    magic, version, flags, n, data_len = HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('no encoded message at offset {}'.format(offset))
+    pos = offset + HEADER.size
+    tags = array('i' if flags & WIDE_TAGS else 'h')
+    end = pos + n * tags.itemsize
+    tags.frombytes(buffer[pos:end])
+    tags = tags.tolist()
+    if flags & DELIMITED:
+        # one copy out of the (shared) buffer and a split
+        values = bytes(buffer[end:end + data_len]).split(b'\x01')
+    else:
+        lengths = array('I' if flags & WIDE_LENGTHS else 'H')
+        pos, end = end, end + n * lengths.itemsize
+        lengths.frombytes(buffer[pos:end])
+        data = bytes(buffer[end:end + data_len])
+        offsets = list(accumulate(lengths, initial=0))
+        values = map(data.__getitem__,
+                     map(slice, offsets, islice(offsets, 1, None)))
+    if min(tags, default=0) < 0:
+        group = _unflatten(tags, values)
+    else:
+        group = Group(is_top_level=True)
+        group._d = OrderedDict(zip(tags, values))
+    if msgtype_cls is None:
+        return group
+    msg_kwargs.setdefault('validation', ValidationLevel.NONE)
+    msg_kwargs.setdefault('reset_id_time', False)
+    msg_kwargs.setdefault('reset_ht', False)
+    return msgtype_cls(group, **msg_kwargs)
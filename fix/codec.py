@@ -0,0 +1,179 @@
+import calendar
+import datetime as dt
+from decimal import Decimal
+
+from fix.util import peek_tag
+
+# tags decoded by default as prices, quantities and UTCTimestamps
+PRICE_TAGS = frozenset((6, 31, 44, 99, 132, 133, 140, 270))
+QTY_TAGS = frozenset((14, 32, 38, 110, 111, 151, 152, 271))
+TIMESTAMP_TAGS = frozenset((52, 60, 122, 126, 273))
+
+
+class DecimalCodec():
+
+    def __init__(self, cache_size=4096):
+        """
+        bytes <-> Decimal, exact where float(msg[tag]) is not; decoded values
+        are cached as the same prices and quantities keep coming back
+        """
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def decode(self, value: bytes):
+        d = self._cache.get(value)
+        if d is None:
+            d = Decimal(value.decode())
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[value] = d
+        return d
+
+    def encode(self, value):
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, int):
+            return str(value).encode()
+        if isinstance(value, float):
+            # shortest repr round trips, Decimal(float) would not
+            value = Decimal(repr(value))
+        elif not isinstance(value, Decimal):
+            value = Decimal(value)
+        return format(value, 'f').encode()
+
+
+class ScaledIntCodec():
+
+    def __init__(self, scale=8, cache_size=4096):
+        """
+        bytes <-> int of value * 10 ** scale, e.g. b'80.25' <-> 8025000000
+        for scale 8; digits beyond scale raise ValueError. Cached like
+        DecimalCodec
+        """
+        self.scale = scale
+        self.factor = 10 ** scale
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def decode(self, value: bytes):
+        n = self._cache.get(value)
+        if n is None:
+            n = self._decode(value)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[value] = n
+        return n
+
+    def _decode(self, value):
+        whole, _, frac = value.partition(b'.')
+        if len(frac) > self.scale:
+            if frac[self.scale:].strip(b'0'):
+                raise ValueError('{} has more than {} decimals'.format(
+                    value, self.scale))
+            frac = frac[:self.scale]
+        negative = whole.startswith(b'-')
+        n = int(whole or b'0') * self.factor
+        if frac:
+            f = int(frac) * 10 ** (self.scale - len(frac))
+            n = n - f if negative else n + f
+        return n
+
+    def encode(self, value: int):
+        if isinstance(value, bytes):
+            return value
+        sign = '-' if value < 0 else ''
+        whole, frac = divmod(abs(value), self.factor)
+        if not frac:
+            return (sign + str(whole)).encode()
+        return '{}{}.{}'.format(sign, whole, str(frac).zfill(
+            self.scale).rstrip('0')).encode()
+
+
+class TimestampCodec():
+
+    EPOCH = dt.date(1970, 1, 1)
+
+    def __init__(self, digits=3):
+        """
+        UTCTimestamp bytes (yyyymmdd-hh:mm:ss[.fff...]) <-> epoch ns; encode
+        writes digits fractional digits (0, 3, 6 or 9). The epoch of each
+        date is cached, the time of day is plain arithmetic
+        """
+        self.digits = digits
+        self._days = {}
+
+    def decode(self, value: bytes):
+        day = self._days.get(value[:8])
+        if day is None:
+            day = self._days[value[:8]] = calendar.timegm(
+                (int(value[:4]), int(value[4:6]), int(value[6:8]),
+                 0, 0, 0)) * 1000000000
+        secs = int(value[9:11]) * 3600 + int(value[12:14]) * 60 + \
+            int(value[15:17])
+        frac = value[18:27]
+        ns = int(frac) * 10 ** (9 - len(frac)) if frac else 0
+        return day + secs * 1000000000 + ns
+
+    def encode(self, value: int):
+        if isinstance(value, bytes):
+            return value
+        secs, ns = divmod(value, 1000000000)
+        days, secs = divmod(secs, 86400)
+        date = self.EPOCH + dt.timedelta(days=days)
+        hours, secs = divmod(secs, 3600)
+        minutes, secs = divmod(secs, 60)
+        out = '{:%Y%m%d}-{:02d}:{:02d}:{:02d}'.format(date, hours, minutes,
+                                                     secs)
+        if self.digits:
+            out += '.' + str(ns).zfill(9)[:self.digits]
+        return out.encode()
+
+
+_decimal = DecimalCodec()
+_timestamp = TimestampCodec()
+# tag -> codec, see codec_for()
+CODECS = {**{t: _decimal for t in PRICE_TAGS | QTY_TAGS},
+          **{t: _timestamp for t in TIMESTAMP_TAGS}}
+
+
+def codec_for(tag: int):
+    """ codec registered in CODECS for tag, None for plain bytes tags """
+    return CODECS.get(tag)
+
+
+def register(tag: int, codec):
+    """ decode/encode tag with codec, e.g. ScaledIntCodec(4) for 44 """
+    CODECS[tag] = codec
+
+
+def decode(tag: int, value: bytes):
+    codec = CODECS.get(tag)
+    return value if codec is None else codec.decode(value)
+
+
+def encode(tag: int, value):
+    codec = CODECS.get(tag)
+    if codec is None:
+        return value if isinstance(value, bytes) else str(value).encode()
+    return codec.encode(value)
+
+
+def decode_batch(msgs, tags, *, delim=b'\x01', default=None):
+    """
+    one tuple of decoded tags per message, codecs looked up once for the
+    batch; msgs are Message/mapping objects or raw messages, which are
+    peeked at without being parsed
+    """
+    codecs = [(t, str(t).encode(), CODECS.get(t)) for t in tags]
+    for msg in msgs:
+        row = []
+        for tag, btag, codec in codecs:
+            if isinstance(msg, (bytes, bytearray)):
+                value = peek_tag(msg, btag, delim=delim)
+            else:
+                value = msg.get(tag)
+            if value is None:
+                row.append(default)
+            else:
+                row.append(value if codec is None else codec.decode(value))
+        yield tuple(row)
@@ -0,0 +1,281 @@
+import collections.abc
+import keyword
+
+from fix.group import ValidationLevel, validation_level, write_into
+from fix.message import (
+    FIELD_NAMES,
+    Message,
+    NewOrderMessage,
+    AmendOrderMessage,
+    CancelOrderMessage)
+from fix.util import fix_time_now
+
+# field order of MessageWithHeader output when built from FixClient's
+# header_fill, the seqnum and body fields: 8, 9, 35, the default header,
+# SendingTime, the filled header tags, TransactTime and ClOrdID placeholders
+# then the rest of the body
+HEADER_LAYOUT = (8, 9, 35, 98, 108, 52, 49, 56, 115, 128, 50, 57, 34, 43, 97)
+BODY_LEAD = (60, 11)
+DEFAULT_HEADER = {8: b'FIX.4.2', 98: b'0', 108: b'20'}
+
+# body fields generated for the order messages besides their REQ_TAGS
+ORDER_FIELDS = (1, 15, 18, 21, 22, 44, 47, 48, 55, 58, 59, 99, 100, 110,
+                111, 126, 207, 528)
+
+
+def field_name(tag):
+    return FIELD_NAMES.get(tag, 'tag{}'.format(tag))
+
+
+class GeneratedMessage(collections.abc.MutableMapping):
+    """
+    base of the classes made by generate_message_class(): one slot per
+    field of a fixed layout and tags outside of it, in order, in _extra;
+    the mapping interface (msg[44], msg.get(11) ...) is kept for code
+    written against Message
+    """
+
+    __slots__ = ('_extra', 'validation')
+    MSGTYPE = b''
+    TAGS = ()
+    REQ_TAGS = frozenset()
+    REQ_COND = []
+    MESSAGE_CLS = Message
+    SOURCE = ''
+    # tag -> attribute name, of the generated subclass
+    _NAMES = {}
+
+    def __getitem__(self, tag):
+        name = self._NAMES.get(tag)
+        if name is not None:
+            value = getattr(self, name)
+            if value is not None:
+                return value
+        elif self._extra:
+            for t, v in self._extra:
+                if t == tag:
+                    return v
+        raise KeyError(tag)
+
+    def __setitem__(self, tag, value):
+        name = self._NAMES.get(tag)
+        if name is not None:
+            setattr(self, name, value)
+            return
+        if self._extra is None:
+            self._extra = []
+        for i, (t, _) in enumerate(self._extra):
+            if t == tag:
+                self._extra[i] = (tag, value)
+                return
+        self._extra.append((tag, value))
+
+    def __delitem__(self, tag):
+        name = self._NAMES.get(tag)
+        if name is not None:
+            if getattr(self, name) is None:
+                raise KeyError(tag)
+            setattr(self, name, None)
+            return
+        n = len(self._extra or ())
+        self._extra = [(t, v) for t, v in self._extra or () if t != tag]
+        if len(self._extra) == n:
+            raise KeyError(tag)
+
+    def __iter__(self):
+        names = self._NAMES
+        for tag in self.TAGS[:-1]:
+            if getattr(self, names[tag]) is not None:
+                yield tag
+        for tag, _ in self._extra or ():
+            yield tag
+        if self.checksum is not None:
+            yield 10
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def iter_tag_value(self):
+        for tag in self:
+            yield tag, self[tag]
+
+    def is_valid_semantics(self, level=ValidationLevel.FULL):
+        level = validation_level(level)
+        if level < ValidationLevel.FULL:
+            return True
+        return all(self.get(t) is not None for t in self.REQ_TAGS) and \
+            all(cond(self) for cond, _ in self.REQ_COND)
+
+    def reset(self, *, seqnum=None, clordid=True, transacttime=True,
+              sendingtime=True):
+        """ same new SendingTime, TransactTime and ClOrdID as Message """
+        if sendingtime:
+            self.sendingtime = fix_time_now()
+        if transacttime:
+            self.transacttime = fix_time_now()
+        if clordid:
+            self.clordid = str(Message.message_counter).encode() + \
+                b'-' + fix_time_now(us=True, fmt='%H%M%S.%f')
+            Message.message_counter += 1
+        if seqnum is not None:
+            self.seqnum = str(seqnum).encode()
+
+    def build_into(self, buf, offset=0):
+        """ write bytes(self) into buf at offset, see Group.build_into """
+        return write_into(buf, offset, bytes(self))
+
+    def to_message(self, **kwargs):
+        """ the MESSAGE_CLS equivalent, parsed from the wire bytes """
+        kwargs.setdefault('validation', ValidationLevel.NONE)
+        return self.MESSAGE_CLS.parse(bytes(self), received=True, **kwargs)
+
+    @classmethod
+    def from_message(cls, msg):
+        return cls.parse(bytes(msg), delim=msg.delim)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, dict(self))
+
+
+_TEMPLATE = '''
+class {name}(GeneratedMessage):
+
+    __slots__ = {slots!r}
+    MSGTYPE = {msgtype!r}
+    TAGS = {tags!r}
+    _NAMES = {names!r}
+
+    def __init__(self, fields=None, *, reset_id_time=True,
+                 validation=ValidationLevel.NONE):
+{init}
+        self._extra = None
+        self.validation = validation_level(validation)
+        if fields:
+            for tag, value in fields.items():
+                self[tag] = value
+        if reset_id_time:
+            self.reset()
+
+    @classmethod
+    def parse(cls, raw_msg, *, delim=b'\\x01'):
+        """ kept as received, tags outside of the layout go to _extra """
+        self = cls.__new__(cls)
+{parse_init}
+        self._extra = None
+        self.validation = ValidationLevel.NONE
+        setters = _SETTERS
+        extra = None
+        for field in raw_msg.split(delim):
+            tag, _, value = field.partition(b'=')
+            setter = setters.get(tag)
+            if setter is not None:
+                setter(self, value)
+            elif tag:
+                if extra is None:
+                    extra = self._extra = []
+                extra.append((int(tag), value))
+        return self
+
+    def _body(self):
+        # from MsgType to the last field, each followed by SOH
+        parts = [{msgtype_field!r}]
+        append = parts.append
+{body}
+        if self._extra:
+            parts += [b'%d=%s\\x01' % tv for tv in self._extra]
+        return b''.join(parts)
+
+    def __bytes__(self):
+        if self.validation and not self.is_valid_semantics(self.validation):
+            raise ValueError('missing required tags or invalid {name}')
+        body = self._body()
+        bodylen = str(len(body)).encode()
+        msg = b'8=' + self.beginstring + b'\\x019=' + bodylen + b'\\x01' + \\
+            body
+        checksum = b'%03d' % (sum(msg) % 256)
+        self.bodylen = bodylen
+        self.checksum = checksum
+        return msg + b'10=' + checksum + b'\\x01'
+'''
+
+
+def generate_source(name, msgtype: bytes, tags, *, defaults=None):
+    """
+    source of a GeneratedMessage subclass with a field per tag of tags,
+    written in that order by __bytes__ (8, 9 and 10 are always there)
+    """
+    tags = tuple(t for t in tags if t not in (8, 9, 10, 35))
+    tags = (8, 9, 35) + tags + (10,)
+    defaults = dict(DEFAULT_HEADER if defaults is None else defaults)
+    defaults[35] = msgtype
+    names = {t: field_name(t) for t in tags}
+    for n in names.values():
+        if keyword.iskeyword(n) or not n.isidentifier():
+            raise ValueError('invalid field name {!r}'.format(n))
+    init = '\n'.join('        self.{} = {!r}'.format(names[t], defaults.get(t))
+                     for t in tags)
+    parse_init = '\n'.join('        self.{} = None'.format(names[t])
+                           for t in tags)
+    body = []
+    for t in tags:
+        if t in (8, 9, 10, 35):
+            continue
+        body.append('        v = self.{}\n'
+                    '        if v is not None:\n'
+                    '            append(b\'{}=\' + v + b\'\\x01\')'.format(
+                        names[t], t))
+    return _TEMPLATE.format(
+        name=name, slots=tuple(names[t] for t in tags), msgtype=msgtype,
+        tags=tags, names=names, init=init, parse_init=parse_init,
+        msgtype_field=b'35=' + msgtype + b'\x01', body='\n'.join(body))
+
+
+def layout(msgtype_cls, fields=()):
+    """
+    fields of msgtype_cls in the order the generic path writes them: the
+    header, TransactTime, ClOrdID then REQ_TAGS and fields by tag
+    """
+    header = set(getattr(msgtype_cls, 'HEADER_TAGS', ()))
+    body = sorted((set(getattr(msgtype_cls, 'REQ_TAGS', ())) | set(fields))
+                  - header - set(BODY_LEAD))
+    return HEADER_LAYOUT + BODY_LEAD + tuple(body)
+
+
+def generate_message_class(msgtype_cls, fields=(), *, name=None,
+                           msgtype=None):
+    """
+    slot backed counterpart of a Message subclass (e.g. NewOrderMessage)
+    generated from its REQ_TAGS/REQ_COND and fields: attribute access to
+    the fields (msg.px, msg.tag9999), specialised parse and __bytes__
+    matching the wire output of msgtype_cls built from fields in layout()
+    order. Values are bytes, no codec is applied
+    """
+    if msgtype is None:
+        msgtype = msgtype_cls(validation='none', reset_id_time=False,
+                              reset_ht=False)[35]
+    name = name or 'Slot' + msgtype_cls.__name__
+    source = generate_source(name, msgtype, layout(msgtype_cls, fields))
+    namespace = {'GeneratedMessage': GeneratedMessage,
+                 'ValidationLevel': ValidationLevel,
+                 'validation_level': validation_level}
+    exec(compile(source, '<fix.codegen {}>'.format(name), 'exec'), namespace)
+    cls = namespace[name]
+    cls.SOURCE = source
+    cls.MESSAGE_CLS = msgtype_cls
+    # 9 and 10 are written by __bytes__
+    cls.REQ_TAGS = (frozenset(getattr(msgtype_cls, 'REQ_TAGS', ())) |
+                    frozenset(getattr(msgtype_cls, 'HEADER_REQ_TAGS', ()))) - \
+        frozenset((9, 10))
+    cls.REQ_COND = list(getattr(msgtype_cls, 'REQ_COND', []))
+    cls.__module__ = __name__
+    # raw tag -> slot setter used by parse
+    namespace['_SETTERS'] = {str(t).encode(): getattr(cls, n).__set__
+                             for t, n in cls._NAMES.items()}
+    return cls
+
+
+SlotNewOrderMessage = generate_message_class(NewOrderMessage, ORDER_FIELDS)
+SlotAmendOrderMessage = generate_message_class(AmendOrderMessage,
+                                               ORDER_FIELDS)
+SlotCancelOrderMessage = generate_message_class(
+    CancelOrderMessage, (1, 37, 38, 48, 22, 58, 100))
@@ -0,0 +1,184 @@
+import hashlib
+import math
+from collections import OrderedDict
+
+from fix.util import peek_tag
+
+
+class LRUWindow():
+
+    def __init__(self, size):
+        """
+        the last size keys added, each with a value, oldest dropped first
+        """
+        self.size = size
+        self._keys = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get(self, key, default=None):
+        return self._keys.get(key, default)
+
+    def add(self, key, value=None):
+        """
+        (key, value) dropped to make room, None when none was; the value of
+        a key already there is replaced
+        """
+        keys = self._keys
+        if key in keys:
+            keys.move_to_end(key)
+            keys[key] = value
+            return None
+        keys[key] = value
+        if len(keys) > self.size:
+            return keys.popitem(last=False)
+        return None
+
+
+class BloomFilter():
+
+    def __init__(self, capacity, error_rate=0.001):
+        """
+        set membership with false positives at about error_rate for up to
+        capacity keys in a fixed bit array; two generations of capacity
+        keys are kept, the older dropped when the newer is full, so that
+        the error rate holds however many keys go through
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.n_bits = max(8, int(-capacity * math.log(error_rate) /
+                                 math.log(2) ** 2))
+        # blake2b digests are 64 bytes at most
+        self.n_hashes = min(16, max(1, round(
+            self.n_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.n_bits + 7) // 8)
+        self._old = bytearray(len(self._bits))
+        self._added = 0
+
+    def __sizeof__(self):
+        return 2 * len(self._bits)
+
+    def _positions(self, key: bytes):
+        # one 32 bit slice of a single digest per hash
+        n = self.n_bits
+        return [h % n for h in memoryview(hashlib.blake2b(
+            key, digest_size=4 * self.n_hashes).digest()).cast('I')]
+
+    def __contains__(self, key: bytes):
+        positions = self._positions(key)
+        return any(all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+                   for bits in (self._bits, self._old))
+
+    def add(self, key: bytes):
+        if self._added >= self.capacity:
+            self._old, self._bits = self._bits, self._old
+            self._bits[:] = bytes(len(self._bits))
+            self._added = 0
+        bits = self._bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+        self._added += 1
+
+
+class DuplicateDetector():
+
+    def __init__(self, window=100000, *, bloom_capacity=0,
+                 bloom_error_rate=0.001, delim=b'\x01'):
+        """
+        remembers the (session, MsgSeqNum) and ExecID (17) of every message
+        seen and tells whether a PossDupFlag (43=Y) or PossResend (97=Y)
+        message was already seen, from the raw message and before anything
+        parses it. Memory is fixed: the keys of the last window messages
+        are kept exactly, and when bloom_capacity is set the keys dropped
+        from the window go to a BloomFilter, which wrongly reports a
+        duplicate at about bloom_error_rate.
+
+        Kept by FixClient across reconnects; share one between FixClients
+        of the same session with FixClient(dedup=...)
+        """
+        # one entry per message: its (session, MsgSeqNum) key holding its
+        # ExecID key, indexed back by _exec_ids
+        self.window = LRUWindow(window)
+        self._exec_ids = {}
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) \
+            if bloom_capacity else None
+        self.delim = delim
+        self.checked = 0
+        self.duplicates = 0
+
+    @classmethod
+    def from_config(cls, section, **kwargs):
+        """
+        DedupWindow: exact entries kept, 0 or unset turns detection off
+        DedupBloomCapacity, DedupBloomErrorRate: Bloom filter behind the
+            window, unset or 0 for none; returns None when off
+        """
+        window = int(section.get('DedupWindow', '') or 0)
+        if not window:
+            return None
+        return cls(
+            window,
+            bloom_capacity=int(section.get('DedupBloomCapacity', '') or 0),
+            bloom_error_rate=float(
+                section.get('DedupBloomErrorRate', '') or 0.001),
+            **kwargs)
+
+    def _keys(self, raw, session):
+        delim = self.delim
+        key = session + b'|' + peek_tag(raw, b'34', delim=delim, default=b'')
+        exec_id = peek_tag(raw, b'17', delim=delim)
+        return key, None if exec_id is None else b'17|' + exec_id
+
+    def _seen(self, key, exec_key):
+        if key in self.window or \
+                (exec_key is not None and exec_key in self._exec_ids):
+            return True
+        bloom = self.bloom
+        return bloom is not None and (
+            key in bloom or (exec_key is not None and exec_key in bloom))
+
+    def _remember(self, key, exec_key):
+        exec_ids = self._exec_ids
+        previous = self.window.get(key)
+        if previous is not None and previous != exec_key and \
+                exec_ids.get(previous) == key:
+            del exec_ids[previous]
+        if exec_key is not None:
+            exec_ids[exec_key] = key
+        dropped = self.window.add(key, exec_key)
+        if dropped is None:
+            return
+        key, exec_key = dropped
+        if exec_key is not None and exec_ids.get(exec_key) == key:
+            del exec_ids[exec_key]
+        # the Bloom filter only holds what left the window
+        if self.bloom is not None:
+            self.bloom.add(key)
+            if exec_key is not None:
+                self.bloom.add(exec_key)
+
+    def check(self, raw: bytes, session: bytes=b''):
+        """
+        True when raw is a possible duplicate (43=Y or 97=Y) already seen
+        on session, e.g. the TargetCompID/SenderCompID pair; its keys are
+        remembered either way
+        """
+        delim = self.delim
+        possible = delim + b'43=Y' + delim in raw or \
+            delim + b'97=Y' + delim in raw
+        key, exec_key = self._keys(raw, session)
+        duplicate = False
+        if possible:
+            self.checked += 1
+            duplicate = self._seen(key, exec_key)
+            self.duplicates += duplicate
+        self._remember(key, exec_key)
+        return duplicate
+
+    def stats(self):
+        return {'checked': self.checked, 'duplicates': self.duplicates,
+                'window': len(self.window)}
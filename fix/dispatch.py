@@ -0,0 +1,141 @@
+from fix.group import GroupStructure, ValidationLevel, validation_level
+from fix.marketdata import SNAPSHOT_GROUP_STRUCT, INCREMENTAL_GROUP_STRUCT
+from fix.message import (
+    Message,
+    LogonMessage,
+    LogoutMessage,
+    HeartBeatMessage,
+    TestRequestMessage,
+    NewOrderMessage,
+    AmendOrderMessage,
+    CancelOrderMessage,
+    SecurityListRequestMessage,
+    SecurityListMessage)
+from fix.util import peek_tag
+
+# MsgType -> (message class, GroupStructure) Dispatcher(defaults=True)
+# starts from
+DEFAULT_MSGTYPES = {
+    b'A': (LogonMessage, None),
+    b'5': (LogoutMessage, None),
+    b'0': (HeartBeatMessage, None),
+    b'1': (TestRequestMessage, None),
+    b'D': (NewOrderMessage, None),
+    b'G': (AmendOrderMessage, None),
+    b'F': (CancelOrderMessage, None),
+    b'x': (SecurityListRequestMessage, None),
+    b'y': (SecurityListMessage, SecurityListMessage.GROUP_STRUCT),
+    b'W': (Message, SNAPSHOT_GROUP_STRUCT),
+    b'X': (Message, INCREMENTAL_GROUP_STRUCT),
+}
+
+
+class MsgTypeEntry():
+
+    def __init__(self, msgtype_cls=Message, group_struct=None):
+        self.msgtype_cls = msgtype_cls
+        self.group_struct = group_struct
+        self.handlers = []
+
+    def __repr__(self):
+        return 'MsgTypeEntry({}, {}, {})'.format(
+            self.msgtype_cls.__name__, self.group_struct, self.handlers)
+
+
+class Dispatcher():
+
+    def __init__(self, *, default=None, defaults=True, delim=b'\x01',
+                 validation=ValidationLevel.NONE):
+        """
+        MsgType (35) -> message class, GroupStructure and handlers. The
+        MsgType is peeked at in the raw message so it is parsed (kept as
+        received, see Message.parse(received=True)) straight into its class
+        and structure, and only when something handles it.
+
+        default: handler for MsgTypes without handlers of their own, parsed
+            into their registered class or Message
+        defaults: start from the classes and structures of DEFAULT_MSGTYPES
+        validation: level inbound messages are parsed at
+        """
+        self.default = default
+        self.delim = delim
+        self.validation = validation_level(validation)
+        self._entries = {}
+        if defaults:
+            for msgtype, (cls, group_struct) in DEFAULT_MSGTYPES.items():
+                self.register(msgtype, cls, group_struct)
+
+    def register(self, msgtype: bytes, msgtype_cls: type=None,
+                 group_struct: GroupStructure=None, handler=None):
+        """
+        set the class and/or GroupStructure of msgtype and add handler(msg)
+        to its handlers; returns its MsgTypeEntry
+        """
+        if group_struct is not None and \
+                not group_struct.is_valid_construct():
+            raise ValueError(group_struct.error_msg)
+        entry = self._entries.get(msgtype)
+        if entry is None:
+            entry = self._entries[msgtype] = MsgTypeEntry()
+        if msgtype_cls is not None:
+            entry.msgtype_cls = msgtype_cls
+        if group_struct is not None:
+            entry.group_struct = group_struct
+        if handler is not None:
+            entry.handlers.append(handler)
+        return entry
+
+    def unregister(self, msgtype: bytes, handler=None):
+        """ drop handler, or the whole entry when handler is None """
+        if handler is None:
+            self._entries.pop(msgtype, None)
+        else:
+            self._entries[msgtype].handlers.remove(handler)
+
+    def on(self, *msgtypes):
+        """ decorator registering a handler for msgtypes """
+        def decorator(handler):
+            for msgtype in msgtypes:
+                self.register(msgtype, handler=handler)
+            return handler
+        return decorator
+
+    def __getitem__(self, msgtype):
+        return self._entries[msgtype]
+
+    def __contains__(self, msgtype):
+        return msgtype in self._entries
+
+    def parse(self, raw_msg: bytes, msgtype: bytes=None):
+        """ raw_msg parsed into the class and structure of its MsgType """
+        if msgtype is None:
+            msgtype = peek_tag(raw_msg, b'35', delim=self.delim)
+        entry = self._entries.get(msgtype)
+        if entry is None:
+            return Message.parse(raw_msg, delim=self.delim,
+                                 validation=self.validation, received=True)
+        # structures are checked once by register()
+        return entry.msgtype_cls.parse(
+            raw_msg, init_group=entry.group_struct, delim=self.delim,
+            validate_construct=False, validation=self.validation,
+            received=True)
+
+    def dispatch(self, raw_msg: bytes):
+        """
+        call the handlers of the MsgType of raw_msg, or the default one, with
+        the parsed message and return what the last one returned; None
+        without parsing when nothing handles it
+        """
+        msgtype = peek_tag(raw_msg, b'35', delim=self.delim)
+        entry = self._entries.get(msgtype)
+        if entry is not None and entry.handlers:
+            handlers = entry.handlers
+        elif self.default is not None:
+            handlers = (self.default,)
+        else:
+            return None
+        msg = self.parse(raw_msg, msgtype)
+        result = None
+        for handler in handlers:
+            result = handler(msg)
+        return result
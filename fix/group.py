@@ -2,6 +2,66 @@ from typing import List, FrozenSet, Union
 from itertools import combinations
 from collections import OrderedDict
 import collections
+import enum
+import weakref
+
+from fix.hooks import HOOKS
+
+
+class _TagPrefixes(dict):
+    """ tag -> b'<tag>=', filled on first use """
+
+    def __missing__(self, tag):
+        prefix = self[tag] = str(tag).encode() + b'='
+        return prefix
+
+
+TAG_PREFIXES = _TagPrefixes()
+
+
+def write_into(buf, offset, data):
+    """ copy data into buf at offset, see Group.build_into """
+    n = len(data)
+    if offset > len(buf):
+        raise ValueError('offset {} past the end of the buffer'.format(
+            offset))
+    if offset + n > len(buf) and not isinstance(buf, bytearray):
+        raise ValueError('buffer too small: {} bytes needed at {}'.format(
+            n, offset))
+    buf[offset:offset + n] = data
+    return n
+
+
+class ValidationLevel(enum.IntEnum):
+    """
+    NONE: no checks at all (trusted input)
+    STRUCTURAL: int tags, bytes values, well formed inner groups
+    FULL: STRUCTURAL plus required tags, req_cond and, for messages,
+        header/trailer consistency
+    """
+    NONE = 0
+    STRUCTURAL = 1
+    FULL = 2
+
+
+def validation_level(value) -> ValidationLevel:
+    """
+    coerce a bool (legacy validate_semantics flags), an int or a
+    case-insensitive name (as read from the ini) to a ValidationLevel
+    """
+    if isinstance(value, ValidationLevel):
+        return value
+    if isinstance(value, bool):
+        return ValidationLevel.FULL if value else ValidationLevel.NONE
+    if isinstance(value, int):
+        return ValidationLevel(value)
+    if isinstance(value, str):
+        try:
+            return ValidationLevel[value.strip().upper()]
+        except KeyError:
+            raise ValueError(
+                'unknown validation level: "{}"'.format(value)) from None
+    raise TypeError('cannot convert {!r} to ValidationLevel'.format(value))
 
 
 class RepeatedTagError(ValueError):
@@ -31,13 +91,27 @@ class Group(collections.abc.MutableMapping):
             (<lambda as a boolean condition to check; take an argument
             which self will be passed in>, error message);
             used to do extra semantic check
+
+        validity is cached per ValidationLevel and dropped whenever the group
+        (or an inner group reached through it) is mutated through the
+        mapping interface; mutating a list of inner groups in place bypasses
+        this, use add_inner_group or item assignment instead
         """
         self._d = OrderedDict()
+        # ValidationLevel (or 'cond' for Message.is_valid_cond) -> bool
+        self._validity = {}
+        # id -> weakref of the enclosing groups, an inner group can be in
+        # more than one (e.g. after merge() or when shared); set when they
+        # take self in or validate it
+        self._parents = None
+        self._selfref = None
         if iter_init is not None:
             if isinstance(iter_init, list):
                 self.update((x, None) for x in iter_init)
             elif isinstance(iter_init, dict):
                 self._d.update(iter_init)
+                for v in self._d.values():
+                    self._link_inner(v)
             else:
                 raise TypeError('iter init is not dict or list')
 
@@ -46,14 +120,82 @@ class Group(collections.abc.MutableMapping):
         self.is_top_level = is_top_level
         self.error_msg = ''
 
+    def __getstate__(self):
+        # cached validity and parent links do not survive copy/pickle
+        state = self.__dict__.copy()
+        state['_validity'] = {}
+        state['_parents'] = None
+        state['_selfref'] = None
+        return state
+
+    def _share(self):
+        """
+        new Group over a copy of the field mapping of self: the (immutable)
+        values are shared, inner groups are _share()d too so that editing
+        them leaves self as it is
+        """
+        g = Group.__new__(Group)
+        g.__dict__.update(self.__getstate__())
+        d = g._d = self._d.copy()
+        g.req_cond = list(self.req_cond)
+        g.error_msg = ''
+        for k, v in d.items():
+            if isinstance(v, list):
+                inner = d[k] = [x._share() for x in v]
+                for x in inner:
+                    x._link(g)
+        return g
+
+    def _invalidate(self):
+        todo = [self]
+        seen = set()
+        while todo:
+            g = todo.pop()
+            if id(g) in seen:
+                continue
+            seen.add(id(g))
+            if g._validity:
+                g._validity.clear()
+            if g._parents:
+                for ref in list(g._parents.values()):
+                    p = ref()
+                    if p is not None:
+                        todo.append(p)
+
+    def _link(self, parent):
+        ref = parent._selfref
+        if ref is None:
+            ref = parent._selfref = weakref.ref(parent)
+        parents = self._parents
+        if parents is None:
+            self._parents = {id(parent): ref}
+        elif parents.get(id(parent)) is not ref:
+            parents[id(parent)] = ref
+
+    def _link_inner(self, value):
+        if isinstance(value, list):
+            for g in value:
+                if isinstance(g, Group):
+                    g._link(self)
+
     def __setitem__(self, key, item):
         if isinstance(key, tuple):
             x = self._d
+            owner = self
             for i in key[:-1]:
                 x = x[i]
+                if isinstance(x, Group):
+                    owner = x
             x[key[-1]] = item
+            if isinstance(item, Group):
+                item._link(owner)
+            else:
+                owner._link_inner(item)
         else:
             self._d[key] = item
+            self._link_inner(item)
+        if self._validity or self._parents:
+            self._invalidate()
 
     def __getitem__(self, key):
         if isinstance(key, tuple):
@@ -72,6 +214,8 @@ class Group(collections.abc.MutableMapping):
             del x[key[-1]]
         else:
             del self._d[key]
+        if self._validity or self._parents:
+            self._invalidate()
 
     def __iter__(self):
         return iter(self._d)
@@ -81,84 +225,179 @@ class Group(collections.abc.MutableMapping):
 
     def move_to_end(self, *args, **kwargs):
         self._d.move_to_end(*args, **kwargs)
+        if self._validity:
+            # ordering only matters for Message.is_valid_cond
+            self._validity.pop('cond', None)
 
     def merge(self, group):  # group: Group
+        # __setitem__ links the inner groups to self
         self.update(group.items())
         self.req_tags |= group.req_tags
         self.req_cond += group.req_cond
+        self._invalidate()
 
     def add_inner_group(self, group):
         if self.get(group.id_tag, None) is None:
             self[group.id_tag] = [group]
         elif isinstance(self[group.id_tag], list):
             self[group.id_tag].append(group)
+            self._invalidate()
         else:
             raise ValueError(
                 'group id tag\'s value not a list (of groups) or None')
+        group._link(self)
         self.move_to_end(group.id_tag)
 
     @property
     def id_tag(self):
         return next(iter(self))
 
-    def is_valid_semantics(self):
-        self.error_msg = ''
+    def is_valid_semantics(self, level=ValidationLevel.FULL):
+        if not level:
+            return True
+        cached = self._validity.get(level)
+        if cached is None:
+            hook = HOOKS.validate
+            cached = self._validity[level] = self._check(level) \
+                if hook is None else hook.call(self, self._check, level)
+            if cached:
+                self.error_msg = ''
+        if not cached:
+            self.error_msg = self._describe_errors(level)
+        return cached
+
+    def _check(self, level):
+        # fast path, no error message formatting
+        d = self._d
+        if not d:
+            return False
+        for t, v in d.items():
+            if not isinstance(t, int):
+                return False
+            if isinstance(v, bytes):
+                continue
+            if not isinstance(v, list):
+                return False
+            for g in v:
+                if not isinstance(g, Group) or not g or g.id_tag != t:
+                    return False
+                g._link(self)
+                if not g.is_valid_semantics(level):
+                    return False
+        if level >= ValidationLevel.FULL:
+            for t in self.req_tags:
+                if t not in d:
+                    return False
+            for f, _ in self.req_cond:
+                if not f(self):
+                    return False
+        return True
+
+    def _describe_errors(self, level):
         is_empty = not self
         invalid_value_type_tags = [t for t, v in self.items() if not (
             isinstance(v, bytes) or (isinstance(v, list) and all(
                 isinstance(g, Group) for g in v)))]
         invalid_group_tags = [t for t, v in self.items() if isinstance(
-            v, list) and not all(
-                g.id_tag == t for g in v)]
+            v, list) and all(isinstance(g, Group) for g in v) and not all(
+                g and g.id_tag == t for g in v)]
         non_int_tags = [k for k in self if not isinstance(k, int)]
-        missing_required_tags = tuple(
-            t for t in set(self.req_tags) if t not in self)
+        missing_required_tags = ()
+        failed_req_cond = []
+        if level >= ValidationLevel.FULL:
+            missing_required_tags = tuple(
+                t for t in set(self.req_tags) if t not in self)
+            if not missing_required_tags:
+                failed_req_cond = [y for f, y in self.req_cond if not f(self)]
         recur_invalid_groups = []
         if not invalid_value_type_tags:
             recur_invalid_groups += [g for t, v in self.items()
                                      if isinstance(v, list) for g in v
-                                     if not g.is_valid_semantics()]
-        all_req_cond_pass = all(f(self) for f, _ in self.req_cond)
-        check_bool = not any((
-            invalid_value_type_tags, non_int_tags, invalid_group_tags,
-            recur_invalid_groups, missing_required_tags)) and not is_empty \
-            and all_req_cond_pass
-
-        if not check_bool:
-            errors = []
-            if is_empty:
-                errors.append('{}: empty group'.format(self))
-            if invalid_value_type_tags:
-                errors.append('{}: invalid type for value of tags {}'.format(
-                    self, invalid_value_type_tags))
-            if non_int_tags:
-                errors.append('{}: non int tags {}'.format(
-                    self, non_int_tags))
-            if invalid_group_tags:
-                errors.append(
-                    '{}: tag {} has group without the same id tag'.format(
-                        self, invalid_group_tags))
-            if missing_required_tags:
-                errors.append('{}: missing required tags {}'.format(
-                    self, missing_required_tags))
-            if recur_invalid_groups:
-                errors.extend([g.error_msg for g in recur_invalid_groups])
-            if not all_req_cond_pass:
-                errors += [y for f, y in self.req_cond if not f(self)]
-
-            self.error_msg = ', '.join(errors)
-        return check_bool
+                                     if not g.is_valid_semantics(level)]
+
+        errors = []
+        if is_empty:
+            errors.append('{}: empty group'.format(self))
+        if invalid_value_type_tags:
+            errors.append('{}: invalid type for value of tags {}'.format(
+                self, invalid_value_type_tags))
+        if non_int_tags:
+            errors.append('{}: non int tags {}'.format(
+                self, non_int_tags))
+        if invalid_group_tags:
+            errors.append(
+                '{}: tag {} has group without the same id tag'.format(
+                    self, invalid_group_tags))
+        if missing_required_tags:
+            errors.append('{}: missing required tags {}'.format(
+                self, missing_required_tags))
+        if recur_invalid_groups:
+            errors.extend([g.error_msg for g in recur_invalid_groups])
+        errors += failed_req_cond
+        return ', '.join(errors)
 
     def __repr__(self):
         return 'GRP' + str(list(self._d.items()))
 
-    def build(self, *, delim=b'\x01'):
-        if not self.is_valid_semantics():
+    def build(self, *, delim=b'\x01', validation=ValidationLevel.FULL):
+        # inner groups are covered by the recursive check, build them
+        # without validating again
+        if validation and not self.is_valid_semantics(validation):
+            raise ValueError(self.error_msg)
+        hook = HOOKS.build
+        if hook is not None:
+            return hook.call(self, self._build, delim)
+        return self._build(delim)
+
+    def _build(self, delim):
+        return b''.join(self._parts([], delim))
+
+    def _parts(self, parts, delim):
+        # flat list of the <tag>=<value><delim> fields of self and its
+        # inner groups, joined once by the caller
+        prefixes = TAG_PREFIXES
+        for k, v in self._d.items():
+            if isinstance(v, list):
+                for x in v:
+                    x._parts(parts, delim)
+            else:
+                parts.append(prefixes[k] + v + delim)
+        return parts
+
+    def _write(self, buf, delim):
+        # fields appended one by one to the bytearray: no per field bytes
+        # object, no list to join and no copy of the joined message
+        prefixes = TAG_PREFIXES
+        for k, v in self._d.items():
+            if isinstance(v, list):
+                for x in v:
+                    x._write(buf, delim)
+            else:
+                buf += prefixes[k]
+                buf += v
+                buf += delim
+
+    def _build_into(self, buf, offset, delim):
+        if offset == len(buf) and isinstance(buf, bytearray):
+            self._write(buf, delim)
+            return len(buf) - offset
+        return write_into(buf, offset, self._build(delim))
+
+    def build_into(self, buf, offset=0, *, delim=b'\x01',
+                   validation=ValidationLevel.FULL):
+        """
+        write what build() returns into buf (a bytearray, which grows as
+        needed, or a writable memoryview large enough) at offset; returns
+        the number of bytes written. Appending to a bytearray (offset at
+        its end) writes the fields straight into it, cheaper than build();
+        elsewhere the built message is copied in
+        """
+        if validation and not self.is_valid_semantics(validation):
             raise ValueError(self.error_msg)
-        return b''.join([(b''.join([x.build(delim=delim) for x in v])
-                          if isinstance(v, list)
-                          else (str(k).encode() + b'=' + v) + delim)
-                         for k, v in self.items()])
+        hook = HOOKS.build
+        if hook is not None:
+            return hook.call(self, self._build_into, buf, offset, delim)
+        return self._build_into(buf, offset, delim)
 
     def iter_tag_value(self):
         for t, v in self.items():
@@ -0,0 +1,274 @@
+import collections
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+
+POINTS = ('parse', 'build', 'validate', 'send', 'receive', 'log')
+
+
+class HookPoint():
+
+    __slots__ = ('name', 'hooks')
+
+    def __init__(self, name, hooks):
+        """
+        the hooks registered on one point, never mutated: Hooks replaces
+        the whole HookPoint when one is added or removed
+        """
+        self.name = name
+        self.hooks = hooks
+
+    def call(self, subject, func, *args, **kwargs):
+        """
+        func(*args, **kwargs) between hook.before(name, subject) and
+        hook.after(name, token, result) of every hook; after() also runs,
+        with a None result, when func raises
+        """
+        name = self.name
+        hooks = self.hooks
+        tokens = [hook.before(name, subject) for hook in hooks]
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            for hook, token in zip(hooks, tokens):
+                hook.after(name, token, result)
+
+
+class Hooks():
+
+    def __init__(self):
+        """
+        one attribute per point of POINTS, None while nothing is registered
+        on it so that the instrumented code only pays for that check:
+
+            hook = HOOKS.build
+            if hook is not None:
+                return hook.call(self, self._build, delim)
+            return self._build(delim)
+
+        subjects: parse the raw message (result the Message), build and
+        validate the Group (result the bytes and the validity), send the
+        bytes written, receive None (result the raw message), log the raw
+        message
+        """
+        for point in POINTS:
+            setattr(self, point, None)
+        self._lock = threading.Lock()
+
+    def _points(self, points):
+        points = POINTS if points is None else points
+        for point in points:
+            if point not in POINTS:
+                raise ValueError('unknown hook point "{}"'.format(point))
+        return points
+
+    def register(self, hook, points=None):
+        """
+        hook: object with before(point, subject), returning a token, and
+        after(point, token, result) methods; points: all by default
+        """
+        with self._lock:
+            for point in self._points(points):
+                current = getattr(self, point)
+                hooks = () if current is None else current.hooks
+                if hook not in hooks:
+                    setattr(self, point, HookPoint(point, hooks + (hook,)))
+        return hook
+
+    def unregister(self, hook, points=None):
+        with self._lock:
+            for point in self._points(points):
+                current = getattr(self, point)
+                if current is None:
+                    continue
+                hooks = tuple(h for h in current.hooks if h is not hook)
+                setattr(self, point,
+                        HookPoint(point, hooks) if hooks else None)
+
+    def clear(self):
+        with self._lock:
+            for point in POINTS:
+                setattr(self, point, None)
+
+
+# the hook points of fix and fixclient
+HOOKS = Hooks()
+
+
+def describe(subject):
+    """ (MsgType, length) of a raw message or Message, None if unknown """
+    if isinstance(subject, (bytes, bytearray)):
+        msgtype = None
+        start = subject.find(b'\x0135=')
+        if start >= 0:
+            end = subject.find(b'\x01', start + 4)
+            msgtype = bytes(subject[start + 4:end if end >= 0 else None])
+        return msgtype, len(subject)
+    if isinstance(subject, memoryview):
+        return None, subject.nbytes
+    get = getattr(subject, 'get', None)
+    if get is not None:
+        return get(35), None
+    return None, None
+
+
+class TimingHook():
+
+    def __init__(self, *, clock=time.perf_counter_ns):
+        """ count, total and max ns spent per point """
+        self.clock = clock
+        self._stats = {}
+
+    def before(self, point, subject):
+        return self.clock()
+
+    def after(self, point, token, result):
+        elapsed = self.clock() - token
+        stats = self._stats.get(point)
+        if stats is None:
+            stats = self._stats[point] = [0, 0, 0]
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+    def stats(self):
+        """ {point: {'count', 'total_ns', 'avg_ns', 'max_ns'}} """
+        return {point: {'count': count, 'total_ns': total,
+                        'avg_ns': total / count if count else 0.,
+                        'max_ns': max_ns}
+                for point, (count, total, max_ns) in self._stats.items()}
+
+    def reset(self):
+        self._stats = {}
+
+
+TraceEntry = collections.namedtuple(
+    'TraceEntry', 'point start_ns elapsed_ns msgtype length thread')
+
+
+class TraceRing():
+
+    def __init__(self, size=4096, *, clock=time.perf_counter_ns):
+        """
+        the last size hooked calls as TraceEntry, with the MsgType and
+        length of the message handled when known
+        """
+        self.clock = clock
+        self.ring = collections.deque(maxlen=size)
+
+    def before(self, point, subject):
+        return self.clock(), subject
+
+    def after(self, point, token, result):
+        now = self.clock()
+        start, subject = token
+        msgtype, length = describe(subject if subject is not None
+                                   else result)
+        self.ring.append(TraceEntry(point, start, now - start, msgtype,
+                                    length, threading.get_ident()))
+
+    def __iter__(self):
+        return iter(list(self.ring))
+
+    def __len__(self):
+        return len(self.ring)
+
+    def slowest(self, n=10):
+        return sorted(self.ring, key=lambda e: e.elapsed_ns,
+                      reverse=True)[:n]
+
+    def clear(self):
+        self.ring.clear()
+
+
+class ProfileWindow():
+
+    def __init__(self, *, profile=True, trace_malloc=False, seconds=None,
+                 points=None, hooks=HOOKS):
+        """
+        cProfile of the hooked calls (profiling only runs inside them)
+        and/or tracemalloc from start() to stop(), or for seconds once
+        started; for the thread doing the calls, the profiler is not
+        shared between threads
+        """
+        self.profile = profile
+        self.trace_malloc = trace_malloc
+        self.seconds = seconds
+        self.points = points
+        self.hooks = hooks
+        self.profiler = None
+        self.snapshot = None
+        self.active = False
+        self._deadline = None
+        self._depth = 0
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.active:
+            return self
+        self.profiler = cProfile.Profile() if self.profile else None
+        self.snapshot = None
+        self._depth = 0
+        if self.trace_malloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._deadline = None if self.seconds is None else \
+            time.monotonic() + self.seconds
+        self.active = True
+        self.hooks.register(self, self.points)
+        return self
+
+    def stop(self):
+        if not self.active:
+            return self
+        self.active = False
+        self.hooks.unregister(self, self.points)
+        if self.profiler is not None and self._depth:
+            self.profiler.disable()
+        self._depth = 0
+        if self.trace_malloc and tracemalloc.is_tracing():
+            self.snapshot = tracemalloc.take_snapshot()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        return self
+
+    def before(self, point, subject):
+        if self.profiler is not None and self.active:
+            if not self._depth:
+                self.profiler.enable()
+            self._depth += 1
+        return None
+
+    def after(self, point, token, result):
+        if self.profiler is not None and self._depth:
+            self._depth -= 1
+            if not self._depth:
+                self.profiler.disable()
+        if self._deadline is not None and not self._depth and \
+                time.monotonic() >= self._deadline:
+            self.stop()
+
+    def stats(self):
+        """ pstats.Stats of the window, None when not profiled """
+        if self.profiler is None:
+            return None
+        return pstats.Stats(self.profiler)
+
+    def report(self, limit=20, sort='cumulative'):
+        """ text of the top functions and allocation sites """
+        out = io.StringIO()
+        stats = self.stats()
+        if stats is not None and stats.total_calls:
+            stats.stream = out
+            stats.sort_stats(sort).print_stats(limit)
+        if self.snapshot is not None:
+            for stat in self.snapshot.statistics('lineno')[:limit]:
+                out.write(str(stat) + '\n')
+        return out.getvalue()
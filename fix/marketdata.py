@@ -0,0 +1,282 @@
+from array import array
+from bisect import bisect_left
+
+from fix.codec import ScaledIntCodec
+from fix.group import GroupStructure
+
+# NoMDEntries (268) entries, for Message.parse of W and X
+SNAPSHOT_GROUP_STRUCT = GroupStructure(
+    {269: GroupStructure([269, 270, 15, 271, 272, 273, 274, 275, 276, 277,
+                          282, 283, 284, 286, 290, 346, 58, 83])})
+INCREMENTAL_GROUP_STRUCT = GroupStructure(
+    {279: GroupStructure([279, 285, 269, 278, 280, 55, 65, 48, 22, 270, 15,
+                          271, 272, 273, 274, 275, 276, 277, 282, 283, 284,
+                          286, 290, 346, 58, 83])})
+
+BID = b'0'
+OFFER = b'1'
+DELETE = b'2'
+
+
+class BookSide():
+
+    __slots__ = ('keys', 'sizes', 'sign')
+
+    def __init__(self, sign):
+        """
+        price levels of one side as two parallel arrays sorted best last:
+        sign -1 for bids, 1 for offers, keys are -price * sign so that the
+        last index is the best level on both sides. Levels are located by
+        bisect (O(log n)); a new or deleted level is an array insert/delete,
+        a memmove of the levels behind it, that is of the few between it
+        and the top of the book where most updates happen. For the depths
+        books have this beats a tree or heap of Python objects, which is
+        why there is none here
+        """
+        self.keys = array('q')
+        self.sizes = array('q')
+        self.sign = sign
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set(self, price: int, size: int):
+        key = -price * self.sign
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            self.sizes[i] = size
+        else:
+            keys.insert(i, key)
+            self.sizes.insert(i, size)
+
+    def delete(self, price: int):
+        key = -price * self.sign
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+            del self.sizes[i]
+
+    def clear(self):
+        del self.keys[:]
+        del self.sizes[:]
+
+    def best(self):
+        """ (price, size) of the best level, None when empty """
+        if not self.keys:
+            return None
+        return -self.keys[-1] * self.sign, self.sizes[-1]
+
+    def price_at(self, position: int):
+        """ price of the level at position, 1 being the best, or None """
+        if 0 < position <= len(self.keys):
+            return -self.keys[-position] * self.sign
+        return None
+
+    def levels(self, depth=None):
+        """ [(price, size), ...] best first """
+        sign = -self.sign
+        start = None if depth is None else -depth - 1
+        return [(k * sign, s) for k, s in
+                zip(self.keys[:start:-1], self.sizes[:start:-1])]
+
+
+class OrderBook():
+
+    def __init__(self, symbol: bytes):
+        """
+        price level book of one symbol; prices and sizes are the scaled
+        ints of the MarketDataBooks codecs. seq is the last RptSeq (83)
+        applied and stale is set by a gap until the next snapshot
+        """
+        self.symbol = symbol
+        self.bids = BookSide(-1)
+        self.offers = BookSide(1)
+        self.seq = None
+        self.stale = False
+        self.updates = 0
+        # MDEntryID (278) -> price of the level it was set on, for deletes
+        # that only carry the id
+        self.entry_ids = {}
+
+    def clear(self):
+        self.bids.clear()
+        self.offers.clear()
+        self.entry_ids.clear()
+
+    def top(self):
+        """ (bid px, bid size, offer px, offer size), None for empty sides """
+        bid = self.bids.best() or (None, None)
+        offer = self.offers.best() or (None, None)
+        return bid + offer
+
+    def __repr__(self):
+        return 'OrderBook({}, top={}, seq={}{})'.format(
+            self.symbol, self.top(), self.seq, ', stale' if self.stale else '')
+
+
+class MarketDataBooks():
+
+    def __init__(self, *, price_scale=8, size_scale=4, on_gap=None,
+                 delim=b'\x01'):
+        """
+        per symbol OrderBooks fed straight from raw MarketDataSnapshot (W)
+        and IncrementalRefresh (X) frames, without building a Group tree;
+        a book is keyed by the Symbol (55) or, without one, the SecurityID
+        (48) of the message or entry
+
+        price_scale/size_scale: MDEntryPx (270) and MDEntrySize (271) are
+            kept as ints of value * 10 ** scale, see price_codec/size_codec
+        on_gap(book, expected, received): called when the RptSeq (83) of a
+            symbol skips; the book stays stale until its next snapshot
+        """
+        self.price_codec = ScaledIntCodec(price_scale)
+        self.size_codec = ScaledIntCodec(size_scale)
+        self.on_gap = on_gap
+        self.delim = delim
+        self.books = {}
+        # (symbol, expected, received) of every gap seen
+        self.gaps = []
+        # snapshots and entries skipped as they could not be applied
+        self.malformed = 0
+
+    def __getitem__(self, symbol):
+        return self.books[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self.books
+
+    def __iter__(self):
+        return iter(self.books)
+
+    def book(self, symbol):
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+        return book
+
+    def top(self, symbol):
+        book = self.books.get(symbol)
+        return None if book is None else book.top()
+
+    def tops(self):
+        """ symbol -> top() of every book """
+        return {s: b.top() for s, b in self.books.items()}
+
+    def _split(self, raw):
+        # top level fields before NoMDEntries (268), then one dict per
+        # entry: an entry starts at each repeat of its first tag
+        top = {}
+        entries = []
+        entry = None
+        first = None
+        for field in raw.split(self.delim):
+            tag, _, value = field.partition(b'=')
+            if entry is None:
+                if tag == b'268':
+                    entry = {}
+                else:
+                    top[tag] = value
+                continue
+            if tag == b'10' or not tag:
+                break
+            if first is None:
+                first = tag
+            elif tag == first:
+                entries.append(entry)
+                entry = {}
+            entry[tag] = value
+        if entry:
+            entries.append(entry)
+        return top, entries
+
+    def _gap(self, book, expected, received):
+        book.stale = True
+        self.gaps.append((book.symbol, expected, received))
+        if self.on_gap is not None:
+            self.on_gap(book, expected, received)
+
+    def _set(self, book, entry):
+        side = entry.get(b'269')
+        if side == BID:
+            side = book.bids
+        elif side == OFFER:
+            side = book.offers
+        else:
+            # trades, statistics... are not book levels
+            return
+        entry_id = entry.get(b'278')
+        delete = entry.get(b'279') == DELETE
+        try:
+            px = entry.get(b'270')
+            if px is not None:
+                price = self.price_codec.decode(px)
+            elif not delete:
+                raise ValueError('no MDEntryPx')
+            elif entry_id is not None and entry_id in book.entry_ids:
+                price = book.entry_ids[entry_id]
+            else:
+                # by MDEntryPositionNo (290), 1 being the best level
+                price = side.price_at(int(entry.get(b'290', b'0')))
+                if price is None:
+                    raise ValueError('level to delete not found')
+            size = entry.get(b'271')
+            size = None if size is None else self.size_codec.decode(size)
+        except (ValueError, ArithmeticError):
+            self.malformed += 1
+            return
+        if delete or not size:
+            side.delete(price)
+            if entry_id is not None:
+                book.entry_ids.pop(entry_id, None)
+        else:
+            side.set(price, size)
+            if entry_id is not None:
+                book.entry_ids[entry_id] = price
+        book.updates += 1
+
+    def apply(self, raw: bytes):
+        """
+        apply a raw W or X message; returns the books it touched, other
+        MsgTypes touch none
+        """
+        top, entries = self._split(raw)
+        msgtype = top.get(b'35')
+        if msgtype == b'W':
+            symbol = top.get(b'55', top.get(b'48'))
+            if symbol is None:
+                self.malformed += 1
+                return []
+            book = self.book(symbol)
+            book.clear()
+            seq = top.get(b'83')
+            book.seq = int(seq) if seq is not None else None
+            book.stale = False
+            for entry in entries:
+                self._set(book, entry)
+            return [book]
+        if msgtype != b'X':
+            return []
+        touched = []
+        default = top.get(b'55', top.get(b'48'))
+        for entry in entries:
+            symbol = entry.get(b'55', entry.get(b'48', default))
+            if symbol is None:
+                self.malformed += 1
+                continue
+            book = self.book(symbol)
+            seq = entry.get(b'83')
+            if seq is not None:
+                seq = int(seq)
+                if book.seq is not None:
+                    if seq <= book.seq:
+                        # already applied, e.g. resent
+                        continue
+                    if seq != book.seq + 1:
+                        self._gap(book, book.seq + 1, seq)
+                book.seq = seq
+            self._set(book, entry)
+            if not touched or touched[-1] is not book:
+                touched.append(book)
+        return touched
@@ -1,13 +1,37 @@
 from fix.group import (
+    TAG_PREFIXES,
     Group,
     is_intersecting_groups,
     RepeatedTagError,
-    GroupStructure)
+    GroupStructure,
+    ValidationLevel,
+    validation_level)
 from fix.util import iter_rawmsg, fix_time_now
+from fix.hooks import HOOKS
+from fix.stream import iter_group_entries
+from fix import codec
 import collections
 from collections import OrderedDict
 import itertools
 
+# names of the fields in fix.codegen classes and derive_amend() keywords;
+# the Message property names where there is one
+FIELD_NAMES = {
+    1: 'account', 6: 'avgpx', 8: 'beginstring', 9: 'bodylen',
+    10: 'checksum', 11: 'clordid', 14: 'cumqty', 15: 'currency',
+    17: 'execid', 18: 'execinst', 21: 'handlinst', 22: 'idsource',
+    34: 'seqnum', 35: 'msgtype', 37: 'orderid', 38: 'qty', 39: 'ordstatus',
+    40: 'ordtype', 41: 'origclordid', 43: 'possdupflag', 44: 'px',
+    47: 'rule80a', 48: 'securityid', 49: 'sendercompid', 50: 'sendersubid',
+    52: 'sendingtime', 54: 'side', 55: 'symbol', 56: 'targetcompid',
+    57: 'targetsubid', 58: 'text', 59: 'timeinforce', 60: 'transacttime',
+    97: 'possresend', 98: 'encryptmethod', 99: 'stoppx',
+    100: 'exdestination', 108: 'heartbtint', 110: 'minqty',
+    111: 'maxfloor', 115: 'onbehalfofcompid', 126: 'expiretime',
+    128: 'delivertocompid', 150: 'exectype', 151: 'leavesqty',
+    207: 'securityexchange', 528: 'ordercapacity'}
+FIELD_TAGS = {name: tag for tag, name in FIELD_NAMES.items()}
+
 
 class Message(collections.abc.MutableMapping):
 
@@ -30,9 +54,32 @@ class Message(collections.abc.MutableMapping):
         fix[555][0][555] to get the tag value of tag 555 of the first group
     """
     @classmethod
-    def parse(cls, raw_msg, init_group: GroupStructure=None, *,
-              delim=b'\x01', validate_construct=True, validate_semantics=True,
-              auto_reset=False):
+    def parse(cls, raw_msg, init_group: GroupStructure=None, **kwargs):
+        """
+        keyword arguments: delim=b'\x01', validate_construct=True,
+        validate_semantics=True, validation=None, auto_reset=False,
+        reset_id_time=True, reset_ht=True, received=False
+        validation: ValidationLevel (or its name) for the parsed groups and
+            message; overrides validate_semantics when given
+        reset_id_time/reset_ht: passed on to the constructor; inbound
+            messages should be parsed with both False to keep them as received
+        received: keep an inbound message exactly as received, also for
+            subclasses: their constructor, which adds default header and
+            body tags, is skipped and only their REQ_TAGS/REQ_COND apply
+        """
+        hook = HOOKS.parse
+        if hook is not None:
+            return hook.call(raw_msg, cls._parse, raw_msg, init_group,
+                             **kwargs)
+        return cls._parse(raw_msg, init_group, **kwargs)
+
+    @classmethod
+    def _parse(cls, raw_msg, init_group: GroupStructure=None, *,
+               delim=b'\x01', validate_construct=True,
+               validate_semantics=True, validation=None, auto_reset=False,
+               reset_id_time=True, reset_ht=True, received=False):
+        level = validation_level(
+            validate_semantics if validation is None else validation)
         if init_group is not None and validate_construct:
             if is_intersecting_groups(init_group.inner_groups):
                 raise ValueError('intersecting groups exist')
@@ -49,9 +96,8 @@ class Message(collections.abc.MutableMapping):
         state = Message.State([], [], init_group,
                               init_group.current_level_to_group())
 
-        def attach_group(curr: Group, outer: Group,
-                         validate_semantics=validate_semantics):
-            if validate_semantics and not curr.is_valid_semantics():
+        def attach_group(curr: Group, outer: Group):
+            if level and not curr.is_valid_semantics(level):
                 raise ValueError('encountered invalid group: {}, {}'.format(
                     curr, curr.error_msg))
             outer.add_inner_group(curr)
@@ -126,24 +172,47 @@ class Message(collections.abc.MutableMapping):
             attach_group(state.output_group, state.output_group_stack[-1])
             state.curr_group = state.group_stack.pop()
             state.output_group = state.output_group_stack.pop()
-        return cls(state.output_group, delim=delim,
-                   auto_reset=auto_reset, init_groupstructure=init_group)
+        if received:
+            return cls._received(state.output_group, delim=delim,
+                                 validation=level, auto_reset=auto_reset,
+                                 init_groupstructure=init_group)
+        return cls(state.output_group, delim=delim, validation=level,
+                   auto_reset=auto_reset, init_groupstructure=init_group,
+                   reset_id_time=reset_id_time, reset_ht=reset_ht)
+
+    @classmethod
+    def _received(cls, group, **kwargs):
+        group.req_tags = frozenset(group.req_tags) | \
+            getattr(cls, 'HEADER_REQ_TAGS', frozenset()) | \
+            getattr(cls, 'REQ_TAGS', frozenset())
+        group.req_cond = group.req_cond + getattr(cls, 'REQ_COND', [])
+        msg = cls.__new__(cls)
+        Message.__init__(msg, group, reset_id_time=False, reset_ht=False,
+                         **kwargs)
+        return msg
 
     def __init__(self, initialized_group: Group=None, *, delim: bytes=b'\x01',
-                 validate_semantics=True,
+                 validate_semantics=True, validation=None,
                  auto_reset=False, reset_id_time=True, reset_ht=True,
                  init_groupstructure=None):
         """
            dictionary representing tag value pairs; value can be list of groups;
            value cannot be empty list
         reset_ht: reset header trailer
+        validation: ValidationLevel (or its name) used here and by bytes();
+            overrides validate_semantics when given
         """
         self.error_msg = ''
         self._initialized_group = initialized_group
         self.init_groupstructure = init_groupstructure
         self.delim = delim
         self.auto_reset = auto_reset
-        if validate_semantics and not self.is_valid_semantics():
+        self.validation = validation_level(
+            validate_semantics if validation is None else validation)
+        self._validate_and_reset(reset_id_time, reset_ht)
+
+    def _validate_and_reset(self, reset_id_time, reset_ht):
+        if self.validation and not self.is_valid_semantics(self.validation):
             raise ValueError(', '.join(
                 (self._initialized_group.error_msg, self.error_msg))
             )
@@ -151,7 +220,9 @@ class Message(collections.abc.MutableMapping):
             self.reset(seqnum=int(self.seqnum.decode()))
         elif reset_ht:
             self.reset_bodylen_checksum(seqnum=int(self.seqnum.decode()))
-        if validate_semantics and not self.is_valid_header_trailer():
+        elif self.validation >= ValidationLevel.FULL and \
+                not self.is_valid_header_trailer():
+            # a reset writes consistent 9 and 10, only check otherwise
             raise ValueError('invalid bodylen/checksum')
 
     def __setitem__(self, key, item):
@@ -191,10 +262,10 @@ class Message(collections.abc.MutableMapping):
     def is_valid_header_trailer(self):
         return self.is_valid_bodylen() and self.is_valid_checksum()
 
-    def is_valid_semantics(self):
+    def is_valid_semantics(self, level=ValidationLevel.FULL):
         # TODO: check non-consecutive groups of same id tag
         # This is guaranteed to be true if the message is initialized by parse
-        return self._initialized_group.is_valid_semantics()
+        return self._initialized_group.is_valid_semantics(level)
 
     def reset_bodylen_checksum(self, *, seqnum, extra=None):
         self.reset(clordid=False, transacttime=False, sendingtime=False,
@@ -255,6 +326,14 @@ class Message(collections.abc.MutableMapping):
             if isinstance(v, list):
                 yield t
 
+    def decode(self, tag, default=None):
+        """
+        value of tag through its fix.codec codec: Decimal for prices and
+        quantities, epoch ns for timestamps, bytes otherwise
+        """
+        value = self.get(tag)
+        return default if value is None else codec.decode(tag, value)
+
     @property
     def clordid(self):
         return self[11]
@@ -281,9 +360,8 @@ class Message(collections.abc.MutableMapping):
 
     @qty.setter
     def qty(self, value):
-        if isinstance(value, int):
-            value = str(value).encode()
-        self[38] = value
+        # int, Decimal, float, str or bytes
+        self[38] = codec.encode(38, value)
 
     @property
     def px(self):
@@ -291,9 +369,7 @@ class Message(collections.abc.MutableMapping):
 
     @px.setter
     def px(self, value):
-        if isinstance(value, int):
-            value = str(value).encode()
-        self[44] = value
+        self[44] = codec.encode(44, value)
 
     @property
     def ordtype(self):
@@ -323,9 +399,20 @@ class Message(collections.abc.MutableMapping):
         return repr(self._initialized_group)
 
     def __bytes__(self):
-        return self._initialized_group.build(delim=self.delim)
+        return self._initialized_group.build(
+            delim=self.delim, validation=self.validation)
+
+    def build_into(self, buf, offset=0):
+        """
+        write bytes(self) into buf at offset, see Group.build_into; returns
+        the number of bytes written
+        """
+        return self._initialized_group.build_into(
+            buf, offset, delim=self.delim, validation=self.validation)
 
     message_counter = 1
+    # MessagePool the instance was handed out by, if any
+    _pool = None
 
 
 class MessageWithHeader(Message):
@@ -343,6 +430,10 @@ class MessageWithHeader(Message):
         if default_header is None:
             default_header = OrderedDict([(8, b'FIX.4.2'), (9, b''),
                                           (98, b'0'), (108, b'20')])
+        # kept for recycle()
+        self._default_header = default_header
+        self._reset_id_time = reset_id_time
+        self._reset_ht = reset_ht
         g = Group(default_header, is_top_level=True,
                   req_tags=self.HEADER_REQ_TAGS)
 
@@ -359,7 +450,44 @@ class MessageWithHeader(Message):
         super().__init__(initialized_group=g, reset_id_time=reset_id_time,
                          reset_ht=reset_ht, **kwargs)
 
+    def recycle(self, *field_maps):
+        """
+        refill this message in place with the tag values of field_maps
+        (applied in order) as if it had been constructed from them; the
+        message type, default header, req_tags and req_cond are kept and no
+        new Group is allocated. used by MessagePool
+        """
+        g = self._initialized_group
+        d = g._d
+        msgtype = d.get(35)
+        d.clear()
+        d.update(self._default_header)
+        if self._reset_id_time:
+            d[52] = b''
+            d[60] = b''
+            d[11] = b''
+        if msgtype is not None:
+            d[35] = msgtype
+        # header tags first, same order __init__ leaves them in
+        header_tags = self.HEADER_TAGS
+        for fields in field_maps:
+            for k, v in fields.items():
+                if k in header_tags:
+                    d[k] = v
+        for fields in field_maps:
+            for k, v in fields.items():
+                if k not in header_tags:
+                    d[k] = v
+        g._invalidate()
+        self.error_msg = ''
+        self._validate_and_reset(self._reset_id_time, self._reset_ht)
+
     def is_valid_cond(self):
+        # only successes are cached, failures are recomputed to rebuild
+        # error_msg; the cache lives on the group so any mutation drops it
+        validity = self._initialized_group._validity
+        if validity.get('cond'):
+            return True
         keys = self.keys()
         if not all(x in keys for x in (8, 9, 35, 10)):
             self.error_msg = 'missing tag 8, 9, 35, or 10'
@@ -396,13 +524,125 @@ class MessageWithHeader(Message):
             if not valid_ht:
                 errors.append('invalid bodylen/checksum')
             self.error_msg = ', '.join(errors)
+        else:
+            validity['cond'] = True
 
         return check_bool
 
     def __bytes__(self):
-        if not self.is_valid_cond():
+        if self.validation >= ValidationLevel.FULL and \
+                not self.is_valid_cond():
+            raise ValueError(self.error_msg)
+        return self._initialized_group.build(
+            delim=self.delim, validation=self.validation)
+
+    def build_into(self, buf, offset=0):
+        if self.validation >= ValidationLevel.FULL and \
+                not self.is_valid_cond():
             raise ValueError(self.error_msg)
-        return self._initialized_group.build(delim=self.delim)
+        return super().build_into(buf, offset)
+
+    def _derive(self, msgtype_cls, msgtype, fields, *, keep=None,
+                seqnum=None, keep_seqnum=False):
+        """
+        msgtype_cls message sharing the field values of self (see
+        Group._share) with fields applied (None drops a tag), 41 from the
+        ClOrdID of self, a new ClOrdID, TransactTime and SendingTime and
+        BodyLength/CheckSum adjusted for the changed fields only; keep: body
+        tags kept from self, all of them if None. MsgSeqNum is seqnum,
+        that of self with keep_seqnum, else left out for FixClient.queue()
+        to stamp: built or sent before, the message fails validation
+        """
+        src = self._initialized_group
+        g = src._share()
+        g.req_tags = self.HEADER_REQ_TAGS | msgtype_cls.REQ_TAGS
+        g.req_cond = list(msgtype_cls.REQ_COND)
+        d = g._d
+        delim = self.delim
+        n_delim = len(delim)
+        sum_delim = sum(delim)
+        bodylen = int(d[9])
+        checksum = int(d[10])
+        incremental = True
+
+        def put(tag, value):
+            nonlocal bodylen, checksum, incremental
+            old = d.get(tag)
+            if isinstance(old, list) or isinstance(value, list):
+                incremental = False
+            elif old is not None:
+                prefix = TAG_PREFIXES[tag]
+                bodylen -= len(prefix) + len(old) + n_delim
+                checksum -= sum(prefix) + sum(old) + sum_delim
+            if value is None:
+                d.pop(tag, None)
+                return
+            d[tag] = value
+            if incremental:
+                prefix = TAG_PREFIXES[tag]
+                bodylen += len(prefix) + len(value) + n_delim
+                checksum += sum(prefix) + sum(value) + sum_delim
+
+        if keep is not None:
+            for tag in list(d):
+                if tag not in keep and tag not in self.HEADER_TAGS and \
+                        tag != 10:
+                    put(tag, None)
+        if d.get(11) is None:
+            raise ValueError('no ClOrdID (11) to derive {} from'.format(
+                msgtype_cls.__name__))
+        put(35, msgtype)
+        put(41, d[11])
+        for tag, value in fields.items():
+            if tag in (8, 9, 10, 35):
+                raise ValueError('tag {} cannot be changed'.format(tag))
+            if tag in self.HEADER_TAGS and tag not in d:
+                # would not be with the other header tags
+                incremental = False
+            put(tag, value if value is None or isinstance(value, list)
+                else codec.encode(tag, value))
+        now = fix_time_now()
+        put(52, now)
+        put(60, now)
+        put(11, str(Message.message_counter).encode() + b'-' +
+            fix_time_now(us=True, fmt='%H%M%S.%f'))
+        Message.message_counter += 1
+        if seqnum is not None:
+            if 34 not in d:
+                # derived from an unstamped message, back among the header
+                incremental = False
+            put(34, str(seqnum).encode())
+        elif not keep_seqnum:
+            put(34, None)
+        d.move_to_end(10)
+
+        msg = msgtype_cls.__new__(msgtype_cls)
+        msg.__dict__.update(self.__dict__)
+        msg.__dict__.pop('_pool', None)
+        msg._initialized_group = g
+        msg.error_msg = ''
+        if not incremental:
+            msg.reset_bodylen_checksum(seqnum=None)
+        else:
+            new_bodylen = str(bodylen).encode()
+            checksum += sum(new_bodylen) - sum(d[9])
+            d[9] = new_bodylen
+            d[10] = b'%03d' % (checksum % 256)
+            if src._validity.get('cond'):
+                # same header/body partition, consistent 9 and 10
+                g._validity['cond'] = True
+        if msg.validation:
+            unstamped = 34 not in d
+            if unstamped:
+                # checked as it will be once stamped, not cached as valid
+                g.req_tags -= {34}
+            valid = msg.is_valid_semantics(msg.validation)
+            if unstamped:
+                g.req_tags |= {34}
+                g._validity.pop(msg.validation, None)
+            if not valid:
+                raise ValueError(g.error_msg)
+        return msg
 
 
 class LogonMessage(MessageWithHeader):
@@ -423,6 +663,20 @@ class LogoutMessage(MessageWithHeader):
         super().__init__(g, *args, **kwargs)
 
 
+# body tags of an order kept by derive_cancel()
+CANCEL_TAGS = frozenset((1, 11, 22, 37, 38, 41, 48, 54, 55, 58, 60, 100, 207))
+
+
+def _changes(fields, changes):
+    d = dict(fields or ())
+    for name, value in changes.items():
+        tag = FIELD_TAGS.get(name)
+        if tag is None:
+            raise TypeError('unknown field name {!r}'.format(name))
+        d[tag] = value
+    return d
+
+
 class NewOrderMessage(MessageWithHeader):
 
     REQ_TAGS = frozenset((11, 54, 60, 40, 38))
@@ -440,6 +694,31 @@ class NewOrderMessage(MessageWithHeader):
             g.merge(initialized_group)
         super().__init__(g, **kwargs)
 
+    def derive_amend(self, fields=None, *, seqnum=None, keep_seqnum=False,
+                     **changes):
+        """
+        AmendOrderMessage (35=G) replacing this order: its fields with
+        fields (tag -> value) and changes (FIELD_NAMES keywords, e.g.
+        px=10.5, qty=50) applied, OrigClOrdID (41) set to this ClOrdID.
+        Unchanged values are shared, BodyLength/CheckSum are updated from
+        the changed fields only; MsgSeqNum is seqnum, that of this order
+        with keep_seqnum, else unset until FixClient.queue() stamps it
+        """
+        return self._derive(AmendOrderMessage, b'G',
+                            _changes(fields, changes), seqnum=seqnum,
+                            keep_seqnum=keep_seqnum)
+
+    def derive_cancel(self, fields=None, *, seqnum=None, keep_seqnum=False,
+                      **changes):
+        """
+        CancelOrderMessage (35=F) of this order, see derive_amend(); body
+        tags outside of CANCEL_TAGS (price, order type...) are dropped
+        """
+        return self._derive(CancelOrderMessage, b'F',
+                            _changes(fields, changes), keep=CANCEL_TAGS,
+                            seqnum=seqnum, keep_seqnum=keep_seqnum)
+
+
 class AmendOrderMessage(MessageWithHeader):
 
     REQ_TAGS = frozenset((11,41, 54, 60, 40, 38))
@@ -456,6 +735,11 @@ class AmendOrderMessage(MessageWithHeader):
             g.merge(initialized_group)
         super().__init__(g, **kwargs)
 
+    # an amend is amended or cancelled like the order it replaced
+    derive_amend = NewOrderMessage.derive_amend
+    derive_cancel = NewOrderMessage.derive_cancel
+
+
 class CancelOrderMessage(MessageWithHeader):
 
     REQ_TAGS = frozenset((11,41, 54,55, 60))
@@ -551,3 +835,15 @@ class SecurityListMessage(MessageWithHeader):
         if 'init_group' not in kwargs:
             kwargs['init_group'] = SecurityListMessage.GROUP_STRUCT
         return super().parse(*args, **kwargs)
+
+    @classmethod
+    def iter_entries(cls, raw_msg, *, delim=b'\x01', top_level=None,
+                     validation=ValidationLevel.NONE):
+        """
+        stream the NoRelatedSym (55) entries of a raw security list, with
+        their 1206 sub-groups, without building the whole message; see
+        fix.stream.iter_group_entries
+        """
+        return iter_group_entries(
+            raw_msg, SecurityListMessage.GROUP_STRUCT, delim=delim,
+            top_level=top_level, validation=validation)
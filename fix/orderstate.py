@@ -0,0 +1,159 @@
+from fix.message import Message
+from fix.util import iter_rawmsg
+
+
+class OrderState():
+
+    # OrdStatus (39) values after which the order can't change any more
+    TERMINAL_STATUS = frozenset((b'2', b'3', b'4', b'8', b'B', b'C'))
+
+    def __init__(self, clordid: bytes):
+        # current ClOrdID and every ClOrdID the order has been known by
+        self.clordid = clordid
+        self.clordids = [clordid]
+        self.order_id = None
+        self.status = None
+        self.exec_type = None
+        self.cum_qty = None
+        self.leaves_qty = None
+        self.avg_px = None
+        self.qty = None
+        self.px = None
+        self.symbol = None
+        self.side = None
+        self.updates = 0
+
+    @property
+    def is_terminal(self):
+        return self.status in self.TERMINAL_STATUS
+
+    def __repr__(self):
+        return 'OrderState({})'.format(', '.join(
+            '{}={}'.format(k, v) for k, v in vars(self).items()))
+
+
+class OrderStateStore():
+
+    # fields kept from the messages, the rest is never decoded
+    TRACKED_TAGS = frozenset((b'35', b'11', b'41', b'37', b'39', b'150',
+                              b'14', b'151', b'6', b'38', b'44', b'55',
+                              b'54'))
+    OUTBOUND_MSGTYPES = frozenset((b'D', b'G', b'F'))
+    INBOUND_MSGTYPES = frozenset((b'8', b'9'))
+
+    def __init__(self):
+        """
+        order state rebuilt from ExecutionReports (35=8) and
+        OrderCancelRejects (35=9), following ClOrdID (11) -> OrigClOrdID
+        (41) chains; every ClOrdID and OrderID (37) of an order maps to the
+        same OrderState
+        """
+        self._by_id = {}
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """
+        callback(state, prev_status, fields) is called after every inbound
+        update of an order; fields maps tag (int) -> value of the message
+        """
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def get(self, order_id: bytes, default=None):
+        """ lookup by any ClOrdID of the chain or by OrderID """
+        return self._by_id.get(order_id, default)
+
+    def __getitem__(self, order_id):
+        return self._by_id[order_id]
+
+    def __contains__(self, order_id):
+        return order_id in self._by_id
+
+    def __len__(self):
+        return len({id(s) for s in self._by_id.values()})
+
+    def discard(self, state: OrderState):
+        for k in state.clordids + [state.order_id]:
+            if self._by_id.get(k) is state:
+                del self._by_id[k]
+
+    @classmethod
+    def _fields(cls, msg):
+        if isinstance(msg, Message):
+            return {t: v for t, v in msg.items() if not isinstance(v, list)}
+        return {int(t): v for t, v in iter_rawmsg(msg)
+                if t in cls.TRACKED_TAGS}
+
+    def _state_for(self, fields):
+        clordid = fields.get(11)
+        state = self._by_id.get(clordid) if clordid is not None else None
+        if state is None and 41 in fields:
+            state = self._by_id.get(fields[41])
+        if state is None and 37 in fields:
+            state = self._by_id.get(fields[37])
+        if state is None:
+            if clordid is None:
+                return None
+            state = OrderState(fields.get(41, clordid))
+            self._by_id[state.clordid] = state
+        if clordid is not None and clordid not in self._by_id:
+            state.clordids.append(clordid)
+            self._by_id[clordid] = state
+        return state
+
+    def on_outbound(self, msg):
+        """
+        register an outbound 35=D/G/F so that the chain is known before
+        the venue acks it; anything else is ignored
+        """
+        fields = self._fields(msg)
+        if fields.get(35) not in self.OUTBOUND_MSGTYPES:
+            return None
+        state = self._state_for(fields)
+        if state is not None and fields[35] == b'D':
+            state.qty = fields.get(38, state.qty)
+            state.px = fields.get(44, state.px)
+            state.symbol = fields.get(55, state.symbol)
+            state.side = fields.get(54, state.side)
+        return state
+
+    def on_message(self, msg):
+        """
+        apply an inbound message (raw bytes or Message); returns the updated
+        OrderState or None when msg is not a 35=8/35=9
+        """
+        if not isinstance(msg, Message) and \
+                b'\x0135=8\x01' not in msg and b'\x0135=9\x01' not in msg:
+            return None
+        fields = self._fields(msg)
+        msgtype = fields.get(35)
+        if msgtype not in self.INBOUND_MSGTYPES:
+            return None
+        state = self._state_for(fields)
+        if state is None:
+            return None
+        prev_status = state.status
+        order_id = fields.get(37)
+        if order_id is not None and order_id != b'NONE':
+            state.order_id = order_id
+            self._by_id[order_id] = state
+        state.status = fields.get(39, state.status)
+        if msgtype == b'8':
+            state.exec_type = fields.get(150, state.exec_type)
+            state.cum_qty = fields.get(14, state.cum_qty)
+            state.leaves_qty = fields.get(151, state.leaves_qty)
+            state.avg_px = fields.get(6, state.avg_px)
+            state.qty = fields.get(38, state.qty)
+            state.px = fields.get(44, state.px)
+            state.symbol = fields.get(55, state.symbol)
+            state.side = fields.get(54, state.side)
+            if state.exec_type in (b'4', b'5') and 11 in fields:
+                # cancelled/replaced: the order now goes by the new id
+                state.clordid = fields[11]
+        state.updates += 1
+        for callback in self._subscribers:
+            callback(state, prev_status, fields)
+        return state
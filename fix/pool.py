@@ -0,0 +1,79 @@
+from fix.group import Group
+from collections import OrderedDict
+
+
+class MessagePool():
+
+    def __init__(self, msgtype_cls: type, *, maxsize=64, **msg_kwargs):
+        """
+        free list of reusable messages of one MessageWithHeader subclass
+
+        maxsize: max number of idle messages kept; releases beyond it are
+            dropped (and counted as discarded)
+        msg_kwargs: passed to msgtype_cls when a new message is needed
+        """
+        self.msgtype_cls = msgtype_cls
+        self.maxsize = maxsize
+        self.msg_kwargs = msg_kwargs
+        self._free = []
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.in_use = 0
+        self.high_water = 0
+
+    def acquire(self, *field_maps):
+        """
+        message filled with the tag values of field_maps (applied in order),
+        recycled from the free list when possible
+        """
+        if self._free:
+            msg = self._free.pop()
+            try:
+                msg.recycle(*field_maps)
+            except Exception:
+                # not handed out, the instance is simply dropped
+                msg._pool = None
+                raise
+            self.hits += 1
+        else:
+            d = OrderedDict()
+            for fields in field_maps:
+                d.update(fields)
+            msg = self.msgtype_cls(Group(d), **self.msg_kwargs)
+            self.misses += 1
+        msg._pool = self
+        msg._pool_idle = False
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return msg
+
+    def release(self, msg):
+        """
+        give msg back to the pool; it must not be used by the caller
+        afterwards since the next acquire() overwrites it
+        """
+        if msg._pool is not self:
+            raise ValueError('message does not belong to this pool')
+        if msg._pool_idle:
+            raise ValueError('message released twice')
+        msg._pool_idle = True
+        self.in_use -= 1
+        if len(self._free) < self.maxsize:
+            self._free.append(msg)
+        else:
+            msg._pool = None
+            self.discarded += 1
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'in_use': self.in_use,
+                'high_water': self.high_water,
+                'free': len(self._free)}
+
+    def __repr__(self):
+        return 'MessagePool({}, {})'.format(
+            self.msgtype_cls.__name__, self.stats())
@@ -0,0 +1,258 @@
+import re
+
+
+def _as_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return str(value).encode()
+
+
+def _clauses_func(clauses):
+    # AND of clauses, each an OR of needles found anywhere in the raw
+    # message; bytes.__contains__ keeps the scan in C
+    if len(clauses) == 1:
+        clause = clauses[0]
+        if len(clause) == 1:
+            needle = clause[0]
+            return lambda raw: needle in raw
+        return lambda raw: any(map(raw.__contains__, clause))
+    if all(len(c) == 1 for c in clauses):
+        needles = tuple(c[0] for c in clauses)
+        return lambda raw: all(map(raw.__contains__, needles))
+    return lambda raw: all(any(map(raw.__contains__, c)) for c in clauses)
+
+
+class Predicate():
+
+    __slots__ = ('func', 'text', 'clauses')
+
+    def __init__(self, func=None, text='', *, clauses=None):
+        """
+        compiled test of a raw message, see Tag and compile_predicate();
+        clauses (AND of ORs of needles) are kept so that &/| of needle
+        only predicates compile to a single scan. Most selective (longest)
+        needles are looked for first
+        """
+        if clauses is not None:
+            clauses = tuple(sorted(
+                clauses, key=lambda c: (len(c), -min(map(len, c)))))
+            func = _clauses_func(clauses)
+        self.func = func
+        self.text = text
+        self.clauses = clauses
+
+    def __call__(self, raw):
+        return self.func(raw)
+
+    def filter(self, raws):
+        """ the raw messages of raws that match """
+        return filter(self.func, raws)
+
+    def __and__(self, other):
+        text = '({} and {})'.format(self.text, other.text)
+        if self.clauses is not None and other.clauses is not None:
+            return Predicate(text=text, clauses=self.clauses + other.clauses)
+        f, g = self.func, other.func
+        return Predicate(lambda raw: f(raw) and g(raw), text)
+
+    def __or__(self, other):
+        text = '({} or {})'.format(self.text, other.text)
+        if self.clauses is not None and other.clauses is not None and \
+                len(self.clauses) == len(other.clauses) == 1:
+            return Predicate(text=text,
+                             clauses=(self.clauses[0] + other.clauses[0],))
+        f, g = self.func, other.func
+        return Predicate(lambda raw: f(raw) or g(raw), text)
+
+    def __invert__(self):
+        f = self.func
+        return Predicate(lambda raw: not f(raw), 'not {}'.format(self.text))
+
+    def __repr__(self):
+        return 'Predicate({})'.format(self.text)
+
+
+class Tag():
+
+    def __init__(self, tag: int, *, delim=b'\x01'):
+        """
+        predicate builder on one tag of raw messages, e.g.
+        Tag(35).isin((b'8', b'9')) & (Tag(11) == clordid). Values are
+        looked for delimiter anchored (b'\\x0111=' + clordid + b'\\x01'),
+        anywhere in the message: an occurrence inside a repeating group
+        matches too, parse the matches to tell them apart
+        """
+        self.tag = tag
+        self.delim = delim
+        self.prefix = str(tag).encode() + b'='
+
+    def _needle(self, value):
+        return self.delim + self.prefix + _as_value(value) + self.delim
+
+    def _text(self, op, value):
+        return '{} {} {}'.format(self.tag, op, _as_value(value).decode())
+
+    def __eq__(self, value):
+        if self.tag == 8:
+            # BeginString opens the message, there is no delimiter before it
+            needle = self._needle(value)[1:]
+            return Predicate(lambda raw: raw.startswith(needle),
+                             self._text('==', value))
+        return Predicate(text=self._text('==', value),
+                         clauses=((self._needle(value),),))
+
+    def __ne__(self, value):
+        return ~(self == value)
+
+    def isin(self, values):
+        values = list(values)
+        if not values:
+            return Predicate(lambda raw: False, '{} in {{}}'.format(self.tag))
+        text = '{} in {{{}}}'.format(
+            self.tag, ','.join(_as_value(v).decode() for v in values))
+        if self.tag == 8:
+            eqs = [self == v for v in values]
+            return Predicate(lambda raw: any(p(raw) for p in eqs), text)
+        return Predicate(text=text,
+                         clauses=(tuple(map(self._needle, values)),))
+
+    def exists(self):
+        if self.tag == 8:
+            return Predicate(lambda raw: raw.startswith(self.prefix), '8')
+        return Predicate(text=str(self.tag),
+                         clauses=((self.delim + self.prefix,),))
+
+    __hash__ = object.__hash__
+
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<op>==|!=|[(){},])
+    |'(?P<sq>[^']*)'
+    |"(?P<dq>[^"]*)"
+    |\$(?P<param>\w+)
+    |(?P<word>[^\s(){},=!'"$]+)
+    )""", re.X)
+
+
+class _Parser():
+
+    def __init__(self, expr, delim, params):
+        self.delim = delim
+        self.params = params
+        self.tokens = []
+        pos = 0
+        expr = expr.rstrip()
+        while pos < len(expr):
+            m = _TOKEN.match(expr, pos)
+            if m is None or m.end() == pos:
+                pos = len(expr) - len(expr[pos:].lstrip())
+                raise ValueError('unexpected {!r} at position {} of '
+                                 '{!r}'.format(expr[pos], pos, expr))
+            kind = m.lastgroup
+            self.tokens.append((kind, m.group(kind), m.start(kind)))
+            pos = m.end()
+        self.tokens.append(('end', None, len(expr)))
+        self.i = 0
+        self.expr = expr
+
+    def peek(self):
+        return self.tokens[self.i]
+
+    def next(self):
+        token = self.tokens[self.i]
+        self.i += 1
+        return token
+
+    def error(self, token, expected):
+        return ValueError('expected {} at position {} of {!r}'.format(
+            expected, token[2], self.expr))
+
+    def expect(self, value):
+        token = self.next()
+        if token[1] != value:
+            raise self.error(token, repr(value))
+
+    def keyword(self, word):
+        kind, value, _ = self.peek()
+        if kind == 'word' and value == word:
+            self.i += 1
+            return True
+        return False
+
+    def parse(self):
+        pred = self.parse_or()
+        if self.peek()[0] != 'end':
+            raise self.error(self.peek(), "'and', 'or' or the end")
+        return pred
+
+    def parse_or(self):
+        pred = self.parse_and()
+        while self.keyword('or'):
+            pred = pred | self.parse_and()
+        return pred
+
+    def parse_and(self):
+        pred = self.parse_not()
+        while self.keyword('and'):
+            pred = pred & self.parse_not()
+        return pred
+
+    def parse_not(self):
+        if self.keyword('not'):
+            return ~self.parse_not()
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.next()
+        if token[1] == '(':
+            pred = self.parse_or()
+            self.expect(')')
+            return pred
+        if token[0] != 'word' or not token[1].isdigit():
+            raise self.error(token, 'a tag')
+        tag = Tag(int(token[1]), delim=self.delim)
+        op = self.peek()[1]
+        if op == '==':
+            self.i += 1
+            return tag == self.parse_value(many=False)
+        if op == '!=':
+            self.i += 1
+            return tag != self.parse_value(many=False)
+        if self.keyword('in'):
+            self.expect('{')
+            values = []
+            if self.peek()[1] != '}':
+                values += self.parse_value(many=True)
+                while self.peek()[1] == ',':
+                    self.i += 1
+                    values += self.parse_value(many=True)
+            self.expect('}')
+            return tag.isin(values)
+        return tag.exists()
+
+    def parse_value(self, many):
+        kind, value, _ = token = self.next()
+        if kind in ('sq', 'dq', 'word'):
+            value = value.encode()
+        elif kind == 'param':
+            if value not in self.params:
+                raise ValueError('no value given for ${}'.format(value))
+            value = self.params[value]
+        else:
+            raise self.error(token, 'a value')
+        if many:
+            if isinstance(value, (list, tuple, set, frozenset)):
+                return [_as_value(v) for v in value]
+            return [_as_value(value)]
+        return _as_value(value)
+
+
+def compile_predicate(expr: str, *, delim=b'\x01', **params):
+    """
+    Predicate from an expression such as "35 in {8,9} and 11 == $clordid":
+        tag == value, tag != value, tag in {value, ...}, tag (present),
+        combined with and, or, not and parentheses
+    values are bare words, quoted strings or $name taken from params
+    (bytes, str or int; a list/set as a whole in a {...})
+    """
+    return _Parser(expr, delim, params).parse()
@@ -0,0 +1,173 @@
+from fix.group import Group
+from fix.message import Message, SecurityListMessage
+import json
+import os
+
+
+def instrument_attributes(entry: Group):
+    """
+    plain dict of a NoRelatedSym entry: tag -> value, inner groups as a list
+    of such dicts
+    """
+    return {t: ([instrument_attributes(g) for g in v]
+                if isinstance(v, list) else v)
+            for t, v in entry.items()}
+
+
+def _to_json(attrs):
+    return {str(t): ([_to_json(g) for g in v] if isinstance(v, list)
+                     else v.decode('latin-1'))
+            for t, v in attrs.items()}
+
+
+def _from_json(obj):
+    return {int(t): ([_from_json(g) for g in v] if isinstance(v, list)
+                     else v.encode('latin-1'))
+            for t, v in obj.items()}
+
+
+class SecurityListAssembler():
+
+    class RequestState:
+        def __init__(self, req_id):
+            self.req_id = req_id
+            self.fragments = 0
+            self.entries = 0
+            # TotNoRelatedSym (393), None if the venue doesn't send it
+            self.total = None
+            self.last_fragment = False
+            # attributes of the instruments it listed, in arrival order
+            self.instruments = []
+
+        @property
+        def is_complete(self):
+            return self.last_fragment or (
+                self.total is not None and self.entries >= self.total)
+
+    SNAPSHOT_VERSION = 2
+
+    def __init__(self, snapshot_path=None, *, delim=b'\x01'):
+        """
+        collects SecurityList (35=y) fragments per SecurityReqID (320) and
+        indexes every instrument by Symbol (55) and SecurityID (48) as the
+        fragments arrive
+
+        snapshot_path: when given, an existing snapshot is loaded on
+            creation and a new one is written each time a request completes
+        """
+        self.delim = delim
+        self.snapshot_path = snapshot_path
+        self.requests = {}
+        self.by_symbol = {}
+        self.by_security_id = {}
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            self.load_snapshot(snapshot_path)
+
+    def add(self, msg):
+        """
+        add one SecurityList fragment, raw bytes (streamed entry by entry)
+        or an already parsed Message; returns its RequestState
+        """
+        if isinstance(msg, Message):
+            top_level = {t: v for t, v in msg.items()
+                         if not isinstance(v, list)}
+            entries = msg.get(55, None) or []
+        else:
+            top_level = {}
+            entries = SecurityListMessage.iter_entries(
+                msg, delim=self.delim, top_level=top_level)
+        # streamed, top_level is only complete once the entries are read
+        instruments = [instrument_attributes(entry) for entry in entries]
+
+        req_id = top_level.get(320)
+        state = self.requests.get(req_id)
+        if state is None or state.is_complete:
+            # a fragment for a complete request starts a fresh list, what
+            # the previous one listed is no longer resolvable
+            if state is not None:
+                self._unindex(state.instruments)
+            state = self.requests[req_id] = self.RequestState(req_id)
+        for attrs in instruments:
+            self._index(attrs)
+        state.instruments += instruments
+        state.fragments += 1
+        state.entries += len(instruments)
+        if 393 in top_level:
+            state.total = int(top_level[393])
+        # no LastFragment (893) means the list fits in one message
+        state.last_fragment = top_level.get(893, b'Y') == b'Y'
+        if state.is_complete and self.snapshot_path is not None:
+            self.save_snapshot(self.snapshot_path)
+        return state
+
+    def _index(self, attrs):
+        symbol = attrs.get(55)
+        if symbol is not None:
+            self.by_symbol[symbol] = attrs
+        security_id = attrs.get(48)
+        if security_id is not None:
+            self.by_security_id[security_id] = attrs
+
+    def _unindex(self, instruments):
+        for attrs in instruments:
+            # unless a later request indexed the same key again
+            symbol = attrs.get(55)
+            if self.by_symbol.get(symbol) is attrs:
+                del self.by_symbol[symbol]
+            security_id = attrs.get(48)
+            if self.by_security_id.get(security_id) is attrs:
+                del self.by_security_id[security_id]
+
+    def lookup(self, symbol: bytes, default=None):
+        return self.by_symbol.get(symbol, default)
+
+    def lookup_security_id(self, security_id: bytes, default=None):
+        return self.by_security_id.get(security_id, default)
+
+    def is_complete(self, req_id: bytes):
+        state = self.requests.get(req_id)
+        return state is not None and state.is_complete
+
+    def __len__(self):
+        return len(self.by_symbol)
+
+    def __contains__(self, symbol):
+        return symbol in self.by_symbol
+
+    def save_snapshot(self, path):
+        snapshot = {
+            'version': self.SNAPSHOT_VERSION,
+            'requests': [
+                {'req_id': None if s.req_id is None
+                 else s.req_id.decode('latin-1'),
+                 'fragments': s.fragments, 'entries': s.entries,
+                 'total': s.total, 'last_fragment': s.last_fragment,
+                 'instruments': [_to_json(a) for a in s.instruments]}
+                for s in self.requests.values()]}
+        # write then rename so a crash never leaves a truncated snapshot
+        tmp_path = '{}.tmp'.format(path)
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path):
+        with open(path) as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') not in (1, self.SNAPSHOT_VERSION):
+            raise ValueError('unsupported security list snapshot version: '
+                             '{}'.format(snapshot.get('version')))
+        for r in snapshot['requests']:
+            req_id = None if r['req_id'] is None else \
+                r['req_id'].encode('latin-1')
+            state = self.requests[req_id] = self.RequestState(req_id)
+            state.fragments = r['fragments']
+            state.entries = r['entries']
+            state.total = r['total']
+            state.last_fragment = r['last_fragment']
+            state.instruments = [_from_json(obj)
+                                 for obj in r.get('instruments', [])]
+            for attrs in state.instruments:
+                self._index(attrs)
+        # version 1 kept the instruments apart from their requests
+        for obj in snapshot.get('instruments', []):
+            self._index(_from_json(obj))
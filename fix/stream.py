@@ -0,0 +1,89 @@
+from fix.group import (
+    Group, GroupStructure, RepeatedTagError, ValidationLevel,
+    validation_level)
+from fix.util import iter_rawmsg
+
+
+def _inner_group_index(group_struct: GroupStructure, index=None):
+    # id(GroupStructure) -> {id tag: inner GroupStructure}, for O(1) lookup
+    if index is None:
+        index = {}
+    index[id(group_struct)] = {g.id_tag: g for g in group_struct.inner_groups}
+    for g in group_struct.inner_groups:
+        _inner_group_index(g, index)
+    return index
+
+
+def iter_group_entries(raw_msg, group_struct: GroupStructure, *,
+                       delim=b'\x01', top_level=None,
+                       validation=ValidationLevel.NONE):
+    """
+    yield the entries of the repeating groups declared at the top level of
+    group_struct one at a time, with their inner groups, straight from the
+    raw message; only the entry being assembled is held in memory so the
+    consumer can stop at any point
+
+    top_level: optional mapping filled with the tags outside of the
+        repeating groups (header, 320, 893, trailer...) as they are seen;
+        only complete once the generator is exhausted
+    validation: each yielded entry is checked at this level, ValueError is
+        raised for an invalid one
+    """
+    validation = validation_level(validation)
+    index = _inner_group_index(group_struct)
+    entry_structs = index[id(group_struct)]
+    # (GroupStructure, Group) path from the current entry down
+    stack = []
+
+    def open_group(gs, tag, value):
+        g = Group(req_tags=gs.req_tags)
+        g[tag] = value
+        if stack:
+            stack[-1][1].add_inner_group(g)
+        stack.append((gs, g))
+
+    def check(entry):
+        if validation and not entry.is_valid_semantics(validation):
+            raise ValueError('encountered invalid group: {}, {}'.format(
+                entry, entry.error_msg))
+        return entry
+
+    for t, v in iter_rawmsg(raw_msg, delim=delim):
+        try:
+            t = int(t)
+        except ValueError as e:
+            raise ValueError('tag not integer: "{}"'.format(t)) from e
+        while stack:
+            gs, g = stack[-1]
+            inner = index[id(gs)].get(t)
+            if inner is not None:
+                open_group(inner, t, v)
+                break
+            if t == gs.id_tag:
+                # next group on the same level
+                stack.pop()
+                if not stack:
+                    yield check(g)
+                    # the new entry is opened below
+                    break
+                open_group(gs, t, v)
+                break
+            if t in gs:
+                if t in g:
+                    raise RepeatedTagError(offending_tag=t)
+                g[t] = v
+                break
+            stack.pop()
+            if not stack:
+                yield check(g)
+        if stack:
+            continue
+        entry_gs = entry_structs.get(t)
+        if entry_gs is not None:
+            open_group(entry_gs, t, v)
+        elif top_level is not None:
+            if t in top_level:
+                raise RepeatedTagError(offending_tag=t)
+            top_level[t] = v
+    if stack:
+        yield check(stack[0][1])
@@ -1,4 +1,5 @@
 from typing import Dict
+import calendar
 import re
 import datetime as dt
 
@@ -16,12 +17,40 @@ def fix_time_now(fmt='%Y%m%d-%H:%M:%S.%f', *, us=False):
     return t.encode()
 
 
+def parse_fix_time(value: bytes):
+    """
+    UTCTimestamp (yyyymmdd-hh:mm:ss[.sss[sss]]) to epoch ns, read as UTC
+    like fix.codec.TimestampCodec.decode()
+    """
+    day, _, frac = value.decode().partition('.')
+    t = calendar.timegm(dt.datetime.strptime(day, '%Y%m%d-%H:%M:%S')
+                        .timetuple())
+    return t * 1000000000 + int(frac.ljust(9, '0')[:9] or 0)
+
+
 def iter_rawmsg(fixmsg, *, delim=b'\x01'):
     for t, _, v in (x.group(0).partition(b'=')
                     for x in re.finditer(b'([^\\' + delim + b']+)', fixmsg)):
         yield t, v
 
 
+def peek_tag(fixmsg, tag: bytes, *, delim=b'\x01', default=None):
+    """
+    value of the first occurrence of tag (e.g. b'35') in a raw message
+    without parsing it
+    """
+    if fixmsg.startswith(tag + b'='):
+        start = len(tag) + 1
+    else:
+        anchor = delim + tag + b'='
+        start = fixmsg.find(anchor)
+        if start < 0:
+            return default
+        start += len(anchor)
+    end = fixmsg.find(delim, start)
+    return fixmsg[start:] if end < 0 else fixmsg[start:end]
+
+
 def validate_d(d: Dict):
     assert all(isinstance(k, int) and isinstance(v, bytes)
                for k, v in d.items())
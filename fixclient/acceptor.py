@@ -0,0 +1,92 @@
+import itertools
+from fix.util import iter_rawmsg, fix_time_now
+
+
+def frame_message(fields, *, begin_string=b'FIX.4.2'):
+    """
+    raw message with 8, 9 and 10 computed; fields are (tag, value) pairs
+    starting with 35
+    """
+    body = b''.join(str(t).encode() + b'=' + v + b'\x01' for t, v in fields)
+    head = b'8=' + begin_string + b'\x019=' + str(len(body)).encode() + \
+        b'\x01'
+    checksum = str(sum(head + body) % 256).zfill(3).encode()
+    return head + body + b'10=' + checksum + b'\x01'
+
+
+class SimulatedAcceptor():
+
+    def __init__(self, transport, *, sendercompid=b'OMS'):
+        """
+        minimal in-process counterparty: answers Logon, Logout and
+        TestRequest and acks every 35=D/G/F with an ExecutionReport.
+        transport is the acceptor end of a loopback_pair(); it is answered
+        synchronously from within the client's sendall()
+        """
+        self.transport = transport
+        self.sendercompid = sendercompid
+        self.target = b''
+        self.seqnum = 1
+        self.received = 0
+        self._buf = bytearray()
+        self._order_ids = itertools.count(1)
+        # ClOrdID -> OrderID, amends and cancels keep the OrderID
+        self._orders = {}
+        self._exec_ids = itertools.count(1)
+        transport.handler = self.on_data
+
+    def on_data(self, data):
+        buf = self._buf
+        buf += data
+        while True:
+            # 8=...\x019=<len>\x01<body>10=xxx\x01
+            start = buf.find(b'\x019=')
+            end_len = buf.find(b'\x01', start + 3) if start >= 0 else -1
+            if end_len < 0:
+                return
+            total = end_len + 1 + int(buf[start + 3:end_len]) + 7
+            if len(buf) < total:
+                return
+            msg = bytes(buf[:total])
+            del buf[:total]
+            self.received += 1
+            self.on_message(msg)
+
+    def send(self, fields):
+        d = [(35, fields[0][1]), (49, self.sendercompid), (56, self.target),
+             (34, str(self.seqnum).encode()), (52, fix_time_now()),
+             *fields[1:]]
+        self.seqnum += 1
+        self.transport.sendall(frame_message(d))
+
+    def on_message(self, msg):
+        fields = {int(t): v for t, v in iter_rawmsg(msg)}
+        self.target = fields.get(49, b'')
+        msgtype = fields.get(35)
+        if msgtype in (b'A', b'5'):
+            self.send([(35, msgtype)] + (
+                [(98, b'0'), (108, fields.get(108, b'30'))]
+                if msgtype == b'A' else []))
+        elif msgtype == b'1':
+            self.send([(35, b'0'), (112, fields.get(112, b''))])
+        elif msgtype in (b'D', b'G', b'F'):
+            self.send(self.execution_report(msgtype, fields))
+
+    def execution_report(self, msgtype, fields):
+        status = {b'D': b'0', b'G': b'5', b'F': b'4'}[msgtype]
+        qty = fields.get(38, b'0')
+        clordid = fields.get(11, b'')
+        order_id = self._orders.get(fields.get(41))
+        if order_id is None:
+            order_id = str(next(self._order_ids)).encode()
+        self._orders[clordid] = order_id
+        report = [(35, b'8'), (37, order_id), (11, clordid)]
+        if 41 in fields:
+            report.append((41, fields[41]))
+        report += [(17, str(next(self._exec_ids)).encode()), (20, b'0'),
+                   (39, status), (150, status), (14, b'0'), (6, b'0'),
+                   (151, b'0' if msgtype == b'F' else qty), (38, qty)]
+        report += [(t, fields[t]) for t in (40, 44, 54, 55, 59)
+                   if t in fields]
+        report.append((60, fix_time_now()))
+        return report
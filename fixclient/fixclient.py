@@ -1,11 +1,22 @@
-import socket
 import fix
+import configparser
 import logging
+import socket
 import sys
+import threading
+import time
 import colorama
 from colorama import Back, Style
 from collections import OrderedDict
-from fix.util import ch_delim, iter_rawmsg
+from fix.dedup import DuplicateDetector
+from fix.hooks import HOOKS
+from fix.prefilter import Tag
+from fix.util import ch_delim, iter_rawmsg, peek_tag, fix_time_now
+from fixclient.throttle import Throttle
+from fixclient.transport import Transport, transport_from_config
+from fixclient.timers import TimerWheel, SessionTimers
+from fixclient.journal import capture_writers, INBOUND, OUTBOUND
+from fixclient.metrics import MetricsRegistry, REJECT_MSGTYPES
 
 colorama.init()
 
@@ -28,26 +39,117 @@ class NoMessageResponseException(Exception):
         super().__init__(detail)
 
 
+def _override_section(config, section, overrides):
+    merged = configparser.ConfigParser()
+    merged.read_dict(config)
+    merged[section].update(overrides)
+    return merged
+
+
 class FixClient():
 
-    def __init__(self, config=None, *, conn_name='default', timeout=5,
+    # session used when no conn_name is given and ini keys replacing those
+    # of the session section; set per process, e.g. by fixclient.runner
+    # workers, so scenarios creating FixClient(config) need no change
+    default_conn_name = 'default'
+    config_overrides = {}
+
+    def __init__(self, config=None, *, conn_name=None, timeout=5,
                  auto=True, verbose=1, log_level=logging.INFO,
-                 filter_tags=None):
+                 filter_tags=None, order_store=None,
+                 transport: Transport=None, timer_wheel: TimerWheel=None,
+                 dedup: DuplicateDetector=None,
+                 metrics: MetricsRegistry=None):
+        if conn_name is None:
+            conn_name = self.default_conn_name
+        if self.config_overrides:
+            config = _override_section(config, conn_name,
+                                       self.config_overrides)
         self.config = config
         self.auto = auto
         self.seqnum = 1
         self.conn_name = conn_name
-        self.ip = config[conn_name]['OMSIP']
+        self.ip = config[conn_name].get('OMSIP')
         self.port = config[conn_name].getint('OMSPort')
         self.targetcompid = config[conn_name]['OMSTarget'].encode()
         self.sendercompid = config[conn_name]['OMSSender'].encode()
         self.beginstring = config[conn_name]['BeginString'].encode()
         self.heartbeat = config[conn_name]['OMSHeartBeat'].encode()
+        # outbound messages are checked at this level when built/sent;
+        # inbound traffic from the session is trusted by default
+        self.validation = fix.validation_level(
+            config[conn_name].get('ValidationLevel', 'full'))
+        self.inbound_validation = fix.validation_level(
+            config[conn_name].get('InboundValidation', 'none'))
+        # message class -> fix.MessagePool, see new_msg(pooled=True)
+        self.pools = {}
+        self.pool_size = config[conn_name].getint('MessagePoolSize', 64)
+        # reused by send_batch(), which builds each batch into it
+        self._batch_buf = bytearray()
+        # fix.OrderStateStore fed with all orders sent and acks received
+        self.order_store = order_store
+        # drops inbound PossDup/PossResend messages already received, kept
+        # across reconnects; None when the ini sets no DedupWindow
+        self.dedup = dedup or DuplicateDetector.from_config(config[conn_name])
+        # sequence numbers restart on reconnect(), so do the dedup keys
+        self.session_epoch = 0
+        # paces everything sent, None when the ini sets no Throttle* limit
+        self.throttle = Throttle.from_config(
+            config[conn_name], self._send_queued)
+        # traffic, timing and queue metrics, None when the ini sets no
+        # Metrics* key; one given here can be shared with other clients
+        self._own_metrics = metrics is None
+        self.metrics = metrics or MetricsRegistry.from_config(
+            config[conn_name])
+        if self.metrics is not None and self.throttle is not None:
+            # labeled by session, the registry may be shared
+            self.metrics.gauge('fix_queue_depth',
+                               lambda: len(self.throttle), conn_name)
         self.header_fill = {8: self.beginstring,
                             49: self.sendercompid,
                             56: self.targetcompid}
+        # held from seq() to the write by whatever sends from more than one
+        # thread (timers, a reader answering TestRequests): seqnums then go
+        # out in order; reentrant, send_msg() takes it too
+        self.send_lock = threading.RLock()
 
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # tcp/unix from the ini unless given, e.g. a loopback_pair() end
+        self.transport = transport or transport_from_config(config[conn_name])
+        # AutoHeartbeat: heartbeats, TestRequest on silence and logon
+        # timeout on a timer wheel, which can be shared by many clients
+        self.session_timers = None
+        self.logon_timeout = config[conn_name].getfloat('LogonTimeout', 10.)
+        self._timed_out = None
+        if config[conn_name].getboolean('AutoHeartbeat', False):
+            if timer_wheel is None:
+                timer_wheel = TimerWheel(
+                    config[conn_name].getfloat('TimerTick', 0.1))
+            self.session_timers = SessionTimers(
+                timer_wheel, float(self.heartbeat),
+                on_heartbeat=self.send_heartbeat,
+                on_test_request=self.send_test_request,
+                on_timeout=self._on_session_timeout)
+        self.timer_wheel = timer_wheel
+        # recv wakes up this often to service the timers and the throttle
+        self.tick = timer_wheel.tick if timer_wheel is not None else \
+            config[conn_name].getfloat('TimerTick', 0.1)
+        # text traffic log and binary journal of everything sent/received,
+        # an empty path turns either off
+        self.captures = capture_writers(
+            config[conn_name].get('TrafficLog', 'traffic.log'),
+            config[conn_name].get('TrafficJournal', ''))
+        # inbound handling while logging on/out, by MsgType; a handler
+        # returning True ends the wait, anything unregistered raises
+        # UnexpectedMessageException
+        self.logon_dispatcher = self._session_dispatcher('non logon response')
+        self.logon_dispatcher.register(b'A', handler=self._on_logon_response)
+        self.logout_dispatcher = self._session_dispatcher(
+            'non logout response')
+        self.logout_dispatcher.register(
+            b'8', handler=lambda prmsg: self.log.info(
+                f'ack msg for others rcvd {prmsg}'))
+        self.logout_dispatcher.register(
+            b'5', handler=self._on_logout_response)
         self.logged_on = False
         self.verbose = verbose
         self.filter_tags = filter_tags or {8, 9, 49, 56, 52, 10, 60, 11, 43, 97}
@@ -76,74 +178,103 @@ class FixClient():
         a = self.seqnum
         self.seqnum += 1
         return a
-     
-    def _set_keepalive_linux(self, sock, after_idle_sec=1, interval_sec=3, max_fails=5):
-         
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
-        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, after_idle_sec)
-        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval_sec)
-        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, max_fails)
 
+    @property
+    def sock(self):
+        # underlying socket of the transport, None for loopback
+        return self.transport.sock
 
     def connect(self):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        # keep the socket alive rather than disconnect after a time out period
-        self._set_keepalive_linux(self.sock)
-        self.sock.connect((self.ip, self.port))
-        #self.sock.settimeout(self.timeout)
+        self._timed_out = None
+        self.transport.connect()
+        #self.transport.settimeout(self.timeout)
+        if self.session_timers is not None or self.throttle is not None:
+            # wake up every tick to service the timers and send what the
+            # throttle let through while blocked in recv
+            self.transport.settimeout(self.tick)
+
+    def service_timers(self):
+        if self.timer_wheel is not None:
+            self.timer_wheel.advance()
+        self._pump()
+
+    def _pump(self):
+        if self.throttle is not None and len(self.throttle):
+            with self.send_lock:
+                self.throttle.pump()
+
+    def _on_session_timeout(self, reason):
+        self.log.warning(f'session timed out: {reason}, disconnecting')
+        self.session_timers.stop()
+        self.logged_on = False
+        self._timed_out = reason
+        self.transport.close()
 
     def reconnect(self):
-        self.sock.close()
+        if self.session_timers is not None:
+            self.session_timers.stop()
+        self.transport.close()
         self.logged_on = False
         self.seqnum = 1
+        self.session_epoch += 1
+        if self.metrics is not None:
+            self.metrics.inc('fix_reconnects_total')
         self.connect()
         if self.auto:
             self.logon_recv_response()
 
     def close(self):
-        self.sock.close()
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if self.session_timers is not None:
+            self.session_timers.stop()
+        self.transport.close()
+        for capture in self.captures:
+            capture.close()
+        if self.metrics is not None and self._own_metrics:
+            self.metrics.close()
+
+    def _session_dispatcher(self, unexpected):
+        def raise_unexpected(prmsg):
+            raise UnexpectedMessageException(unexpected, offending_msg=prmsg)
+
+        def seqnum_off(prmsg):
+            raise UnexpectedMessageException(
+                'seqnum is off', offending_msg=prmsg)
+
+        dispatcher = fix.Dispatcher(default=raise_unexpected,
+                                    validation=self.inbound_validation)
+        dispatcher.register(b'1', handler=self._answer_test_request)
+        dispatcher.register(b'2', handler=seqnum_off)
+        return dispatcher
+
+    def _answer_test_request(self, prmsg):
+        self.log.debug(f'<<: testreq {prmsg}, sending heartbeat')
+        self.send_heartbeat(prmsg[112])
+
+    def _on_logon_response(self, prmsg):
+        self.log.info('logged on response rcvd')
+        if self.session_timers is not None:
+            self.session_timers.logon_complete()
+            self.session_timers.start()
+        return True
+
+    def _on_logout_response(self, prmsg):
+        self.log.info(f'logged out response rcvd {prmsg}')
+        self.logged_on = False
+        if self.session_timers is not None:
+            self.session_timers.stop()
+        return True
 
     def logon_recv_response(self):
         self.logon()
-        while True:
-            rmsg = self.recv_fix(log_level=logging.DEBUG)
-            prmsg = fix.Message.parse(rmsg)
-            if prmsg.msgtype == b'A':
-                self.log.info('logged on response rcvd')
-                break
-            elif prmsg.msgtype == b'1':
-                self.log.debug(
-                    f'<<: testreq {ch_delim(rmsg)}, sending heartbeat')
-                self.send_heartbeat(prmsg[112])
-            elif prmsg.msgtype == b'2':
-                raise UnexpectedMessageException(
-                    'seqnum is off', offending_msg=prmsg)
-            else:
-                raise UnexpectedMessageException(
-                    'non logon response', offending_msg=prmsg)
+        while not self.logon_dispatcher.dispatch(
+                self.recv_fix(log_level=logging.DEBUG)):
+            pass
 
     def logout_recv_response(self):
         self.logout()
-        while True:
-            rmsg = self.recv_fix(log_level=logging.DEBUG)
-            prmsg = fix.Message.parse(rmsg)
-            if prmsg.msgtype == b'8':
-                self.log.info(f'ack msg for others rcvd {prmsg}')
-            elif prmsg.msgtype == b'5':
-                self.log.info(f'logged out response rcvd {prmsg}')
-                self.logged_on = False
-                break
-            elif prmsg.msgtype == b'1':
-                self.log.debug(
-                    f'<<: testreq {ch_delim(rmsg)}, sending heartbeat')
-                self.send_heartbeat(prmsg[112])
-            elif prmsg.msgtype == b'2':
-                raise UnexpectedMessageException(
-                    'seqnum is off', offending_msg=prmsg)
-            else:
-                raise UnexpectedMessageException(
-                    'non logout response', offending_msg=prmsg)
+        while not self.logout_dispatcher.dispatch(
+                self.recv_fix(log_level=logging.DEBUG)):
+            pass
 
     def __enter__(self):
         self.connect()
@@ -163,33 +294,314 @@ class FixClient():
                    raise Exception('got exception {}', sys.exc_info())
             #self.close()
     def send_msg(self, msg: bytes, log_level=logging.INFO):
-        self.sock.sendall(msg)
-        if self.filter_tags:
-            filtered_bmsg = b'| '.join(
-                t + b': ' + v for t, v in iter_rawmsg(msg)
-                if int(t.decode()) not in self.filter_tags)
-            self.log.log(log_level, f'>>: {filtered_bmsg}')
+        with self.send_lock:
+            self._send_msg(msg, log_level)
+
+    def _send_msg(self, msg: bytes, log_level):
+        if self.throttle is None:
+            self._write_msg(msg, log_level)
+            return
+        origclordid = peek_tag(msg, b'41')
+        if origclordid is not None and self.throttle.queued(origclordid):
+            # it can't go ahead of that order, nor wait behind it with a
+            # seqnum lower than those stamped on the queue meanwhile
+            raise ValueError(
+                'OrigClOrdID {} is still in the throttle queue, create the '
+                'message with new_msg(seq=False) and queue() it'.format(
+                    origclordid.decode()))
+        # already carries its seqnum: ahead of anything queued, which is
+        # only stamped when it goes out, once its own tokens are there
+        self.throttle.send_now(msg, peek_tag(msg, b'35'), log_level)
+
+    def queue(self, msg: fix.Message, log_level=logging.INFO, priority=None):
+        """
+        send msg through the throttle queue, where cancels go ahead of
+        amends and new orders, though never ahead of the order they refer
+        to (41); its MsgSeqNum (34) and SendingTime (52) are
+        set when it leaves the queue, so create it with new_msg(seq=False).
+        flush() waits for the queue to empty
+        """
+        if self.throttle is None:
+            self._send_queued(msg, log_level)
+            return
+        with self.send_lock:
+            self.throttle.submit(msg, msg.msgtype, log_level,
+                                 priority=priority, clordid=msg.get(11),
+                                 origclordid=msg.get(41))
+            self.throttle.pump()
+
+    def flush(self):
+        """ block until the throttle queue is empty """
+        if self.throttle is None:
+            return
+        while True:
+            # not held while sleeping, other threads may send meanwhile
+            with self.send_lock:
+                wait = self.throttle.pump()
+            if wait is None:
+                return
+            self.throttle.sleep(wait)
+
+    def _send_queued(self, msg, log_level):
+        if not isinstance(msg, fix.Message):
+            self._write_msg(msg, log_level)
+            return
+        with self.send_lock:
+            msg.reset(seqnum=self.seq(), clordid=False, transacttime=False)
+            self._write_msg(self._build(msg), log_level)
+        if msg._pool is not None:
+            msg._pool.release(msg)
+
+    def _write_msg(self, msg: bytes, log_level):
+        hook = HOOKS.send
+        if hook is None:
+            self.transport.sendall(msg)
+        else:
+            hook.call(msg, self.transport.sendall, msg)
+        if self.session_timers is not None:
+            self.session_timers.on_send()
+        if self.order_store is not None:
+            self.order_store.on_outbound(msg)
+        if self.metrics is not None:
+            self._count_traffic(OUTBOUND, msg)
+        self._log_traffic(OUTBOUND, msg, log_level)
+
+    def _count_traffic(self, direction, msg):
+        metrics = self.metrics
+        msgtype = peek_tag(msg, b'35', default=b'')
+        label = msgtype.decode()
+        if direction == INBOUND:
+            metrics.inc('fix_messages_in_total', label)
+            metrics.inc('fix_bytes_in_total', label, len(msg))
+            if msgtype in REJECT_MSGTYPES or msgtype == b'8' and \
+                    peek_tag(msg, b'39') == b'8':
+                metrics.inc('fix_rejects_total', label)
         else:
-            self.log.log(log_level, f'>>: {ch_delim(msg)}')
-        with open('traffic.log','a+') as traffic_log:
-             traffic_log.write('client sent >> OMS session:' + msg.decode())
-             traffic_log.write('\n')
-             traffic_log.close()
+            metrics.inc('fix_messages_out_total', label)
+            metrics.inc('fix_bytes_out_total', label, len(msg))
+        if msgtype == b'2':
+            metrics.inc('fix_resend_requests_total',
+                        'in' if direction == INBOUND else 'out')
+
+    def _build(self, msg):
+        if self.metrics is None:
+            return bytes(msg)
+        start = time.perf_counter()
+        raw = bytes(msg)
+        self.metrics.observe('fix_build_seconds',
+                             time.perf_counter() - start,
+                             msg.get(35, b'').decode())
+        return raw
+
+    def _log_traffic(self, direction, msg, log_level):
+        hook = HOOKS.log
+        if hook is not None:
+            return hook.call(msg, self._write_traffic, direction, msg,
+                             log_level)
+        return self._write_traffic(direction, msg, log_level)
+
+    def _write_traffic(self, direction, msg, log_level):
+        if self.log.isEnabledFor(log_level):
+            arrow = '>>' if direction == OUTBOUND else '<<'
+            if self.filter_tags:
+                filtered_bmsg = b'| '.join(
+                    t + b': ' + v for t, v in iter_rawmsg(msg)
+                    if int(t.decode()) not in self.filter_tags)
+                self.log.log(log_level, f'{arrow}: {filtered_bmsg}')
+            else:
+                self.log.log(log_level, f'{arrow}: {ch_delim(msg)}')
+        for capture in self.captures:
+            capture.write(direction, msg)
 
     def send_recv(self, msg: bytes):
         self.send_msg(msg)
         return self.recv_fix()
 
+    def send(self, msg: fix.Message, log_level=logging.INFO, release=True):
+        # pooled messages go back to their pool once on the wire
+        self.send_msg(self._build(msg), log_level=log_level)
+        if release and msg._pool is not None:
+            msg._pool.release(msg)
+
+    def send_batch(self, msgs, log_level=logging.INFO, release=True):
+        """
+        send msgs (fix.Message, anything with build_into() or bytes, with
+        their seqnums set) in one transport write: each is built straight
+        into a reused buffer instead of going through bytes() and a copy
+        per message. Goes message by message through the throttle when
+        there is one. Returns the number of bytes sent
+        """
+        with self.send_lock:
+            return self._send_batch(msgs, log_level, release)
+
+    def _send_batch(self, msgs, log_level, release):
+        if self.throttle is not None:
+            n = 0
+            for msg in msgs:
+                raw = msg if isinstance(msg, bytes) else self._build(msg)
+                self.send_msg(raw, log_level=log_level)
+                if release and getattr(msg, '_pool', None) is not None:
+                    msg._pool.release(msg)
+                n += len(raw)
+            return n
+        buf = self._batch_buf
+        try:
+            # emptied, build_into() then appends each message to it
+            del buf[:]
+        except BufferError:
+            # a view of the previous batch is still held somewhere
+            buf = self._batch_buf = bytearray()
+        metrics = self.metrics
+        ends = []
+        n = 0
+        for msg in msgs:
+            if isinstance(msg, (bytes, bytearray, memoryview)):
+                buf += msg
+                n += len(msg)
+            elif metrics is not None:
+                start = time.perf_counter()
+                n += msg.build_into(buf, n)
+                metrics.observe('fix_build_seconds',
+                                time.perf_counter() - start,
+                                msg.get(35, b'').decode())
+            else:
+                n += msg.build_into(buf, n)
+            if release and getattr(msg, '_pool', None) is not None:
+                msg._pool.release(msg)
+            ends.append(n)
+        if not ends:
+            return 0
+        with memoryview(buf) as view:
+            hook = HOOKS.send
+            if hook is None:
+                self.transport.sendall(view[:n])
+            else:
+                hook.call(view[:n], self.transport.sendall, view[:n])
+            if self.session_timers is not None:
+                self.session_timers.on_send()
+            if self.order_store is not None or self.captures or \
+                    metrics is not None or self.log.isEnabledFor(log_level):
+                start = 0
+                for end in ends:
+                    raw = bytes(view[start:end])
+                    if self.order_store is not None:
+                        self.order_store.on_outbound(raw)
+                    if metrics is not None:
+                        self._count_traffic(OUTBOUND, raw)
+                    self._log_traffic(OUTBOUND, raw, log_level)
+                    start = end
+        return n
+
+    def pool(self, msgtype_cls: type, **kwargs):
+        """
+        the MessagePool of msgtype_cls, kwargs being the message kwargs it
+        is created with; once it exists they must match them
+        """
+        if 'validation' in kwargs:
+            kwargs['validation'] = fix.validation_level(kwargs['validation'])
+        pool = self.pools.get(msgtype_cls)
+        if pool is None:
+            kwargs.setdefault('validation', self.validation)
+            pool = self.pools[msgtype_cls] = fix.MessagePool(
+                msgtype_cls, maxsize=self.pool_size, **kwargs)
+            return pool
+        for k, v in kwargs.items():
+            if k not in pool.msg_kwargs or pool.msg_kwargs[k] != v:
+                raise ValueError(
+                    'the {} pool was created with {}, not {}={!r}'.format(
+                        msgtype_cls.__name__, pool.msg_kwargs, k, v))
+        return pool
+
+    def pool_stats(self):
+        return {cls.__name__: pool.stats() for cls, pool in self.pools.items()}
+
     def new_msg(self, msgtype_cls: type, extra: OrderedDict=None, seq=True,
-                **kwargs):
+                pooled=False, **kwargs):
+        """
+        seq: take the next seqnum; otherwise 34 is a placeholder unless
+            extra sets it, e.g. for messages given to queue()
+        pooled: take the message from self.pool(msgtype_cls) instead of
+            allocating one; kwargs are those the pool was created with,
+            ValueError if they differ.
+            send() releases it, read any tag needed later before that
+        """
+        if pooled:
+            seq_fill = {34: str(self.seq()).encode() if seq else b'0'}
+            return self.pool(msgtype_cls, **kwargs).acquire(
+                self.header_fill, seq_fill, extra or {})
         d = OrderedDict({**self.header_fill})
-        if seq:
-            d[34] = str(self.seq()).encode()
+        d[34] = str(self.seq()).encode() if seq else b'0'
         d.update(extra)
+        kwargs.setdefault('validation', self.validation)
         return msgtype_cls(fix.Group(d), **kwargs)
 
+    def parse_inbound(self, rmsg: bytes, msgtype_cls: type=fix.Message,
+                      **kwargs):
+        # inbound messages are kept as received: no id/time or
+        # bodylen/checksum rewrite, validated at self.inbound_validation
+        kwargs.setdefault('validation', self.inbound_validation)
+        kwargs.setdefault('validate_construct', bool(kwargs['validation']))
+        if self.metrics is None:
+            return msgtype_cls.parse(rmsg, received=True, **kwargs)
+        start = time.perf_counter()
+        msg = msgtype_cls.parse(rmsg, received=True, **kwargs)
+        self.metrics.observe('fix_parse_seconds', time.perf_counter() - start,
+                             msg.get(35, b'').decode())
+        return msg
+
+    def _recv(self, n):
+        if self.session_timers is None and self.throttle is None:
+            return self.transport.recv(n)
+        while True:
+            if self._timed_out:
+                raise NoMessageResponseException(self._timed_out)
+            self._pump()
+            try:
+                data = self.transport.recv(n)
+            except socket.timeout:
+                self.service_timers()
+                continue
+            # under steady inbound traffic recv never times out
+            self.service_timers()
+            return data
+
+    def _recv_exactly(self, n):
+        data = self._recv(n)
+        while data and len(data) < n:
+            more = self._recv(n - len(data))
+            if not more:
+                break
+            data += more
+        return data
+
     def recv_fix(self, *, up_to_tag9_anchor_len=22, log_level=logging.INFO):
-        msg_recv1 = self.sock.recv(up_to_tag9_anchor_len)
+        while True:
+            hook = HOOKS.receive
+            if hook is None:
+                msg = self._recv_frame(up_to_tag9_anchor_len)
+            else:
+                msg = hook.call(None, self._recv_frame,
+                                up_to_tag9_anchor_len)
+            if self.session_timers is not None:
+                self.session_timers.on_recv()
+            if self.dedup is not None and self.dedup.check(
+                    msg, self.targetcompid + b'/' + self.sendercompid +
+                    b'#' + str(self.session_epoch).encode()):
+                # on the wire all the same, but not handled twice
+                self._log_traffic(INBOUND, msg, logging.DEBUG)
+                self.log.info(f'dropped duplicate {ch_delim(msg)}')
+                if self.metrics is not None:
+                    self.metrics.inc('fix_duplicates_total')
+                continue
+            if self.order_store is not None:
+                self.order_store.on_message(msg)
+            if self.metrics is not None:
+                self._count_traffic(INBOUND, msg)
+            self._log_traffic(INBOUND, msg, log_level)
+            return msg
+
+    def _recv_frame(self, up_to_tag9_anchor_len):
+        msg_recv1 = self._recv_exactly(up_to_tag9_anchor_len)
         if not msg_recv1:
             raise NoMessageResponseException()
 
@@ -200,85 +612,85 @@ class FixClient():
             return int(len_bytes.decode()), len(extra)
         # also get the 7 byte checksum
         body_len, extra = get_bodylen(msg_recv1)
-        msg_recv2 = self.sock.recv(body_len + 7 - extra)
-        msg = msg_recv1 + msg_recv2
-        if self.filter_tags:
-            filtered_bmsg = b'| '.join(
-                t + b': ' + v for t, v in iter_rawmsg(msg)
-                if int(t.decode()) not in self.filter_tags)
-            self.log.log(log_level, f'<<: {filtered_bmsg}')
-        else:
-            self.log.log(log_level, f'<<: {ch_delim(msg)}')
-        with open('traffic.log','a+') as traffic_log:
-             traffic_log.write('OMS sent >> client session:' + msg.decode())
-             traffic_log.write('\n')
-             traffic_log.close()
-        return msg
+        msg_recv2 = self._recv_exactly(body_len + 7 - extra)
+        return msg_recv1 + msg_recv2
+
+    def recv_match(self, match, msgtype_cls: type=fix.Message, **kwargs):
+        """
+        recv_fix() until match(raw), e.g. a fix.prefilter Predicate, and
+        parse_inbound() that message only; the others are just logged
+        """
+        while True:
+            raw = self.recv_fix()
+            if match(raw):
+                return self.parse_inbound(raw, msgtype_cls, **kwargs)
 
     # use the order id & seqnum to find the corresponding ack, once got
     # irrelevant msg, just ignores it.
     def recv_linked_ack_dic(self, org_ordId, org_seqNum):
-        n = self.recv_fix()
-        tmpIncomingMsgDic = fix.Message.parse(n)
-        self.log.debug('got the following msg', tmpIncomingMsgDic)
-        try:
-            tmpIncomingMsg_orderID = tmpIncomingMsgDic[11]
-        except:            
-            return self.recv_linked_ack_dic(org_ordId, org_seqNum)           
-        if tmpIncomingMsg_orderID!=org_ordId:
-            return self.recv_linked_ack_dic(org_ordId, org_seqNum)
-        if int(tmpIncomingMsgDic[34])<int(org_seqNum) and tmpIncomingMsg_orderID==org_ordId:
-            return self.recv_linked_ack_dic(org_ordId, org_seqNum) 
-        return tmpIncomingMsgDic
-
+        match = Tag(11) == org_ordId
+        while True:
+            msg = self.recv_match(match)
+            if msg.get(11) == org_ordId and \
+                    int(msg[34]) >= int(org_seqNum):
+                return msg
 
     # use the order id & seqnum to find the corresponding ack, once got irrelevant msg, just ignores it.
-    def recv_linked_ack_use_id (self, org_ordId):
-        n = self.recv_fix()
-        tmpIncomingMsgDic2 = fix.Message.parse(n)
-        try:
-            tmpIncomingMsg_orderID = tmpIncomingMsgDic2[11]
-        except:
-            return self.recv_linked_ack_use_id(org_ordId)
+    def recv_linked_ack_use_id(self, org_ordId):
+        match = Tag(11) == org_ordId
+        while True:
+            msg = self.recv_match(match)
+            if msg.get(11) == org_ordId:
+                return msg
+
+    def recv_linked_ack_use_clientorderid(self, org_ordId):
+        match = Tag(37) == org_ordId
+        while True:
+            msg = self.recv_match(match)
+            if msg.get(37) == org_ordId:
+                return msg
 
-        if tmpIncomingMsg_orderID!=org_ordId:
-            return self.recv_linked_ack_use_id(org_ordId) 
-        else:
-            return tmpIncomingMsgDic2        
-    
-    def recv_linked_ack_use_clientorderid (self, org_ordId):
-        n = self.recv_fix()
-        tmpIncomingMsgDic = fix.Message.parse(n)
-        try:
-            tmpIncomingMsg_orderID = tmpIncomingMsgDic[37]
-        except:
-            return self.recv_linked_ack_use_clientorderid(org_ordId)
-        if tmpIncomingMsg_orderID!=org_ordId:
-            return self.recv_linked_ack_use_clientorderid(org_ordId)
-        else:
-            return tmpIncomingMsgDic
     def logon(self):
         self.log.info('logging on...')
-        logon_msg = fix.LogonMessage(
-            fix.Group({**self.header_fill,
-                       34: str(self.seq(no_raise=True)).encode(),
-                       108: self.heartbeat})
-        )
-        self.send_msg(bytes(logon_msg), log_level=logging.DEBUG)
+        with self.send_lock:
+            logon_msg = fix.LogonMessage(
+                fix.Group({**self.header_fill,
+                           34: str(self.seq(no_raise=True)).encode(),
+                           108: self.heartbeat}),
+                validation=self.validation
+            )
+            self.send_msg(bytes(logon_msg), log_level=logging.DEBUG)
         self.logged_on = True
+        if self.session_timers is not None and self.logon_timeout:
+            self.session_timers.start_logon(self.logon_timeout)
 
     def logout(self):
         self.log.info('logging out...')
-        logout_msg = fix.LogoutMessage(
-            fix.Group({**self.header_fill,
-                       34: str(self.seq(no_raise=True)).encode(),
-                       })
-        )
-        self.send_msg(bytes(logout_msg), log_level=logging.DEBUG)
+        with self.send_lock:
+            logout_msg = fix.LogoutMessage(
+                fix.Group({**self.header_fill,
+                           34: str(self.seq(no_raise=True)).encode(),
+                           }),
+                validation=self.validation
+            )
+            self.send_msg(bytes(logout_msg), log_level=logging.DEBUG)
         #self.logged_on = False
 
-    def send_heartbeat(self, testReqID):
-        heartbtmsg = fix.message.HeartBeatMessage(
-            {**self.header_fill, 34: str(self.seq(no_raise=True)).encode(),
-             112: testReqID})
-        self.send_msg(bytes(heartbtmsg), log_level=logging.DEBUG)
+    def send_heartbeat(self, testReqID=None):
+        with self.send_lock:
+            fields = {**self.header_fill,
+                      34: str(self.seq(no_raise=True)).encode()}
+            if testReqID is not None:
+                fields[112] = testReqID
+            heartbtmsg = fix.message.HeartBeatMessage(
+                fix.Group(fields), validation=self.validation)
+            self.send_msg(bytes(heartbtmsg), log_level=logging.DEBUG)
+
+    def send_test_request(self):
+        with self.send_lock:
+            testreqmsg = fix.TestRequestMessage(
+                fix.Group({**self.header_fill,
+                           34: str(self.seq(no_raise=True)).encode(),
+                           112: fix_time_now()}),
+                validation=self.validation)
+            self.send_msg(bytes(testreqmsg), log_level=logging.DEBUG)
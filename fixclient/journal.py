@@ -0,0 +1,139 @@
+import heapq
+import os
+import struct
+import time
+
+OUTBOUND = 0
+INBOUND = 1
+
+# traffic.log line prefixes written by FixClient
+TRAFFIC_LOG_PREFIXES = {OUTBOUND: 'client sent >> OMS session:',
+                        INBOUND: 'OMS sent >> client session:'}
+
+JOURNAL_MAGIC = b'FIXJRNL1'
+# direction, capture time (epoch ns), message length
+JOURNAL_RECORD = struct.Struct('<BqI')
+
+
+class TrafficLog():
+
+    def __init__(self, path):
+        """
+        text traffic log, one message per line behind a direction prefix;
+        kept open and flushed per message
+        """
+        self.path = path
+        self._f = None
+
+    def write(self, direction, msg: bytes, ts_ns=None):
+        if self._f is None:
+            self._f = open(self.path, 'a+')
+        self._f.write(TRAFFIC_LOG_PREFIXES[direction] + msg.decode() + '\n')
+        self._f.flush()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class Journal():
+
+    def __init__(self, path):
+        """
+        binary capture: a magic header then, per message, direction, capture
+        time in epoch ns and length followed by the raw message
+        """
+        self.path = path
+        self._f = None
+
+    def write(self, direction, msg: bytes, ts_ns=None):
+        if self._f is None:
+            self._f = open(self.path, 'ab')
+            if self._f.tell() == 0:
+                self._f.write(JOURNAL_MAGIC)
+        self._f.write(JOURNAL_RECORD.pack(
+            direction, time.time_ns() if ts_ns is None else ts_ns,
+            len(msg)) + msg)
+        self._f.flush()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def iter_traffic_log(path, match=None):
+    """
+    (direction, None, raw message) per message line of a traffic log;
+    only the messages match(raw) is true for, e.g. a fix.prefilter
+    Predicate, when given
+    """
+    prefixes = [(d, p.encode()) for d, p in TRAFFIC_LOG_PREFIXES.items()]
+    with open(path, 'rb') as f:
+        for line in f:
+            for direction, prefix in prefixes:
+                if line.startswith(prefix):
+                    msg = line[len(prefix):].rstrip(b'\r\n')
+                    if match is None or match(msg):
+                        yield direction, None, msg
+                    break
+
+
+def iter_journal(path, match=None):
+    """
+    (direction, capture time in epoch ns, raw message) per record, only
+    for the messages match(raw) is true for when given
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+            raise ValueError('{} is not a fix journal'.format(path))
+        size = JOURNAL_RECORD.size
+        while True:
+            head = f.read(size)
+            if len(head) < size:
+                return
+            direction, ts_ns, length = JOURNAL_RECORD.unpack(head)
+            msg = f.read(length)
+            if len(msg) < length:
+                # truncated by a crash while writing
+                return
+            if match is None or match(msg):
+                yield direction, ts_ns, msg
+
+
+def iter_capture(path, match=None):
+    """ iter_journal or iter_traffic_log depending on the file content """
+    with open(path, 'rb') as f:
+        is_journal = f.read(len(JOURNAL_MAGIC)) == JOURNAL_MAGIC
+    if is_journal:
+        return iter_journal(path, match)
+    return iter_traffic_log(path, match)
+
+
+def merge_journals(paths, out_path):
+    """
+    merge journals, e.g. one per fixclient.runner worker, into out_path by
+    capture time, replacing it; missing ones are skipped. Returns the
+    message count
+    """
+    if any(os.path.abspath(p) == os.path.abspath(out_path) for p in paths):
+        raise ValueError('cannot merge a journal into itself')
+    journals = [iter_journal(p) for p in paths if os.path.exists(p)]
+    if os.path.exists(out_path):
+        os.remove(out_path)
+    out = Journal(out_path)
+    n = 0
+    try:
+        for direction, ts_ns, msg in heapq.merge(*journals,
+                                                 key=lambda r: r[1]):
+            out.write(direction, msg, ts_ns)
+            n += 1
+    finally:
+        out.close()
+    return n
+
+
+def capture_writers(traffic_log=None, journal=None):
+    return [w for w in (traffic_log and TrafficLog(traffic_log),
+                        journal and Journal(journal)) if w]
@@ -0,0 +1,258 @@
+"""
+latency breakdown of captured sessions (traffic.log or TrafficJournal):
+every outbound 35=D/G/F is joined with its first ExecutionReport (or
+OrderCancelReject) by ClOrdID (11), falling back on OrigClOrdID (41), and
+the deltas go to log bucket histograms per MsgType, symbol and time of day
+bucket, in one streaming pass with bounded memory
+
+    python -m fixclient.latency capture... [--bucket SECONDS]
+                                          [--max-pending N]
+"""
+import argparse
+import math
+import re
+from collections import OrderedDict
+
+from fix.codec import TimestampCodec
+from fix.util import peek_tag
+from fixclient.journal import iter_capture, INBOUND, OUTBOUND
+
+REQUEST_MSGTYPES = frozenset((b'D', b'G', b'F'))
+RESPONSE_MSGTYPES = frozenset((b'8', b'9'))
+# deltas in ns:
+#   rtt           capture time of the response minus that of the request
+#                 (journals only)
+#   sending_rtt   SendingTime (52) of the response minus that of the request
+#   to_venue      TransactTime (60) of the response minus request SendingTime
+#   from_venue    response SendingTime minus its TransactTime
+METRICS = ('rtt', 'sending_rtt', 'to_venue', 'from_venue')
+PERCENTILES = (50, 90, 99, 99.9, 100)
+
+# ClOrdID, OrigClOrdID, Symbol, SendingTime, TransactTime
+_JOINED = re.compile(b'\x01(11|41|55|52|60)=([^\x01]*)')
+
+
+class LogHistogram():
+
+    __slots__ = ('_log_growth', '_pos', '_neg', 'zero', 'count', 'min',
+                 'max')
+
+    def __init__(self, growth=1.02):
+        """
+        counts of values in buckets growing by growth (2% wide by default,
+        the relative error of percentile()), so its size only depends on
+        the range of the values; negative values, e.g. clock skew between
+        both sides, are kept apart by magnitude
+        """
+        self._log_growth = math.log(growth)
+        self._pos = {}
+        self._neg = {}
+        self.zero = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value > 0:
+            buckets = self._pos
+        elif value < 0:
+            buckets = self._neg
+        else:
+            self.zero += 1
+            buckets = None
+        if buckets is not None:
+            i = int(math.log(abs(value)) / self._log_growth)
+            buckets[i] = buckets.get(i, 0) + 1
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def __len__(self):
+        return len(self._pos) + len(self._neg)
+
+    def _value(self, i, sign):
+        return sign * math.exp((i + .5) * self._log_growth)
+
+    def percentile(self, p):
+        """ nearest rank percentile, None when empty """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(p / 100 * self.count))
+        if rank == self.count:
+            return self.max
+        seen = 0
+        for i in sorted(self._neg, reverse=True):
+            seen += self._neg[i]
+            if seen >= rank:
+                return max(self.min, self._value(i, -1))
+        seen += self.zero
+        if seen >= rank:
+            return 0
+        for i in sorted(self._pos):
+            seen += self._pos[i]
+            if seen >= rank:
+                return min(self.max, self._value(i, 1))
+        return self.max
+
+
+class _Pending():
+
+    __slots__ = ('msgtype', 'symbol', 'bucket', 'ts_ns', 'sending_time')
+
+
+class LatencyAnalyzer():
+
+    def __init__(self, *, bucket_seconds=300, max_pending=100000,
+                 growth=1.02):
+        """
+        feed() captured messages in order; requests still waiting for their
+        response are kept up to max_pending, the oldest then counted as
+        unanswered and dropped. Statistics are LogHistograms per
+        (dimension, key) and metric, dimension being 'all', 'msgtype',
+        'symbol' or 'time' (the bucket_seconds bucket of the request
+        SendingTime, as hh:mm:ss)
+        """
+        self.bucket_seconds = bucket_seconds
+        self.max_pending = max_pending
+        self.growth = growth
+        self._pending = OrderedDict()
+        self._ts = TimestampCodec()
+        self.stats = {}
+        self.requests = 0
+        self.matched = 0
+        self.unanswered = 0
+
+    def _time_bucket(self, sending_time):
+        if not sending_time or len(sending_time) < 17:
+            return None
+        secs = int(sending_time[9:11]) * 3600 + \
+            int(sending_time[12:14]) * 60 + int(sending_time[15:17])
+        secs -= secs % self.bucket_seconds
+        return '{:02d}:{:02d}:{:02d}'.format(
+            secs // 3600, secs // 60 % 60, secs % 60)
+
+    def _decode(self, value):
+        return None if not value else self._ts.decode(value)
+
+    def feed(self, direction, ts_ns, raw):
+        msgtype = peek_tag(raw, b'35')
+        if direction == OUTBOUND and msgtype in REQUEST_MSGTYPES:
+            self._request(msgtype, ts_ns, raw)
+        elif direction == INBOUND and msgtype in RESPONSE_MSGTYPES:
+            self._response(ts_ns, raw)
+
+    def _request(self, msgtype, ts_ns, raw):
+        fields = dict(reversed(_JOINED.findall(raw)))
+        clordid = fields.get(b'11')
+        if clordid is None:
+            return
+        self.requests += 1
+        p = _Pending()
+        p.msgtype = msgtype
+        p.symbol = fields.get(b'55')
+        sending_time = fields.get(b'52')
+        p.bucket = self._time_bucket(sending_time)
+        p.ts_ns = ts_ns
+        p.sending_time = self._decode(sending_time)
+        pending = self._pending
+        pending[clordid] = p
+        pending.move_to_end(clordid)
+        if len(pending) > self.max_pending:
+            pending.popitem(last=False)
+            self.unanswered += 1
+
+    def _response(self, ts_ns, raw):
+        fields = dict(reversed(_JOINED.findall(raw)))
+        p = self._pending.pop(fields.get(b'11'), None)
+        if p is None:
+            p = self._pending.pop(fields.get(b'41'), None)
+            if p is None:
+                # a fill or unsolicited report, not the first response
+                return
+        self.matched += 1
+        sending_time = self._decode(fields.get(b'52'))
+        transact_time = self._decode(fields.get(b'60'))
+        deltas = (
+            None if ts_ns is None or p.ts_ns is None else ts_ns - p.ts_ns,
+            None if sending_time is None or p.sending_time is None
+            else sending_time - p.sending_time,
+            None if transact_time is None or p.sending_time is None
+            else transact_time - p.sending_time,
+            None if sending_time is None or transact_time is None
+            else sending_time - transact_time)
+        keys = [('all', ''), ('msgtype', p.msgtype.decode())]
+        if p.symbol is not None:
+            keys.append(('symbol', p.symbol.decode(errors='replace')))
+        if p.bucket is not None:
+            keys.append(('time', p.bucket))
+        for key in keys:
+            hists = self.stats.get(key)
+            if hists is None:
+                hists = self.stats[key] = [
+                    LogHistogram(self.growth) for _ in METRICS]
+            for hist, delta in zip(hists, deltas):
+                if delta is not None:
+                    hist.add(delta)
+
+    def run(self, paths):
+        """ feed every message of the captures at paths, in order """
+        for path in paths:
+            for direction, ts_ns, raw in iter_capture(path):
+                self.feed(direction, ts_ns, raw)
+        return self
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def table(self, ps=PERCENTILES):
+        """
+        rows of (dimension, key, metric, count, percentile value in ns...)
+        sorted by dimension and key
+        """
+        rows = []
+        for (dimension, key), hists in sorted(self.stats.items()):
+            for metric, hist in zip(METRICS, hists):
+                if hist.count:
+                    rows.append((dimension, key, metric, hist.count,
+                                 *(hist.percentile(p) for p in ps)))
+        return rows
+
+    def format_table(self, ps=PERCENTILES):
+        header = ('dimension', 'key', 'metric', 'count',
+                  *('p{:g} us'.format(p) for p in ps))
+        lines = [header] + [
+            (*row[:3], str(row[3]), *('{:.1f}'.format(v / 1e3)
+                                      for v in row[4:]))
+            for row in self.table(ps)]
+        widths = [max(len(line[i]) for line in lines)
+                  for i in range(len(header))]
+        out = ['  '.join(c.ljust(w) if i < 3 else c.rjust(w)
+                         for i, (c, w) in enumerate(zip(line, widths)))
+               for line in lines]
+        out.append('{} requests, {} answered, {} unanswered, {} pending'
+                   .format(self.requests, self.matched, self.unanswered,
+                           self.pending))
+        return '\n'.join(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fixclient.latency',
+        description='request/response latency percentiles of captures')
+    parser.add_argument('captures', nargs='+',
+                        help='traffic.log or TrafficJournal files, in order')
+    parser.add_argument('--bucket', type=int, default=300,
+                        help='time of day bucket in seconds')
+    parser.add_argument('--max-pending', type=int, default=100000,
+                        help='requests kept waiting for their response')
+    args = parser.parse_args(argv)
+    analyzer = LatencyAnalyzer(bucket_seconds=args.bucket,
+                               max_pending=args.max_pending)
+    print(analyzer.run(args.captures).format_table())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+"""
+on-disk index of traffic logs and TrafficJournals by ClOrdID, OrigClOrdID,
+OrderID, MsgSeqNum and minute, to pull the messages of an order chain out
+of multi-GB captures by seeking instead of grepping. Files are scanned in
+parallel chunks and, when indexed again, only from where the previous run
+stopped
+
+    python -m fixclient.logindex index index.db traffic.log... [--workers N]
+    python -m fixclient.logindex chain index.db CLORDID [--orderid]
+    python -m fixclient.logindex find index.db [--clordid X] [--orderid X]
+                                   [--seqnum N] [--since T] [--until T]
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+
+from fix.util import ch_delim, parse_fix_time
+from fixclient.journal import (
+    JOURNAL_MAGIC, JOURNAL_RECORD, TRAFFIC_LOG_PREFIXES, INBOUND, OUTBOUND)
+
+MINUTE_NS = 60 * 1000000000
+# text logs are split into chunks of about this size for the workers
+CHUNK_SIZE = 32 << 20
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    indexed_to INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS messages (
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    direction INTEGER NOT NULL,
+    ts_ns INTEGER,
+    bucket INTEGER,
+    msgtype BLOB,
+    seqnum INTEGER,
+    clordid BLOB,
+    origclordid BLOB,
+    orderid BLOB);
+CREATE INDEX IF NOT EXISTS messages_clordid ON messages (clordid);
+CREATE INDEX IF NOT EXISTS messages_origclordid ON messages (origclordid);
+CREATE INDEX IF NOT EXISTS messages_orderid ON messages (orderid);
+CREATE INDEX IF NOT EXISTS messages_seqnum ON messages (seqnum);
+CREATE INDEX IF NOT EXISTS messages_bucket ON messages (bucket);
+'''
+# MsgType, MsgSeqNum, OrderID, SendingTime, ClOrdID, OrigClOrdID
+_INDEXED = re.compile(b'\x01(3[457]|52|11|41)=([^\x01]*)')
+COLUMNS = ('file_id', 'offset', 'length', 'direction', 'ts_ns', 'bucket',
+           'msgtype', 'seqnum', 'clordid', 'origclordid', 'orderid')
+
+
+def _row(file_id, offset, direction, ts_ns, raw, minutes):
+    # first occurrence of each indexed tag, in one pass
+    fields = dict(reversed(_INDEXED.findall(raw)))
+    if ts_ns is None:
+        # traffic.log has no capture time, SendingTime (52) instead; the
+        # epoch of each minute is parsed once
+        sending_time = fields.get(b'52')
+        if sending_time and len(sending_time) >= 17:
+            minute = sending_time[:14]
+            base = minutes.get(minute)
+            if base is None:
+                base = minutes[minute] = parse_fix_time(minute + b':00')
+            frac = sending_time[18:27]
+            ts_ns = base + int(sending_time[15:17]) * 1000000000 + (
+                int(frac) * 10 ** (9 - len(frac)) if frac else 0)
+    seqnum = fields.get(b'34')
+    return (file_id, offset, len(raw), direction, ts_ns,
+            None if ts_ns is None else ts_ns // MINUTE_NS,
+            fields.get(b'35'), int(seqnum) if seqnum else None,
+            fields.get(b'11'), fields.get(b'41'), fields.get(b'37'))
+
+
+def _scan_log(file_id, path, start, end):
+    # complete lines of [start, end) only, a line still being written is
+    # left for the next run
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    prefixes = [(d, p.encode()) for d, p in TRAFFIC_LOG_PREFIXES.items()]
+    rows = []
+    minutes = {}
+    pos = 0
+    while True:
+        eol = data.find(b'\n', pos)
+        if eol < 0:
+            break
+        for direction, prefix in prefixes:
+            if data.startswith(prefix, pos):
+                msg_start = pos + len(prefix)
+                raw = data[msg_start:eol].rstrip(b'\r')
+                rows.append(_row(file_id, start + msg_start, direction, None,
+                                 raw, minutes))
+                break
+        pos = eol + 1
+    return rows, start + pos
+
+
+def _scan_journal(file_id, path, start, end):
+    rows = []
+    with open(path, 'rb') as f:
+        if start == 0:
+            if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+                raise ValueError('{} is not a fix journal'.format(path))
+            start = len(JOURNAL_MAGIC)
+        f.seek(start)
+        data = f.read(end - start)
+    size = JOURNAL_RECORD.size
+    pos = 0
+    while pos + size <= len(data):
+        direction, ts_ns, length = JOURNAL_RECORD.unpack_from(data, pos)
+        if pos + size + length > len(data):
+            break
+        raw = data[pos + size:pos + size + length]
+        rows.append(_row(file_id, start + pos + size, direction, ts_ns, raw,
+                         None))
+        pos += size + length
+    return rows, start + pos
+
+
+def _scan(task):
+    file_id, path, kind, start, end = task
+    scan = _scan_journal if kind == 'journal' else _scan_log
+    return scan(file_id, path, start, end)
+
+
+def _log_chunks(path, start, end, chunk_size):
+    # chunk boundaries moved to the next line start
+    bounds = [start]
+    with open(path, 'rb') as f:
+        pos = start + chunk_size
+        while pos < end:
+            f.seek(pos)
+            f.readline()
+            pos = f.tell()
+            if pos >= end:
+                break
+            bounds.append(pos)
+            pos += chunk_size
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _kind(path):
+    with open(path, 'rb') as f:
+        return 'journal' if f.read(len(JOURNAL_MAGIC)) == JOURNAL_MAGIC \
+            else 'log'
+
+
+class LogIndex():
+
+    def __init__(self, db_path):
+        """
+        SQLite index of messages by ClOrdID (11), OrigClOrdID (41), OrderID
+        (37), MsgSeqNum (34) and minute (capture time, SendingTime for
+        traffic logs), pointing at their offset in the indexed files
+        """
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+        self._paths = {}
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _file(self, path):
+        path = os.path.abspath(path)
+        row = self.db.execute(
+            'SELECT id, kind, indexed_to FROM files WHERE path = ?',
+            (path,)).fetchone()
+        size = os.path.getsize(path)
+        if row is not None and size < row[2]:
+            # truncated or rotated: index it again from the start
+            self.db.execute('DELETE FROM messages WHERE file_id = ?',
+                            (row[0],))
+            self.db.execute('UPDATE files SET indexed_to = 0 WHERE id = ?',
+                            (row[0],))
+            row = (row[0], row[1], 0)
+        if row is None:
+            if not size:
+                # nothing to tell a journal from a log by yet
+                return path, size, (None, None, 0)
+            kind = _kind(path)
+            cur = self.db.execute(
+                'INSERT INTO files (path, kind, indexed_to) VALUES (?, ?, 0)',
+                (path, kind))
+            row = (cur.lastrowid, kind, 0)
+        return path, size, row
+
+    def update(self, paths, *, workers=None, chunk_size=CHUNK_SIZE):
+        """
+        index what was appended to paths since the last update, in
+        parallel over files and chunks of text logs; returns the number of
+        messages added
+        """
+        tasks = []
+        # file id -> index of its last task, whose end is the new mark
+        last = {}
+        for path in paths:
+            path, size, (file_id, kind, indexed_to) = self._file(path)
+            if size <= indexed_to:
+                continue
+            chunks = [(indexed_to, size)] if kind == 'journal' else \
+                _log_chunks(path, indexed_to, size, chunk_size)
+            for start, end in chunks:
+                tasks.append((file_id, path, kind, start, end))
+            last[file_id] = len(tasks) - 1
+        added = 0
+        if workers is None:
+            workers = min(len(tasks), multiprocessing.cpu_count())
+        if workers > 1:
+            with multiprocessing.Pool(workers) as pool:
+                added = self._store(tasks, last, pool.imap(_scan, tasks))
+        else:
+            added = self._store(tasks, last, map(_scan, tasks))
+        return added
+
+    def _store(self, tasks, last, results):
+        added = 0
+        insert = 'INSERT INTO messages ({}) VALUES ({})'.format(
+            ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS)))
+        with self.db:
+            for i, (rows, indexed_to) in enumerate(results):
+                self.db.executemany(insert, rows)
+                added += len(rows)
+                file_id = tasks[i][0]
+                if last[file_id] == i:
+                    self.db.execute(
+                        'UPDATE files SET indexed_to = ? WHERE id = ?',
+                        (indexed_to, file_id))
+        return added
+
+    def find(self, *, clordid=None, origclordid=None, orderid=None,
+             seqnum=None, since=None, until=None, direction=None):
+        """
+        index rows (dicts of COLUMNS and path) of the messages matching all
+        the criteria given, in capture order; since/until are epoch ns
+        """
+        where, args = [], []
+        for column, value in (('clordid', clordid),
+                              ('origclordid', origclordid),
+                              ('orderid', orderid), ('seqnum', seqnum),
+                              ('direction', direction)):
+            if value is not None:
+                where.append('{} = ?'.format(column))
+                args.append(value)
+        # bucket first so the minute index narrows the range
+        if since is not None:
+            where += ['bucket >= ?', 'ts_ns >= ?']
+            args += [since // MINUTE_NS, since]
+        if until is not None:
+            where += ['bucket <= ?', 'ts_ns < ?']
+            args += [until // MINUTE_NS, until]
+        sql = 'SELECT {}, path FROM messages JOIN files ON files.id = ' \
+            'file_id'.format(', '.join('messages.' + c for c in COLUMNS))
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY file_id, offset'
+        return [dict(zip(COLUMNS + ('path',), row))
+                for row in self.db.execute(sql, args)]
+
+    def order_chain(self, clordid: bytes=None, *, orderid: bytes=None):
+        """
+        index rows of every message of the order clordid (or orderid)
+        belongs to: followed through OrigClOrdID (41) links of amends and
+        cancels both ways and the OrderIDs (37) of the acks, but for the
+        37=NONE of rejects which many unrelated orders share
+        """
+        clordids = set() if clordid is None else {clordid}
+        orderids = set() if orderid is None else {orderid}
+        rows = {}
+        todo_c, todo_o = set(clordids), set(orderids)
+        while todo_c or todo_o:
+            found = []
+            for c in todo_c:
+                found += self.find(clordid=c) + self.find(origclordid=c)
+            for o in todo_o:
+                found += self.find(orderid=o)
+            todo_c, todo_o = set(), set()
+            for row in found:
+                rows[row['file_id'], row['offset']] = row
+                for c in (row['clordid'], row['origclordid']):
+                    if c is not None and c not in clordids:
+                        clordids.add(c)
+                        todo_c.add(c)
+                o = row['orderid']
+                if o is not None and o != b'NONE' and o not in orderids:
+                    orderids.add(o)
+                    todo_o.add(o)
+        return [rows[k] for k in sorted(rows)]
+
+    def read(self, row):
+        """ raw message of an index row """
+        f = self._paths.get(row['path'])
+        if f is None:
+            f = self._paths[row['path']] = open(row['path'], 'rb')
+        f.seek(row['offset'])
+        return f.read(row['length'])
+
+    def messages(self, rows):
+        """ (row, raw message) per row, reading each file in order """
+        try:
+            for row in rows:
+                yield row, self.read(row)
+        finally:
+            for f in self._paths.values():
+                f.close()
+            self._paths = {}
+
+
+def _print(index, rows, out=None):
+    out = out or sys.stdout
+    arrows = {OUTBOUND: '>>', INBOUND: '<<'}
+    for row, raw in index.messages(rows):
+        out.write('{} {}:{} {}\n'.format(
+            arrows[row['direction']], os.path.basename(row['path']),
+            row['offset'], ch_delim(raw).decode(errors='replace')))
+
+
+def _time_ns(value):
+    return int(value) if value.isdigit() else parse_fix_time(value.encode())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m fixclient.logindex')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('index', help='index new traffic of captures')
+    p.add_argument('db')
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--workers', type=int, default=None)
+    p = sub.add_parser('chain', help='messages of the order of an id')
+    p.add_argument('db')
+    p.add_argument('id')
+    p.add_argument('--orderid', action='store_true',
+                   help='id is an OrderID (37) instead of a ClOrdID')
+    p = sub.add_parser('find', help='messages matching all criteria')
+    p.add_argument('db')
+    for name in ('clordid', 'origclordid', 'orderid'):
+        p.add_argument('--' + name, type=str.encode)
+    p.add_argument('--seqnum', type=int)
+    p.add_argument('--since', type=_time_ns,
+                   help='yyyymmdd-hh:mm:ss[.fff] UTC as in a FIX '
+                        'UTCTimestamp, or epoch ns')
+    p.add_argument('--until', type=_time_ns, help='same as --since')
+    args = parser.parse_args(argv)
+
+    with LogIndex(args.db) as index:
+        if args.command == 'index':
+            added = index.update(args.paths, workers=args.workers)
+            print(f'{added} messages indexed')
+        elif args.command == 'chain':
+            key = args.id.encode()
+            _print(index, index.order_chain(orderid=key) if args.orderid
+                   else index.order_chain(key))
+        else:
+            _print(index, index.find(
+                clordid=args.clordid, origclordid=args.origclordid,
+                orderid=args.orderid, seqnum=args.seqnum, since=args.since,
+                until=args.until))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import http.server
+import json
+import os
+import threading
+import time
+
+# name -> (type, label name, help) of the metrics FixClient records;
+# summaries are kept as <name>_sum and <name>_count
+METRICS = {
+    'fix_messages_in_total': (
+        'counter', 'msgtype', 'messages received'),
+    'fix_messages_out_total': (
+        'counter', 'msgtype', 'messages sent'),
+    'fix_bytes_in_total': (
+        'counter', 'msgtype', 'bytes received'),
+    'fix_bytes_out_total': (
+        'counter', 'msgtype', 'bytes sent'),
+    'fix_rejects_total': (
+        'counter', 'msgtype',
+        'rejects received: 35=3, 35=j, 35=9 and 35=8 with 39=8'),
+    'fix_resend_requests_total': (
+        'counter', 'direction', 'ResendRequests (35=2) sent and received'),
+    'fix_duplicates_total': (
+        'counter', None, 'PossDup/PossResend messages dropped as seen'),
+    'fix_reconnects_total': (
+        'counter', None, 'reconnect() calls'),
+    'fix_parse_seconds': (
+        'summary', 'msgtype', 'time spent parsing inbound messages'),
+    'fix_build_seconds': (
+        'summary', 'msgtype', 'time spent serializing outbound messages'),
+    'fix_queue_depth': (
+        'gauge', 'session', 'messages waiting in the throttle queue'),
+}
+REJECT_MSGTYPES = frozenset((b'3', b'j', b'9'))
+
+
+class MetricsRegistry():
+
+    def __init__(self, metrics=None):
+        """
+        counters and summaries kept per thread: inc() and observe() only
+        touch a dict of the calling thread, without any lock, and
+        snapshot() adds them up; gauges are functions called by snapshot().
+        metrics: name -> (type, label name, help) for the Prometheus
+        export, METRICS by default
+        """
+        self.metrics = METRICS if metrics is None else metrics
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._gauges = {}
+        self._dump_thread = None
+        self._stop = threading.Event()
+        self.server = None
+
+    @classmethod
+    def from_config(cls, section, **kwargs):
+        """
+        Metrics: record metrics, on as well when either of these is set
+        MetricsFile, MetricsDumpInterval: JSON snapshot written to
+            MetricsFile every MetricsDumpInterval seconds (10 by default)
+        MetricsPort: Prometheus text on http://127.0.0.1:<port>/metrics;
+        returns None when off
+        """
+        path = section.get('MetricsFile', '')
+        port = section.get('MetricsPort', '')
+        if not (path or port or section.getboolean('Metrics', False)):
+            return None
+        registry = cls(**kwargs)
+        if path:
+            registry.start_dump(
+                path, float(section.get('MetricsDumpInterval', '') or 10))
+        if port:
+            registry.serve(int(port))
+        return registry
+
+    def _shard(self):
+        try:
+            return self._local.counts
+        except AttributeError:
+            counts = self._local.counts = {}
+            with self._shards_lock:
+                self._shards.append(counts)
+            return counts
+
+    def inc(self, name, label='', n=1):
+        counts = self._shard()
+        key = (name, label)
+        counts[key] = counts.get(key, 0) + n
+
+    def observe(self, name, value, label=''):
+        """ one value, e.g. seconds, of the summary name """
+        counts = self._shard()
+        key = (name + '_sum', label)
+        counts[key] = counts.get(key, 0) + value
+        key = (name + '_count', label)
+        counts[key] = counts.get(key, 0) + 1
+
+    def gauge(self, name, func, label=None):
+        """
+        func() returns the value of name for label, when a snapshot is
+        taken; without a label, the unlabeled value or a dict of label ->
+        value. A shared registry gets one gauge per label, e.g. per
+        session; registering the same name and label again replaces it
+        """
+        self._gauges[name, label] = func
+
+    def snapshot(self):
+        """ {name: {label: value}}, '' being the label of unlabeled ones """
+        out = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # a copy is atomic, the thread may be counting meanwhile
+            for (name, label), value in shard.copy().items():
+                values = out.setdefault(name, {})
+                values[label] = values.get(label, 0) + value
+        for (name, label), func in list(self._gauges.items()):
+            value = func()
+            values = out.setdefault(name, {})
+            if label is not None:
+                values[label] = value
+            elif isinstance(value, dict):
+                values.update(value)
+            else:
+                values[''] = value
+        return out
+
+    def dump(self, path):
+        """ snapshot() as JSON, replacing path atomically """
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'time': time.time(), 'metrics': self.snapshot()}, f,
+                      sort_keys=True)
+        os.replace(tmp, path)
+
+    def start_dump(self, path, interval=10.):
+        """ dump(path) every interval seconds from a daemon thread """
+        self.stop_dump()
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                self.dump(path)
+            self.dump(path)
+
+        self._dump_thread = threading.Thread(
+            target=run, name='metrics-dump', daemon=True)
+        self._dump_thread.start()
+
+    def stop_dump(self):
+        """ stop the dump thread after a last dump """
+        if self._dump_thread is not None:
+            self._stop.set()
+            self._dump_thread.join()
+            self._dump_thread = None
+
+    def prometheus_text(self):
+        """ snapshot() in the Prometheus text exposition format """
+        snapshot = self.snapshot()
+        lines = []
+        described = set()
+        for name in sorted(snapshot):
+            base = name
+            for suffix in ('_sum', '_count'):
+                if name.endswith(suffix) and \
+                        name[:-len(suffix)] in self.metrics:
+                    base = name[:-len(suffix)]
+            kind, label_name, text = self.metrics.get(
+                base, ('untyped', 'label', ''))
+            if base not in described:
+                described.add(base)
+                if text:
+                    lines.append('# HELP {} {}'.format(base, text))
+                lines.append('# TYPE {} {}'.format(base, kind))
+            for label, value in sorted(snapshot[name].items()):
+                if label:
+                    label = str(label).replace('\\', '\\\\').replace(
+                        '"', '\\"')
+                    lines.append('{}{{{}="{}"}} {}'.format(
+                        name, label_name or 'label', label, value))
+                else:
+                    lines.append('{} {}'.format(name, value))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=0, host='127.0.0.1'):
+        """
+        Prometheus text on http://host:port/metrics from a daemon thread;
+        port 0 picks a free one, see self.server.server_address
+        """
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever,
+                         name='metrics-http', daemon=True).start()
+        return self.server
+
+    def close(self):
+        self.stop_dump()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,280 @@
+import multiprocessing
+import struct
+import time
+import traceback
+import zlib
+from multiprocessing import shared_memory
+
+import fix
+from fix.util import peek_tag
+
+# ring header: write and read positions, both only ever growing; the data
+# starts on its own cache line
+_POSITIONS = struct.Struct('<QQ')
+_POSITION = struct.Struct('<Q')
+_DATA_OFFSET = 64
+_LEN = struct.Struct('<I')
+# record length of the wrap marker; an empty frame tells workers to stop
+_WRAP = 0xFFFFFFFF
+# kinds of what workers send back
+_RESULT, _ERROR = 0, 1
+
+
+class RingFull(Exception):
+    pass
+
+
+class WorkerDied(Exception):
+    pass
+
+
+class ShmRing():
+
+    def __init__(self, capacity=1 << 20, *, name=None):
+        """
+        single producer single consumer ring of length prefixed frames in
+        multiprocessing.shared_memory; create it with a capacity in the
+        producer and attach with ShmRing(name=ring.name) in the consumer.
+        The producer only writes the write position and the consumer only
+        the read position, so no lock is needed; a frame that doesn't fit
+        before the end of the data area is written at its start behind a
+        wrap marker
+        """
+        if name is None:
+            self.shm = shared_memory.SharedMemory(
+                create=True, size=_DATA_OFFSET + capacity)
+            _POSITIONS.pack_into(self.shm.buf, 0, 0, 0)
+            self.capacity = capacity
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+            self.capacity = self.shm.size - _DATA_OFFSET
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+
+    def __len__(self):
+        """ bytes in use """
+        head, tail = _POSITIONS.unpack_from(self.buf, 0)
+        return head - tail
+
+    def try_push(self, frame: bytes):
+        """ False when the ring is too full for frame now """
+        n = _LEN.size + len(frame)
+        if n > self.capacity // 2:
+            raise ValueError('frame of {} bytes too large for a {} byte '
+                             'ring'.format(len(frame), self.capacity))
+        buf = self.buf
+        head, tail = _POSITIONS.unpack_from(buf, 0)
+        pos = head % self.capacity
+        skip = self.capacity - pos if pos + n > self.capacity else 0
+        if head + skip + n - tail > self.capacity:
+            return False
+        if skip:
+            if skip >= _LEN.size:
+                _LEN.pack_into(buf, _DATA_OFFSET + pos, _WRAP)
+            pos = 0
+        start = _DATA_OFFSET + pos
+        buf[start + _LEN.size:start + n] = frame
+        _LEN.pack_into(buf, start, len(frame))
+        # publish only once the frame is in place
+        _POSITION.pack_into(buf, 0, head + skip + n)
+        return True
+
+    def push(self, frame: bytes, *, timeout=None, spin=1000, alive=None,
+             idle=None):
+        """
+        push frame, spinning then sleeping while the consumer catches up;
+        RingFull after timeout seconds, WorkerDied as soon as alive(), when
+        given, is false while waiting. idle(), when given, is called before
+        each sleep, e.g. to unblock a consumer waiting on the producer
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_push(frame):
+            if spin:
+                spin -= 1
+                continue
+            if idle is not None:
+                idle()
+            if alive is not None and not alive():
+                raise WorkerDied('consumer of ring {} died'.format(self.name))
+            if deadline is not None and time.monotonic() > deadline:
+                raise RingFull('ring {} full'.format(self.name))
+            time.sleep(0.0001)
+
+    def try_pop(self):
+        """ next frame, None when empty; b'' is the stop marker """
+        buf = self.buf
+        head, tail = _POSITIONS.unpack_from(buf, 0)
+        while head != tail:
+            pos = tail % self.capacity
+            if self.capacity - pos >= _LEN.size:
+                (n,) = _LEN.unpack_from(buf, _DATA_OFFSET + pos)
+                if n != _WRAP:
+                    start = _DATA_OFFSET + pos + _LEN.size
+                    frame = bytes(buf[start:start + n])
+                    _POSITION.pack_into(buf, 8, tail + _LEN.size + n)
+                    return frame
+            # wrap marker or too little room left for one
+            tail += self.capacity - pos
+            _POSITION.pack_into(buf, 8, tail)
+        return None
+
+    def pop(self, *, timeout=None, spin=1000):
+        """ next frame, waiting for it; None after timeout seconds """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            frame = self.try_pop()
+            if frame is not None:
+                return frame
+            if spin:
+                spin -= 1
+                continue
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            time.sleep(0.0001)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def clordid_key(raw: bytes):
+    """ ClOrdID (11) of a raw message, b'' when it has none """
+    return peek_tag(raw, b'11', default=b'')
+
+
+def _work(ring_name, handler, results, collect, parse_kwargs):
+    ring = ShmRing(name=ring_name)
+    msgtype_cls = parse_kwargs.pop('msgtype_cls')
+    try:
+        while True:
+            frame = ring.pop()
+            if not frame:
+                break
+            # a bad message or handler bug must not stop the worker: the
+            # producer would block on its full ring
+            try:
+                result = handler(msgtype_cls.parse(frame, **parse_kwargs))
+            except Exception:
+                results.put((_ERROR, (frame, traceback.format_exc())))
+                continue
+            if result is not None and collect:
+                results.put((_RESULT, result))
+    finally:
+        ring.close()
+
+
+class InboundPipeline():
+
+    def __init__(self, handler, workers=None, *, ring_size=1 << 20,
+                 key=clordid_key, collect_results=True,
+                 msgtype_cls=fix.Message, **parse_kwargs):
+        """
+        parse and handle inbound messages on worker processes: feed() hashes
+        key(raw) (crc32) to pick the SPSC ShmRing of one worker, so the
+        messages of one key (by default the ClOrdID) are handled in arrival
+        order while different keys spread over the cores.
+
+        handler(msg) runs in the workers on msgtype_cls.parse(raw,
+            **parse_kwargs) (kept as received, no validation by default) and
+            must be picklable; what it returns, unless None, is collected
+            by results(). When it raises, the worker goes on with the next
+            message and (raw, traceback text) is added to self.errors
+        """
+        parse_kwargs.setdefault('validation', fix.ValidationLevel.NONE)
+        parse_kwargs.setdefault('reset_id_time', False)
+        parse_kwargs.setdefault('reset_ht', False)
+        parse_kwargs['msgtype_cls'] = msgtype_cls
+        self.key = key
+        self.n_workers = workers or multiprocessing.cpu_count()
+        self.rings = [ShmRing(ring_size) for _ in range(self.n_workers)]
+        self._results = multiprocessing.SimpleQueue()
+        # drained from _results but not yet returned by results()
+        self._collected = []
+        self.fed = 0
+        self.errors = []
+        self.processes = [
+            multiprocessing.Process(
+                target=_work, daemon=True,
+                args=(ring.name, handler, self._results, collect_results,
+                      dict(parse_kwargs)))
+            for ring in self.rings]
+        for p in self.processes:
+            p.start()
+
+    def feed(self, raw: bytes, *, timeout=None):
+        """
+        WorkerDied when the ring is full and its worker is gone; while it
+        waits for room the results are drained, a worker blocked on a full
+        result pipe would never empty its ring
+        """
+        i = zlib.crc32(self.key(raw)) % self.n_workers
+        self.rings[i].push(raw, timeout=timeout,
+                           alive=self.processes[i].is_alive,
+                           idle=self._collect)
+        self.fed += 1
+
+    def run(self, client, *, until=lambda raw: peek_tag(raw, b'35') == b'5'):
+        """
+        feed everything client.recv_fix() returns until until(raw)
+        """
+        while True:
+            raw = client.recv_fix()
+            self.feed(raw)
+            if until(raw):
+                return
+
+    def _collect(self):
+        while not self._results.empty():
+            kind, value = self._results.get()
+            if kind == _ERROR:
+                self.errors.append(value)
+            else:
+                self._collected.append(value)
+
+    def results(self):
+        """ handler results collected so far, drained from the workers """
+        self._collect()
+        out, self._collected = self._collected, []
+        return out
+
+    def close(self, timeout=None):
+        """
+        let the workers finish what was fed, stop them and free the rings;
+        returns the remaining handler results. WorkerDied, once the rings
+        are freed, when a worker did not stop by itself (its results are
+        in the exception's results attribute)
+        """
+        if not self.rings:
+            return []
+        for ring, p in zip(self.rings, self.processes):
+            try:
+                ring.push(b'', timeout=timeout, alive=p.is_alive,
+                          idle=self._collect)
+            except WorkerDied:
+                pass
+        out = []
+        for p in self.processes:
+            while p.is_alive():
+                out += self.results()
+                p.join(0.01)
+        out += self.results()
+        for ring in self.rings:
+            ring.close()
+            ring.unlink()
+        self.rings = []
+        dead = [p.exitcode for p in self.processes if p.exitcode]
+        if dead:
+            error = WorkerDied('{} worker(s) died, exit codes {}'.format(
+                len(dead), dead))
+            error.results = out
+            raise error
+        return out
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
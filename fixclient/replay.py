@@ -0,0 +1,238 @@
+"""
+replay the application messages of a captured session (traffic.log or a
+TrafficJournal) against a session from the ini, at the original pace, N
+times faster or as fast as possible, and compare ack latencies
+
+    python -m fixclient.replay capture [--config ini] [--conn default]
+                                       [--speed N | --afap]
+"""
+import argparse
+import configparser
+import logging
+import threading
+import time
+
+import fix
+from fix.util import peek_tag, parse_fix_time
+from fixclient.fixclient import FixClient
+from fixclient.journal import iter_capture, INBOUND, OUTBOUND
+
+# session level messages are generated by the replaying session itself
+SESSION_MSGTYPES = frozenset((b'0', b'1', b'2', b'3', b'4', b'5', b'A'))
+
+
+def percentiles(values, ps=(50, 90, 99, 100)):
+    """ nearest rank percentiles of values, {} when empty """
+    if not values:
+        return {}
+    values = sorted(values)
+    n = len(values)
+    return {p: values[min(n - 1, max(0, -(-p * n // 100) - 1))] for p in ps}
+
+
+class CapturedMessage():
+
+    __slots__ = ('ts_ns', 'raw', 'msgtype', 'clordid')
+
+    def __init__(self, ts_ns, raw):
+        self.ts_ns = ts_ns
+        self.raw = raw
+        self.msgtype = peek_tag(raw, b'35')
+        self.clordid = peek_tag(raw, b'11')
+
+
+def load_capture(path):
+    """
+    application messages the client sent, in order, and the original ack
+    latency in ns per ClOrdID. Times are the journal capture times or, for
+    traffic.log, the SendingTime (52) of each side
+    """
+    sent = []
+    sent_at = {}
+    latencies = {}
+    for direction, ts_ns, raw in iter_capture(path):
+        if ts_ns is None:
+            sending_time = peek_tag(raw, b'52')
+            ts_ns = parse_fix_time(sending_time) if sending_time else None
+        if direction == OUTBOUND:
+            msg = CapturedMessage(ts_ns, raw)
+            if msg.msgtype in SESSION_MSGTYPES:
+                continue
+            sent.append(msg)
+            if msg.clordid is not None and ts_ns is not None:
+                sent_at[msg.clordid] = ts_ns
+        elif direction == INBOUND and peek_tag(raw, b'35') in (b'8', b'9'):
+            clordid = peek_tag(raw, b'11')
+            if clordid in sent_at and clordid not in latencies \
+                    and ts_ns is not None:
+                latencies[clordid] = ts_ns - sent_at[clordid]
+    return sent, latencies
+
+
+class ReplayReport():
+
+    def __init__(self):
+        self.sent = 0
+        self.acked = 0
+        self.elapsed = 0.
+        # send time minus scheduled time, seconds
+        self.drift = []
+        self.original_latency = []
+        self.replay_latency = []
+
+    @property
+    def throughput(self):
+        return self.sent / self.elapsed if self.elapsed else 0.
+
+    def __str__(self):
+        lines = ['{} sent, {} acked in {:.3f}s: {:.0f} msg/s'.format(
+            self.sent, self.acked, self.elapsed, self.throughput)]
+        drift = percentiles([abs(d) for d in self.drift])
+        if drift:
+            lines.append('pacing drift ms ' + ' '.join(
+                'p{}={:.3f}'.format(p, v * 1e3) for p, v in drift.items()))
+        for name, values in (('original', self.original_latency),
+                             ('replay', self.replay_latency)):
+            pct = percentiles(values)
+            if pct:
+                lines.append('{} ack latency us '.format(name) + ' '.join(
+                    'p{}={:.1f}'.format(p, v / 1e3) for p, v in pct.items()))
+        return '\n'.join(lines)
+
+
+class Replayer():
+
+    def __init__(self, client: FixClient, *, speed=1., ack_timeout=5.,
+                 clock=time.perf_counter, sleep=time.sleep):
+        """
+        client: not connected yet, run() connects, logs on and out
+        speed: 1 keeps the captured pace, 10 is ten times faster, None
+            sends as fast as possible
+        ack_timeout: how long to wait for outstanding acks at the end
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError('speed must be positive or None')
+        self.client = client
+        self.speed = speed
+        self.ack_timeout = ack_timeout
+        self.clock = clock
+        self.sleep = sleep
+        # captured ClOrdID -> ClOrdID sent in the replay, for 41
+        self.clordids = {}
+        self._sent_at = {}
+        self._pending = 0
+        self._acked = threading.Condition()
+        self.report = ReplayReport()
+
+    def rewrite(self, captured: CapturedMessage):
+        """
+        captured message for this session: header from the client, next
+        seqnum, fresh 11/52/60 and 41 pointing at the replayed order
+        """
+        msg = fix.Message.parse(
+            captured.raw, validation=fix.ValidationLevel.NONE,
+            reset_id_time=False, reset_ht=False)
+        msg.update(self.client.header_fill)
+        if 41 in msg:
+            msg[41] = self.clordids.get(msg[41], msg[41])
+        msg.reset(seqnum=self.client.seq(), clordid=11 in msg,
+                  transacttime=60 in msg)
+        if captured.clordid is not None:
+            self.clordids[captured.clordid] = msg[11]
+        msg.validation = self.client.validation
+        return msg
+
+    def _read(self):
+        client = self.client
+        while True:
+            rmsg = client.recv_fix(log_level=logging.DEBUG)
+            now = self.clock()
+            msgtype = peek_tag(rmsg, b'35')
+            if msgtype == b'5':
+                client.logged_on = False
+                return
+            if msgtype == b'1':
+                client.send_heartbeat(peek_tag(rmsg, b'112'))
+            elif msgtype in (b'8', b'9'):
+                sent_at = self._sent_at.pop(peek_tag(rmsg, b'11'), None)
+                if sent_at is not None:
+                    with self._acked:
+                        self.report.replay_latency.append(
+                            (now - sent_at) * 1e9)
+                        self.report.acked += 1
+                        self._pending -= 1
+                        self._acked.notify_all()
+
+    def run(self, messages, original_latencies=None):
+        """
+        replay messages from load_capture() and return the ReplayReport
+        """
+        report = self.report
+        report.original_latency = list((original_latencies or {}).values())
+        client = self.client
+        client.connect()
+        client.seqnum = 1
+        client.logon_recv_response()
+        reader = threading.Thread(target=self._read, daemon=True)
+        reader.start()
+        try:
+            start = self.clock()
+            first_ts = next((m.ts_ns for m in messages
+                             if m.ts_ns is not None), None)
+            for captured in messages:
+                if self.speed is not None and captured.ts_ns is not None:
+                    due = start + \
+                        (captured.ts_ns - first_ts) / 1e9 / self.speed
+                    wait = due - self.clock()
+                    if wait > 0:
+                        self.sleep(wait)
+                    report.drift.append(self.clock() - due)
+                # the reader answers TestRequests meanwhile: the seqnum
+                # taken by rewrite() must go out before its heartbeat's
+                with client.send_lock:
+                    msg = self.rewrite(captured)
+                    raw = bytes(msg)
+                    if captured.clordid is not None:
+                        with self._acked:
+                            self._pending += 1
+                        self._sent_at[msg[11]] = self.clock()
+                    client.send_msg(raw)
+                report.sent += 1
+            with self._acked:
+                self._acked.wait_for(lambda: self._pending <= 0,
+                                     self.ack_timeout)
+            report.elapsed = self.clock() - start
+        finally:
+            client.logout()
+            reader.join(self.ack_timeout)
+            client.close()
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fixclient.replay', description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help='traffic.log or TrafficJournal file')
+    parser.add_argument('--config', default='config_files/fo_fix.ini')
+    parser.add_argument('--conn', default='default',
+                        help='session section of the ini')
+    pace = parser.add_mutually_exclusive_group()
+    pace.add_argument('--speed', type=float, default=1.,
+                      help='pace multiplier, 1 is the original pace')
+    pace.add_argument('--afap', action='store_true',
+                      help='send as fast as possible')
+    parser.add_argument('--ack-timeout', type=float, default=5.)
+    args = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    messages, latencies = load_capture(args.capture)
+    client = FixClient(config, conn_name=args.conn, log_level=logging.WARNING)
+    replayer = Replayer(client, speed=None if args.afap else args.speed,
+                        ack_timeout=args.ack_timeout)
+    print(replayer.run(messages, latencies))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+run nose style scenarios (e.g. sample/test_*.py) over a process pool; each
+worker process logs on with its own session section of the ini, so every
+FixClient(config) a scenario creates there uses that section and writes
+its own traffic log and journal, merged at the end
+
+    python -m fixclient.runner sample/ [more files or dirs]
+        [--config ini] [--sessions s1,s2] [--capture-dir dir]
+"""
+import argparse
+import ast
+import collections
+import configparser
+import contextlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from fixclient.fixclient import FixClient
+from fixclient.journal import merge_journals
+
+PASS, FAIL, ERROR = 'ok', 'FAIL', 'ERROR'
+
+ScenarioResult = collections.namedtuple(
+    'ScenarioResult',
+    'path name session status duration output traceback')
+
+# per worker process
+_session = None
+_modules = {}
+
+
+def collect(paths):
+    """
+    (file, name) of the test* functions and Test*.test* methods, read from
+    the source so nothing is imported in the parent process
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, f) for f in os.listdir(path)
+                            if f.startswith('test') and f.endswith('.py'))
+        else:
+            files.append(path)
+    tests = []
+    for path in files:
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef) and \
+                    node.name.startswith('test'):
+                tests.append((path, node.name))
+            elif isinstance(node, ast.ClassDef) and \
+                    node.name.startswith('Test'):
+                tests += [(path, '{}.{}'.format(node.name, m.name))
+                          for m in node.body
+                          if isinstance(m, ast.FunctionDef) and
+                          m.name.startswith('test')]
+    return tests
+
+
+def sessions_from_config(config):
+    """ the ini sections describing a session """
+    return [s for s in config.sections() if 'OMSSender' in config[s]]
+
+
+def capture_paths(capture_dir, session):
+    """ ini overrides of the traffic log and journal of a session """
+    return {'TrafficLog': os.path.join(capture_dir,
+                                       '{}.traffic.log'.format(session)),
+            'TrafficJournal': os.path.join(capture_dir,
+                                           '{}.journal'.format(session))}
+
+
+def _init_worker(sessions, capture_dir):
+    global _session
+    _session = sessions.get()
+    FixClient.default_conn_name = _session
+    if capture_dir:
+        FixClient.config_overrides = capture_paths(capture_dir, _session)
+
+
+def _module(path):
+    path = os.path.abspath(path)
+    module = _modules.get(path)
+    if module is None:
+        # scenarios may import their neighbours
+        sys.path.insert(0, os.path.dirname(path))
+        name = os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[path] = module
+    return module
+
+
+def _call_fixture(obj, *names):
+    for name in names:
+        fixture = getattr(obj, name, None)
+        if fixture is not None:
+            return fixture()
+
+
+def _run(path, name):
+    module = _module(path)
+    cls_name, _, method = name.rpartition('.')
+    if not cls_name:
+        getattr(module, name)()
+        return
+    inst = getattr(module, cls_name)()
+    _call_fixture(inst, 'setup', 'setUp')
+    try:
+        getattr(inst, method)()
+    finally:
+        _call_fixture(inst, 'teardown', 'tearDown')
+
+
+def run_test(test):
+    """ run one collected test in this worker; returns a ScenarioResult """
+    path, name = test
+    buf = io.StringIO()
+    status, tb = PASS, ''
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+        try:
+            _run(path, name)
+        except AssertionError:
+            status, tb = FAIL, traceback.format_exc()
+        except Exception:
+            status, tb = ERROR, traceback.format_exc()
+    return ScenarioResult(path, name, _session, status,
+                          time.perf_counter() - start, buf.getvalue(), tb)
+
+
+def run_scenarios(tests, sessions, *, capture_dir=None, on_result=None):
+    """
+    run tests from collect() with one worker process per session; results
+    come back in the order of tests, on_result(result) is called as each
+    one finishes. With capture_dir, the worker journals are merged into
+    capture_dir/merged.journal; the captures of a previous run there are
+    replaced
+    """
+    if not sessions:
+        raise ValueError('no session to run the scenarios on')
+    if capture_dir:
+        os.makedirs(capture_dir, exist_ok=True)
+        # the workers append, start from empty captures
+        for session in sessions:
+            for path in capture_paths(capture_dir, session).values():
+                if os.path.exists(path):
+                    os.remove(path)
+    queue = multiprocessing.Queue()
+    for session in sessions:
+        queue.put(session)
+    order = {test: i for i, test in enumerate(tests)}
+    results = [None] * len(tests)
+    with multiprocessing.Pool(len(sessions), _init_worker,
+                              (queue, capture_dir)) as pool:
+        for result in pool.imap_unordered(run_test, tests):
+            results[order[(result.path, result.name)]] = result
+            if on_result is not None:
+                on_result(result)
+    if capture_dir:
+        merge_journals(
+            [capture_paths(capture_dir, s)['TrafficJournal']
+             for s in sessions],
+            os.path.join(capture_dir, 'merged.journal'))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fixclient.runner', description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='scenario files or dirs')
+    parser.add_argument('--config', default='config_files/fo_fix.ini')
+    parser.add_argument('--sessions',
+                        help='comma separated ini sections, default all '
+                             'sections with an OMSSender')
+    parser.add_argument('--capture-dir', default='captures',
+                        help='per session traffic logs and journals, '
+                             'empty to keep the ini paths')
+    args = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    sessions = args.sessions.split(',') if args.sessions else \
+        sessions_from_config(config)
+    tests = collect(args.paths)
+
+    def report(result):
+        print('{:5} {:8.3f}s {:12} {}::{}'.format(
+            result.status, result.duration, result.session, result.path,
+            result.name))
+
+    start = time.perf_counter()
+    results = run_scenarios(tests, sessions, capture_dir=args.capture_dir,
+                            on_result=report)
+    elapsed = time.perf_counter() - start
+    failed = [r for r in results if r.status != PASS]
+    for r in failed:
+        print('\n{} {}::{} on {}\n{}{}'.format(
+            r.status, r.path, r.name, r.session, r.output, r.traceback))
+    counts = collections.Counter(r.status for r in results)
+    print('\nran {} scenarios on {} sessions in {:.1f}s: {} ok, {} failed, '
+          '{} errors'.format(len(results), len(sessions), elapsed,
+                             counts[PASS], counts[FAIL], counts[ERROR]))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import heapq
+import itertools
+import time
+
+
+class TokenBucket():
+
+    def __init__(self, rate: float, burst: float=None, *,
+                 clock=time.monotonic):
+        """
+        rate: tokens added per second
+        burst: bucket capacity, defaults to one second worth of tokens
+        """
+        if rate <= 0:
+            raise ValueError('token bucket rate must be positive')
+        self.rate = rate
+        self.capacity = rate if burst is None else burst
+        self.tokens = self.capacity
+        self.clock = clock
+        self.stamp = clock()
+
+    def _refill(self, now):
+        if now > self.stamp:
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def wait_time(self, n=1, now=None):
+        """ seconds until n tokens are available, 0 if they already are """
+        self._refill(self.clock() if now is None else now)
+        if self.tokens >= n:
+            return 0.
+        return (n - self.tokens) / self.rate
+
+    def try_consume(self, n=1, now=None):
+        self._refill(self.clock() if now is None else now)
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def __repr__(self):
+        return 'TokenBucket(rate={}, burst={})'.format(
+            self.rate, self.capacity)
+
+
+class Throttle():
+
+    # lower goes first; cancels ahead of amends ahead of new orders,
+    # session level messages ahead of everything
+    PRIORITY = {b'0': 0, b'1': 0, b'2': 0, b'4': 0, b'5': 0, b'A': 0,
+                b'F': 1, b'G': 2, b'D': 3}
+    DEFAULT_PRIORITY = 2
+
+    def __init__(self, send, rate: float=None, burst: float=None, *,
+                 msgtype_limits=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        paces calls to send(payload, arg) with a session token bucket and
+        optional per MsgType buckets; what can't go out yet waits in a
+        priority queue (FIFO within a priority, and within a ClOrdID ->
+        OrigClOrdID chain whatever their priorities)
+
+        rate/burst: session limit, None for no session limit
+        msgtype_limits: {msgtype (bytes): (rate, burst or None)}
+        """
+        self.send = send
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = None if rate is None else \
+            TokenBucket(rate, burst, clock=clock)
+        self.msgtype_buckets = {
+            t: TokenBucket(r, b, clock=clock)
+            for t, (r, b) in (msgtype_limits or {}).items()}
+        self._queue = []
+        self._counter = itertools.count()
+        # ClOrdID -> priority of the queued message carrying it
+        self._chains = {}
+        self.sent = 0
+        self.max_depth = 0
+        self.wait_count = 0
+        self.wait_total = 0.
+        self.wait_max = 0.
+
+    @classmethod
+    def from_config(cls, section, send, **kwargs):
+        """
+        ThrottleRate, ThrottleBurst: session limit (messages per second)
+        ThrottleMsgTypes: per MsgType limits, e.g. D:50/100,G:20 for 50/s
+            with bursts of 100 on 35=D and 20/s on 35=G;
+        returns None when neither is configured
+        """
+        rate = float(section.get('ThrottleRate', '') or 0) or None
+        burst = float(section.get('ThrottleBurst', '') or 0) or None
+        limits = {}
+        for item in section.get('ThrottleMsgTypes', '').split(','):
+            item = item.strip()
+            if not item:
+                continue
+            msgtype, _, limit = item.partition(':')
+            r, _, b = limit.partition('/')
+            try:
+                limits[msgtype.strip().encode()] = (
+                    float(r), float(b) if b else None)
+            except ValueError:
+                raise ValueError(
+                    'invalid ThrottleMsgTypes entry: "{}"'.format(item)
+                ) from None
+        if rate is None and not limits:
+            return None
+        return cls(send, rate, burst, msgtype_limits=limits, **kwargs)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def submit(self, payload, msgtype: bytes=None, arg=None, *,
+               priority=None, clordid=None, origclordid=None):
+        """
+        queue payload; nothing is sent until pump() or drain().
+        clordid, origclordid: ClOrdID (11) and OrigClOrdID (41) of payload;
+        an amend or cancel of a queued order waits behind it instead of
+        jumping ahead
+        """
+        if priority is None:
+            priority = self.PRIORITY.get(msgtype, self.DEFAULT_PRIORITY)
+        if origclordid is not None:
+            ahead = self._chains.get(origclordid)
+            if ahead is not None and ahead > priority:
+                priority = ahead
+        if clordid is not None:
+            self._chains[clordid] = priority
+        heapq.heappush(self._queue, (priority, next(self._counter),
+                                     self.clock(), msgtype, payload, arg,
+                                     clordid))
+        if len(self._queue) > self.max_depth:
+            self.max_depth = len(self._queue)
+
+    def queued(self, clordid):
+        """ whether a message with that ClOrdID is waiting """
+        return clordid in self._chains
+
+    def _consume(self, msgtype, now, enqueued):
+        if self.bucket is not None:
+            self.bucket.try_consume(now=now)
+        bucket = self.msgtype_buckets.get(msgtype)
+        if bucket is not None:
+            bucket.try_consume(now=now)
+        waited = now - enqueued
+        self.wait_count += 1
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        self.sent += 1
+
+    def _wait_time(self, msgtype, now):
+        wait = 0. if self.bucket is None else self.bucket.wait_time(now=now)
+        bucket = self.msgtype_buckets.get(msgtype)
+        if bucket is not None:
+            wait = max(wait, bucket.wait_time(now=now))
+        return wait
+
+    def pump(self):
+        """
+        send the queued messages the buckets allow right now; returns the
+        seconds until the next one can go, or None once the queue is empty
+        """
+        queue = self._queue
+        while queue:
+            now = self.clock()
+            _, _, enqueued, msgtype, payload, arg, clordid = queue[0]
+            wait = self._wait_time(msgtype, now)
+            if wait > 0:
+                return wait
+            heapq.heappop(queue)
+            if clordid is not None:
+                self._chains.pop(clordid, None)
+            self._consume(msgtype, now, enqueued)
+            self.send(payload, arg)
+        return None
+
+    def drain(self):
+        """ block until every queued message is sent """
+        wait = self.pump()
+        while wait is not None:
+            self.sleep(wait)
+            wait = self.pump()
+
+    def send_now(self, payload, msgtype: bytes=None, arg=None):
+        """
+        send payload ahead of the queue as soon as its own buckets allow,
+        without waiting for what is queued
+        """
+        start = now = self.clock()
+        wait = self._wait_time(msgtype, now)
+        while wait > 0:
+            self.sleep(wait)
+            now = self.clock()
+            wait = self._wait_time(msgtype, now)
+        self._consume(msgtype, now, start)
+        self.send(payload, arg)
+
+    def stats(self):
+        return {'depth': len(self._queue),
+                'max_depth': self.max_depth,
+                'sent': self.sent,
+                'wait_avg': self.wait_total / self.wait_count
+                if self.wait_count else 0.,
+                'wait_max': self.wait_max}
@@ -0,0 +1,200 @@
+import math
+import time
+
+
+class Timer():
+
+    def __init__(self, wheel, deadline, callback, args):
+        self.wheel = wheel
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.slot = None
+        self.rounds = 0
+        self.active = True
+
+    def cancel(self):
+        self.wheel.cancel(self)
+
+    def __repr__(self):
+        return 'Timer(deadline={}, callback={}, active={})'.format(
+            self.deadline, self.callback, self.active)
+
+
+class TimerWheel():
+
+    def __init__(self, tick=0.1, slots=512, *, clock=time.monotonic):
+        """
+        hashed timer wheel: a timer lands in slot (deadline tick % slots)
+        with the number of full turns left, so schedule() and cancel() are
+        O(1) whatever the number of timers; deadlines are rounded up to
+        the tick. advance() fires what is due and must be called at least
+        about once per tick, by FixClient.recv_fix for the blocking client
+        or by attach_to_loop() for an asyncio loop
+        """
+        self.tick = tick
+        self.clock = clock
+        # dict per slot for O(1) removal, insertion ordered
+        self._slots = [{} for _ in range(slots)]
+        self._tick_count = math.floor(clock() / tick)
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def schedule(self, delay, callback, *args):
+        """ callback(*args) in delay seconds; returns the Timer """
+        now = self.clock()
+        timer = Timer(self, now + delay, callback, args)
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer):
+        # never in the current or past ticks, advance() is past them
+        ticks = max(math.ceil(timer.deadline / self.tick) - self._tick_count,
+                    1)
+        n_slots = len(self._slots)
+        timer.slot = (self._tick_count + ticks) % n_slots
+        timer.rounds = (ticks - 1) // n_slots
+        timer.active = True
+        self._slots[timer.slot][timer] = None
+        self._len += 1
+
+    def cancel(self, timer):
+        if timer.active:
+            del self._slots[timer.slot][timer]
+            timer.active = False
+            self._len -= 1
+
+    def time_to_next_tick(self):
+        return max((self._tick_count + 1) * self.tick - self.clock(), 0.)
+
+    def advance(self, now=None):
+        """ fire the timers due by now; returns how many fired """
+        target = math.floor((self.clock() if now is None else now) /
+                            self.tick)
+        fired = 0
+        n_slots = len(self._slots)
+        while self._tick_count < target:
+            self._tick_count += 1
+            slot = self._slots[self._tick_count % n_slots]
+            if not slot:
+                continue
+            for timer in list(slot):
+                if not timer.active:
+                    continue
+                if timer.rounds:
+                    timer.rounds -= 1
+                    continue
+                del slot[timer]
+                timer.active = False
+                self._len -= 1
+                timer.callback(*timer.args)
+                fired += 1
+        return fired
+
+    def attach_to_loop(self, loop):
+        """
+        advance the wheel from an asyncio event loop every tick; returns the
+        handle of the next scheduled call, cancel it through detach()
+        """
+        def on_tick():
+            self.advance()
+            self._loop_handle = loop.call_later(
+                self.time_to_next_tick() or self.tick, on_tick)
+        self._loop_handle = loop.call_later(self.tick, on_tick)
+        return self._loop_handle
+
+    def detach(self):
+        handle = getattr(self, '_loop_handle', None)
+        if handle is not None:
+            handle.cancel()
+            self._loop_handle = None
+
+
+class SessionTimers():
+
+    def __init__(self, wheel: TimerWheel, heartbeat_interval: float, *,
+                 on_heartbeat, on_test_request, on_timeout,
+                 transmission_grace=0.2):
+        """
+        heartbeat, TestRequest-on-silence and logon deadlines of one session
+        on a shared wheel:
+            on_heartbeat() when nothing was sent for heartbeat_interval
+            on_test_request() when nothing was received for
+                heartbeat_interval * (1 + transmission_grace)
+            on_timeout(reason) when the TestRequest stays unanswered for as
+                long again, or when the logon isn't answered in time
+
+        on_send/on_recv only store a timestamp; a timer finding traffic since
+        it was armed is re-armed for the remaining time, so busy sessions
+        cost no timer churn
+        """
+        self.wheel = wheel
+        self.heartbeat_interval = heartbeat_interval
+        self.silence_interval = heartbeat_interval * (1 + transmission_grace)
+        self.on_heartbeat = on_heartbeat
+        self.on_test_request = on_test_request
+        self.on_timeout = on_timeout
+        self.last_sent = self.last_recv = wheel.clock()
+        self.test_request_pending = False
+        self._heartbeat_timer = None
+        self._silence_timer = None
+        self._logon_timer = None
+
+    def on_send(self):
+        self.last_sent = self.wheel.clock()
+
+    def on_recv(self):
+        self.last_recv = self.wheel.clock()
+        self.test_request_pending = False
+
+    def start(self):
+        self.stop()
+        self.last_sent = self.last_recv = self.wheel.clock()
+        self._heartbeat_timer = self.wheel.schedule(
+            self.heartbeat_interval, self._heartbeat_due)
+        self._silence_timer = self.wheel.schedule(
+            self.silence_interval, self._silence_due)
+
+    def stop(self):
+        for timer in (self._heartbeat_timer, self._silence_timer,
+                      self._logon_timer):
+            if timer is not None:
+                timer.cancel()
+        self._heartbeat_timer = self._silence_timer = self._logon_timer = \
+            None
+        self.test_request_pending = False
+
+    def start_logon(self, timeout):
+        self._logon_timer = self.wheel.schedule(
+            timeout, self.on_timeout, 'logon timed out')
+
+    def logon_complete(self):
+        if self._logon_timer is not None:
+            self._logon_timer.cancel()
+            self._logon_timer = None
+
+    def _heartbeat_due(self):
+        idle = self.wheel.clock() - self.last_sent
+        # timers never fire early, only float rounding needs the slack
+        if idle + 1e-6 >= self.heartbeat_interval:
+            self.on_heartbeat()
+            idle = 0.
+        self._heartbeat_timer = self.wheel.schedule(
+            self.heartbeat_interval - idle, self._heartbeat_due)
+
+    def _silence_due(self):
+        silent = self.wheel.clock() - self.last_recv
+        if silent + 1e-6 < self.silence_interval:
+            self._silence_timer = self.wheel.schedule(
+                self.silence_interval - silent, self._silence_due)
+            return
+        if self.test_request_pending:
+            self._silence_timer = None
+            self.on_timeout('TestRequest not answered')
+            return
+        self.test_request_pending = True
+        self.on_test_request()
+        self._silence_timer = self.wheel.schedule(
+            self.silence_interval, self._silence_due)
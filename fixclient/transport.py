@@ -0,0 +1,291 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+# not exported by the socket module, value from <asm-generic/socket.h>
+SO_BUSY_POLL = getattr(socket, 'SO_BUSY_POLL',
+                       46 if sys.platform.startswith('linux') else None)
+
+
+class SocketProfile():
+
+    PRESETS = ('default', 'low_latency')
+
+    def __init__(self, *, nodelay=False, quickack=False, rcvbuf=None,
+                 sndbuf=None, busy_poll=None, busy_spin=False,
+                 cpu_affinity=None, keepalive=True):
+        """
+        socket options applied by SocketTransport on connect
+
+        nodelay/quickack: TCP_NODELAY (no Nagle) / TCP_QUICKACK (re-armed
+            after every recv since Linux clears it)
+        rcvbuf/sndbuf: SO_RCVBUF/SO_SNDBUF in bytes
+        busy_poll: SO_BUSY_POLL in microseconds, where available
+        busy_spin: non-blocking socket, recv spins instead of sleeping
+        cpu_affinity: cpus the connecting thread is pinned to through
+            os.sched_setaffinity, where available
+        """
+        self.nodelay = nodelay
+        self.quickack = quickack
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+        self.busy_poll = busy_poll
+        self.busy_spin = busy_spin
+        self.cpu_affinity = cpu_affinity
+        self.keepalive = keepalive
+
+    @classmethod
+    def low_latency(cls, **kwargs):
+        kwargs = {'nodelay': True, 'quickack': True, 'busy_poll': 50,
+                  'busy_spin': True, **kwargs}
+        return cls(**kwargs)
+
+    @classmethod
+    def from_config(cls, section):
+        """
+        SocketProfile=default|low_latency, then any of TCPNoDelay,
+        TCPQuickAck, SoRcvBuf, SoSndBuf, BusyPoll, BusySpin and
+        CpuAffinity (comma separated cpus) override the preset
+        """
+        name = section.get('SocketProfile', 'default').strip().lower() or \
+            'default'
+        if name not in cls.PRESETS:
+            raise ValueError('unknown socket profile: "{}"'.format(name))
+        kwargs = {}
+        for key, attr in (('TCPNoDelay', 'nodelay'),
+                          ('TCPQuickAck', 'quickack'),
+                          ('BusySpin', 'busy_spin')):
+            if section.get(key, ''):
+                kwargs[attr] = section.getboolean(key)
+        for key, attr in (('SoRcvBuf', 'rcvbuf'), ('SoSndBuf', 'sndbuf'),
+                          ('BusyPoll', 'busy_poll')):
+            if section.get(key, ''):
+                kwargs[attr] = section.getint(key)
+        cpus = section.get('CpuAffinity', '')
+        if cpus:
+            kwargs['cpu_affinity'] = {int(c) for c in cpus.split(',')}
+        return cls.low_latency(**kwargs) if name == 'low_latency' else \
+            cls(**kwargs)
+
+    def apply(self, sock, *, tcp=True):
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        if self.sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        if self.busy_poll and SO_BUSY_POLL is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, SO_BUSY_POLL,
+                                self.busy_poll)
+            except PermissionError:
+                # raising it above net.core.busy_poll needs CAP_NET_ADMIN
+                pass
+        if tcp:
+            if self.keepalive:
+                # keep the socket alive rather than disconnect after a
+                # time out period
+                set_keepalive_linux(sock)
+            if self.nodelay:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.rearm_quickack(sock)
+        if self.cpu_affinity and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, self.cpu_affinity)
+
+    def rearm_quickack(self, sock):
+        if self.quickack and hasattr(socket, 'TCP_QUICKACK'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+    def __repr__(self):
+        return 'SocketProfile({})'.format(', '.join(
+            '{}={}'.format(k, v) for k, v in vars(self).items()))
+
+
+class Transport():
+    """
+    byte stream FixClient talks to; connect() may be called again after
+    close() to reconnect
+    """
+
+    # underlying socket, if any
+    sock = None
+
+    def connect(self):
+        pass
+
+    def sendall(self, data: bytes):
+        raise NotImplementedError
+
+    def recv(self, n: int) -> bytes:
+        """ up to n bytes, b'' once the peer closed """
+        raise NotImplementedError
+
+    def settimeout(self, timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+class SocketTransport(Transport):
+
+    def __init__(self, family, address, *, profile: SocketProfile=None):
+        self.family = family
+        self.address = address
+        self.profile = profile or SocketProfile()
+        self.timeout = None
+        self.sock = None
+
+    def _setup(self, sock):
+        self.profile.apply(sock, tcp=False)
+
+    def connect(self):
+        self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+        self._setup(self.sock)
+        self.sock.connect(self.address)
+        if self.profile.busy_spin:
+            self.sock.setblocking(False)
+        elif self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+
+    def sendall(self, data):
+        if not self.profile.busy_spin:
+            self.sock.sendall(data)
+            return
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[self.sock.send(view):]
+            except BlockingIOError:
+                pass
+
+    def recv(self, n):
+        if not self.profile.busy_spin:
+            data = self.sock.recv(n)
+        else:
+            data = self._spin_recv(n)
+        if self.profile.quickack:
+            self.profile.rearm_quickack(self.sock)
+        return data
+
+    def _spin_recv(self, n):
+        recv = self.sock.recv
+        deadline = None if self.timeout is None else \
+            time.monotonic() + self.timeout
+        while True:
+            try:
+                return recv(n)
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise socket.timeout('busy spin recv timed out')
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+        if not self.profile.busy_spin and self.sock is not None:
+            self.sock.settimeout(timeout)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, self.address)
+
+
+class TcpTransport(SocketTransport):
+
+    def __init__(self, host, port, *, profile: SocketProfile=None):
+        super().__init__(socket.AF_INET, (host, port), profile=profile)
+
+    def _setup(self, sock):
+        self.profile.apply(sock, tcp=True)
+
+
+class UnixTransport(SocketTransport):
+
+    def __init__(self, path, *, profile: SocketProfile=None):
+        super().__init__(socket.AF_UNIX, path, profile=profile)
+
+
+def set_keepalive_linux(sock, after_idle_sec=1, interval_sec=3, max_fails=5):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, after_idle_sec)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval_sec)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, max_fails)
+
+
+class LoopbackTransport(Transport):
+
+    def __init__(self):
+        """
+        one end of an in-process byte pipe, see loopback_pair(); if the
+        peer has a handler, sendall() calls it synchronously with the data
+        instead of buffering it, so a simulated acceptor can answer without
+        any thread
+        """
+        self.peer = None
+        self.handler = None
+        self.timeout = None
+        self._inbox = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def connect(self):
+        for end in (self, self.peer):
+            if end is not None:
+                with end._cond:
+                    end._closed = False
+                    end._inbox.clear()
+
+    def sendall(self, data):
+        peer = self.peer
+        if self._closed or peer is None or peer._closed:
+            raise BrokenPipeError('loopback transport closed')
+        if peer.handler is not None:
+            peer.handler(data)
+            return
+        with peer._cond:
+            peer._inbox += data
+            peer._cond.notify()
+
+    def recv(self, n):
+        with self._cond:
+            if not self._inbox and not self._closed:
+                if not self._cond.wait_for(
+                        lambda: self._inbox or self._closed, self.timeout):
+                    raise socket.timeout('loopback recv timed out')
+            data = bytes(self._inbox[:n])
+            del self._inbox[:n]
+            return data
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def close(self):
+        for end in (self, self.peer):
+            if end is not None:
+                with end._cond:
+                    end._closed = True
+                    end._cond.notify_all()
+
+
+def loopback_pair():
+    a, b = LoopbackTransport(), LoopbackTransport()
+    a.peer, b.peer = b, a
+    return a, b
+
+
+def transport_from_config(section):
+    """
+    Transport=tcp (default, OMSIP/OMSPort) or unix (UnixPath), with the
+    SocketProfile of the section; loopback ends have no address and must be
+    handed to FixClient directly
+    """
+    kind = section.get('Transport', 'tcp').strip().lower() or 'tcp'
+    profile = SocketProfile.from_config(section)
+    if kind == 'tcp':
+        return TcpTransport(section['OMSIP'], section.getint('OMSPort'),
+                            profile=profile)
+    if kind == 'unix':
+        return UnixTransport(section['UnixPath'], profile=profile)
+    raise ValueError('unsupported transport: "{}"'.format(kind))
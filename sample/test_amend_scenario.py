@@ -45,7 +45,7 @@ class TestMessage():
             assert ordAckMsg_C[38] == b'80'
             assert ordAckMsg_C[40] == b'7'
             assert ordAckMsg_C[44] == b'80'
-            assert float(ordAckMsg_C[14])+float(ordAckMsg_C[151]) ==float(ordAckMsg_C[38])
+            assert ordAckMsg_C.decode(14)+ordAckMsg_C.decode(151) ==ordAckMsg_C.decode(38)
             print ('        Order qty, price & type verficiation done for the 1st msg')
             #update the value of tag 41 to the one used in 35=D for building the order chain
             amendmsg [41] = org_ordIDvalue
@@ -62,6 +62,6 @@ class TestMessage():
                 assert amendAckMsg_A[38] == b'880'
                 assert amendAckMsg_A[44] == b'81'
                 assert amendAckMsg_A[40] == b'7'
-                assert float(amendAckMsg_A[14])+float(amendAckMsg_A[151]) ==float(amendAckMsg_A[38])
+                assert amendAckMsg_A.decode(14)+amendAckMsg_A.decode(151) ==amendAckMsg_A.decode(38)
                 print('        Passed verfication for price & qty update in amendment ack msg with order QTY={}, price={}, leaves QTY={}, cum QTY={}, orderType={} '.format(amendAckMsg_A[38], amendAckMsg_A[44], amendAckMsg_A[151],amendAckMsg_A[14],amendAckMsg_A[40]))
 
@@ -0,0 +1,88 @@
+import pickle
+from multiprocessing import shared_memory
+import nose
+from nose.tools import *
+import fix
+from fix.binary import to_buffer, from_buffer, record_size
+
+
+class TestBinary():
+
+    def setup(self):
+        body = (b'35=y\x0134=5\x0149=OMS\x0156=Client\x01320=req1\x01'
+                b'146=3\x01'
+                b'55=2905\x0148=2905\x01107=MAIN\x01167=CS\x01'
+                b'1206=1\x011207=1\x011208=100\x011206=2\x011207=2\x01'
+                b'55=4068\x0148=4068\x01167=CS\x01'
+                b'55=0005\x0148=0005\x011206=1\x011208=5\x01'
+                b'893=Y\x01')
+        header = b'8=FIX.4.2\x019=' + str(len(body)).encode() + b'\x01'
+        checksum = str(sum(header + body) % 256).zfill(3).encode()
+        self.raw = header + body + b'10=' + checksum + b'\x01'
+        self.msg = fix.Message.parse(
+            self.raw, fix.SecurityListMessage.GROUP_STRUCT,
+            reset_id_time=False, reset_ht=False)
+
+    def test_roundtrip(self):
+        buf = to_buffer(self.msg)
+        assert len(buf) == record_size(buf)
+        assert len(buf) < len(pickle.dumps(self.msg)) / 2
+        msg = from_buffer(buf, msgtype_cls=fix.Message)
+        assert bytes(msg) == self.raw
+        assert msg[55][0][1206, 1, 1207] == b'2'
+        assert list(msg.keys()) == list(self.msg.keys())
+        group = from_buffer(buf)
+        assert isinstance(group, fix.Group)
+        assert group == self.msg._initialized_group
+
+    def test_msgtype_cls(self):
+        # same message as parsing the raw one into the class
+        msg = from_buffer(to_buffer(self.msg),
+                          msgtype_cls=fix.SecurityListMessage,
+                          validation='structural')
+        parsed = fix.SecurityListMessage.parse(
+            self.raw, validation='structural', reset_id_time=False,
+            reset_ht=False)
+        assert msg.validation == fix.ValidationLevel.STRUCTURAL
+        assert bytes(msg) == bytes(parsed)
+
+    def test_soh_in_value_and_wide_tags(self):
+        g = fix.Group({8: b'FIX.4.2', 95: b'3', 96: b'a\x01b',
+                       40000: b'x' * 70000})
+        buf = to_buffer(g)
+        assert len(buf) == record_size(buf)
+        assert from_buffer(buf) == g
+
+    def test_empty_group(self):
+        buf = to_buffer(fix.Group())
+        assert len(buf) == record_size(buf)
+        assert from_buffer(buf) == fix.Group()
+        buf = bytearray(64)
+        n = to_buffer(fix.Group(), buf, 8)
+        assert record_size(buf, 8) == n
+        assert len(from_buffer(buf, 8, msgtype_cls=fix.Message)) == 0
+
+    def test_into_buffer(self):
+        buf = bytearray(4096)
+        n1 = to_buffer(self.msg, buf)
+        n2 = to_buffer(self.msg._initialized_group[55][1], buf, n1)
+        assert record_size(buf) == n1
+        assert record_size(buf, n1) == n2
+        assert from_buffer(buf, n1)[55] == b'4068'
+        assert_raises(ValueError, to_buffer, self.msg, bytearray(10))
+        assert_raises(ValueError, from_buffer, bytearray(64))
+
+    def test_shared_memory(self):
+        shm = shared_memory.SharedMemory(create=True, size=4096)
+        try:
+            n = to_buffer(self.msg, shm.buf)
+            other = shared_memory.SharedMemory(shm.name)
+            try:
+                msg = from_buffer(other.buf, msgtype_cls=fix.Message)
+                assert record_size(other.buf) == n
+            finally:
+                other.close()
+            assert bytes(msg) == self.raw
+        finally:
+            shm.close()
+            shm.unlink()
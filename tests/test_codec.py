@@ -0,0 +1,103 @@
+from decimal import Decimal
+import nose
+from nose.tools import *
+import fix
+from fix import codec
+from fix.codec import (
+    DecimalCodec, ScaledIntCodec, TimestampCodec, decode_batch, codec_for)
+
+
+class TestDecimalCodec():
+
+    def setup(self):
+        self.codec = DecimalCodec(cache_size=2)
+
+    def test_decode(self):
+        qty = self.codec.decode(b'0.1') + self.codec.decode(b'0.2')
+        assert qty == self.codec.decode(b'0.3')
+        assert self.codec.decode(b'-80.250') == Decimal('-80.25')
+        assert self.codec.decode(b'0.1') is self.codec.decode(b'0.1')
+        # bounded cache
+        self.codec.decode(b'1')
+        self.codec.decode(b'2')
+        assert len(self.codec._cache) <= 2
+
+    def test_encode(self):
+        assert self.codec.encode(Decimal('80.25')) == b'80.25'
+        assert self.codec.encode(Decimal('1E+2')) == b'100'
+        assert self.codec.encode(100) == b'100'
+        assert self.codec.encode(0.1) == b'0.1'
+        assert self.codec.encode('12.5') == b'12.5'
+        assert self.codec.encode(b'12.5') == b'12.5'
+
+
+class TestScaledIntCodec():
+
+    def setup(self):
+        self.codec = ScaledIntCodec(4)
+
+    def test_roundtrip(self):
+        for raw, n in ((b'80.25', 802500), (b'-0.5', -5000), (b'100', 1000000),
+                       (b'0.0001', 1), (b'-12.0001', -120001)):
+            assert self.codec.decode(raw) == n
+            assert self.codec.encode(n) == raw
+        assert self.codec.decode(b'1.100000') == 11000
+        assert self.codec.decode(b'.5') == 5000
+
+    def test_too_precise(self):
+        assert_raises(ValueError, self.codec.decode, b'1.00001')
+
+
+class TestTimestampCodec():
+
+    def test_roundtrip(self):
+        codec = TimestampCodec()
+        ns = codec.decode(b'20170725-09:29:51.624')
+        assert ns == 1500974991624000000
+        assert codec.encode(ns) == b'20170725-09:29:51.624'
+        assert codec.decode(b'20170725-09:29:51') == 1500974991000000000
+        assert TimestampCodec(0).encode(ns) == b'20170725-09:29:51'
+        us = TimestampCodec(6)
+        assert us.decode(us.encode(ns + 1000)) == ns + 1000
+
+
+class TestMessageCodec():
+
+    def setup(self):
+        self.msg = fix.Message.parse(
+            b'8=FIX.4.2\x019=0\x0135=8\x0134=1\x0149=OMS\x0156=C\x01'
+            b'52=20170725-09:29:51.624\x0111=a\x0114=0.1\x01151=0.2\x01'
+            b'38=0.3\x0144=80.25\x0110=000\x01',
+            validation='none', reset_id_time=False)
+
+    def test_decode(self):
+        msg = self.msg
+        # float(14) + float(151) != float(38)
+        assert msg.decode(14) + msg.decode(151) == msg.decode(38)
+        assert msg.decode(52) == 1500974991624000000
+        assert msg.decode(11) == b'a'
+        assert msg.decode(6) is None
+        assert msg.decode(6, Decimal(0)) == 0
+
+    def test_setters(self):
+        self.msg.qty = Decimal('1.5')
+        self.msg.px = 99.1
+        assert self.msg[38] == b'1.5'
+        assert self.msg[44] == b'99.1'
+        self.msg.qty = 200
+        assert self.msg.qty == b'200'
+
+    def test_batch(self):
+        raw = bytes(self.msg)
+        rows = list(decode_batch([raw, self.msg, {38: b'5'}], (38, 44, 55)))
+        assert rows[0] == rows[1] == (Decimal('0.3'), Decimal('80.25'), None)
+        assert rows[2] == (Decimal(5), None, None)
+
+    def test_register(self):
+        scaled = ScaledIntCodec(2)
+        orig = codec_for(44)
+        codec.register(44, scaled)
+        try:
+            assert self.msg.decode(44) == 8025
+        finally:
+            codec.register(44, orig)
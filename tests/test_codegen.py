@@ -0,0 +1,79 @@
+from collections import OrderedDict
+import nose
+from nose.tools import *
+import fix
+from fix.codegen import (
+    SlotNewOrderMessage,
+    SlotCancelOrderMessage,
+    generate_message_class)
+
+HEADER = [(49, b'Client'), (56, b'OMS'), (34, b'2')]
+ORDER = [(38, b'100'), (40, b'2'), (44, b'10'), (54, b'1'), (55, b'5'),
+         (59, b'0')]
+
+
+def same_ids(slot_msg, msg):
+    for tag in (52, 60, 11):
+        slot_msg[tag] = msg[tag]
+    return slot_msg
+
+
+class TestCodegen():
+
+    def test_build_matches_generic(self):
+        fields = OrderedDict(HEADER + ORDER)
+        msg = fix.NewOrderMessage(fix.Group(OrderedDict(fields)))
+        slot_msg = same_ids(SlotNewOrderMessage(fields), msg)
+        assert bytes(slot_msg) == bytes(msg)
+        assert slot_msg.bodylen == msg.bodylen
+        assert slot_msg.checksum == msg.checksum
+
+        fields = OrderedDict(HEADER + [(41, b'X'), (54, b'1'), (55, b'5')])
+        msg = fix.CancelOrderMessage(fix.Group(OrderedDict(fields)))
+        slot_msg = same_ids(SlotCancelOrderMessage(fields), msg)
+        assert bytes(slot_msg) == bytes(msg)
+
+    def test_parse(self):
+        msg = fix.NewOrderMessage(fix.Group(OrderedDict(HEADER + ORDER)))
+        raw = bytes(msg)
+        slot_msg = SlotNewOrderMessage.parse(raw)
+        assert (slot_msg.px, slot_msg.qty, slot_msg.clordid) == \
+            (b'10', b'100', msg[11])
+        assert slot_msg[44] == b'10' and slot_msg.get(41) is None
+        assert list(slot_msg) == list(msg)
+        assert bytes(slot_msg) == raw
+        assert slot_msg.to_message()[11] == msg[11]
+        assert SlotNewOrderMessage.from_message(msg).symbol == b'5'
+
+    def test_extra_tags(self):
+        raw = bytes(fix.NewOrderMessage(fix.Group(OrderedDict(
+            HEADER + ORDER + [(9999, b'a'), (453, b'1'), (448, b'P')]))))
+        slot_msg = SlotNewOrderMessage.parse(raw)
+        assert slot_msg._extra == [(9999, b'a'), (453, b'1'), (448, b'P')]
+        assert bytes(slot_msg) == raw
+        slot_msg[9999] = b'b'
+        del slot_msg[453]
+        assert list(slot_msg)[-3:] == [9999, 448, 10]
+        assert_raises(KeyError, slot_msg.__delitem__, 453)
+
+    def test_validation(self):
+        fields = OrderedDict(HEADER + ORDER)
+        slot_msg = SlotNewOrderMessage(fields, validation='full')
+        assert slot_msg.is_valid_semantics()
+        slot_msg.px = None
+        # 40=2 (limit) without a price
+        assert not slot_msg.is_valid_semantics()
+        assert_raises(ValueError, bytes, slot_msg)
+
+    def test_generate(self):
+        cls = generate_message_class(fix.NewOrderMessage, (1, 9999),
+                                     name='AccountOrder')
+        assert 'account' in cls.__slots__ and 'tag9999' in cls.__slots__
+        slot_msg = cls(OrderedDict(HEADER + ORDER + [(1, b'ACC')]))
+        assert slot_msg.account == b'ACC'
+        assert_raises(AttributeError, setattr, slot_msg, 'foo', b'')
+        assert 'class AccountOrder(GeneratedMessage)' in cls.SOURCE
+
+
+if __name__ == '__main__':
+    nose.runmodule()
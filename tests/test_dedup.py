@@ -0,0 +1,152 @@
+import configparser
+import logging
+import os
+import nose
+from nose.tools import *
+from fix.dedup import LRUWindow, BloomFilter, DuplicateDetector
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor, frame_message
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+
+
+def report(seq, exec_id, *flags):
+    return frame_message([(35, b'8'), (49, b'OMS'), (56, b'Client'),
+                          (34, str(seq).encode()), *flags,
+                          (37, b'1'), (11, b'C1'), (17, exec_id),
+                          (39, b'0'), (150, b'0')])
+
+
+POSS_DUP = (43, b'Y')
+POSS_RESEND = (97, b'Y')
+
+
+class TestStructures():
+
+    def test_lru(self):
+        window = LRUWindow(2)
+        for key in (b'a', b'b', b'a', b'c'):
+            window.add(key)
+        # b'a' was refreshed, b'b' is the oldest
+        assert b'a' in window and b'c' in window
+        assert b'b' not in window
+        assert len(window) == 2
+
+    def test_bloom(self):
+        bloom = BloomFilter(1000, 0.01)
+        size = bloom.__sizeof__()
+        keys = [b'%d' % i for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+        false_positives = sum(b'x%d' % i in bloom for i in range(10000))
+        assert false_positives < 300
+        # a new generation starts, the previous one is still looked up
+        for i in range(1000):
+            bloom.add(b'y%d' % i)
+        assert all(key in bloom for key in keys)
+        for i in range(1000):
+            bloom.add(b'z%d' % i)
+        assert sum(key in bloom for key in keys) < 50
+        assert bloom.__sizeof__() == size
+
+
+class TestDuplicateDetector():
+
+    def setup(self):
+        self.dedup = DuplicateDetector(4)
+
+    def test_poss_dup(self):
+        assert not self.dedup.check(report(1, b'E1'))
+        assert self.dedup.check(report(1, b'E1', POSS_DUP))
+        # resent under a new MsgSeqNum, caught by its ExecID
+        assert self.dedup.check(report(2, b'E1', POSS_RESEND))
+        # never seen
+        assert not self.dedup.check(report(3, b'E3', POSS_DUP))
+        # without 43/97 nothing is looked up
+        assert not self.dedup.check(report(1, b'E1'))
+        # one window entry per MsgSeqNum, ExecIDs included
+        assert self.dedup.stats() == {'checked': 3, 'duplicates': 2,
+                                      'window': 3}
+
+    def test_session(self):
+        self.dedup.check(report(1, b'E1'), b'A')
+        assert not self.dedup.check(report(1, b'E2', POSS_DUP), b'B')
+        assert self.dedup.check(report(1, b'E3', POSS_DUP), b'A')
+
+    def test_window(self):
+        # the window counts messages, not their two keys
+        self.dedup.check(report(1, b'E1'))
+        for seq in range(2, 5):
+            self.dedup.check(report(seq, b'E%d' % seq))
+        assert self.dedup.check(report(1, b'E1', POSS_DUP))
+        # 1 was refreshed, 2 is the oldest
+        self.dedup.check(report(5, b'E5'))
+        assert not self.dedup.check(report(2, b'E2', POSS_DUP))
+        assert self.dedup.check(report(9, b'E4', POSS_RESEND))
+        assert len(self.dedup._exec_ids) == len(self.dedup.window) == 4
+
+    def test_bloom(self):
+        dedup = DuplicateDetector(4, bloom_capacity=1000)
+        for seq in range(1, 100):
+            dedup.check(report(seq, b'E%d' % seq))
+        assert dedup.check(report(1, b'E1', POSS_DUP))
+        assert len(dedup.window) == 4
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        section = config['default']
+        assert DuplicateDetector.from_config(section) is None
+        section['DedupWindow'] = '10'
+        section['DedupBloomCapacity'] = '100'
+        dedup = DuplicateDetector.from_config(section)
+        assert dedup.window.size == 10
+        assert dedup.bloom.capacity == 100
+
+
+class TestFixClientDedup():
+
+    def setup(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        config['default']['DedupWindow'] = '100'
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING)
+
+    def teardown(self):
+        self.cli.close()
+
+    def push(self, *msgs):
+        for msg in msgs:
+            self.acceptor.transport.sendall(msg)
+
+    def test_recv_fix(self):
+        with self.cli as cli:
+            self.push(report(10, b'E1'), report(10, b'E1', POSS_DUP),
+                      report(11, b'E1', POSS_RESEND),
+                      report(12, b'E2', POSS_DUP))
+            assert b'\x0117=E1\x01' in cli.recv_fix()
+            assert b'\x0117=E2\x01' in cli.recv_fix()
+            assert cli.dedup.duplicates == 2
+
+    def test_reconnect(self):
+        with self.cli as cli:
+            self.push(report(10, b'E1'))
+            cli.recv_fix()
+            cli.reconnect()
+            self.push(report(10, b'E9', POSS_DUP),
+                      report(11, b'E1', POSS_RESEND))
+            # sequence numbers restarted, ExecIDs did not
+            assert b'\x0117=E9\x01' in cli.recv_fix()
+            self.push(report(12, b'E3'))
+            assert b'\x0117=E3\x01' in cli.recv_fix()
+
+
+if __name__ == '__main__':
+    nose.runmodule()
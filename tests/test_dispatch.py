@@ -0,0 +1,112 @@
+import configparser
+import logging
+import os
+import nose
+from nose.tools import *
+import fix
+from fixclient import FixClient
+from fixclient.fixclient import UnexpectedMessageException
+from fixclient.acceptor import SimulatedAcceptor, frame_message
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+
+
+def msg(msgtype, *fields):
+    return frame_message([(35, msgtype), (49, b'OMS'), (56, b'C'),
+                          (34, b'1'), *fields])
+
+
+class TestDispatcher():
+
+    def setup(self):
+        self.seen = []
+        self.dispatcher = fix.Dispatcher()
+
+    def test_parse_into_class(self):
+        raw = msg(b'A', (98, b'0'), (108, b'30'))
+        logon = self.dispatcher.parse(raw)
+        assert type(logon) is fix.LogonMessage
+        # kept as received, no default header/body tags added
+        assert bytes(logon) == raw
+        assert type(self.dispatcher.parse(msg(b'8'))) is fix.Message
+
+    def test_group_struct(self):
+        raw = msg(b'y', (320, b'r'), (146, b'2'), (55, b'1'), (48, b'1'),
+                  (55, b'2'), (48, b'2'))
+        seclist = self.dispatcher.parse(raw)
+        assert type(seclist) is fix.SecurityListMessage
+        assert [g[48] for g in seclist[55]] == [b'1', b'2']
+
+    def test_dispatch(self):
+        self.dispatcher.register(b'0', handler=self.seen.append)
+
+        @self.dispatcher.on(b'0', b'1')
+        def second(m):
+            return m.msgtype
+
+        assert self.dispatcher.dispatch(msg(b'0')) == b'0'
+        assert self.dispatcher.dispatch(msg(b'1')) == b'1'
+        assert [m.msgtype for m in self.seen] == [b'0']
+        assert type(self.seen[0]) is fix.HeartBeatMessage
+        self.dispatcher.unregister(b'0', second)
+        assert self.dispatcher.dispatch(msg(b'0')) is None
+        assert len(self.seen) == 2
+
+    def test_skip_unhandled(self):
+        # not even parsed
+        assert self.dispatcher.dispatch(b'35=8\x01garbage') is None
+        dispatcher = fix.Dispatcher(default=self.seen.append, defaults=False)
+        dispatcher.dispatch(msg(b'A'))
+        assert type(self.seen[0]) is fix.Message
+        assert b'A' not in dispatcher
+
+    def test_register(self):
+        class ExecutionReport(fix.Message):
+            REQ_TAGS = frozenset((37, 17))
+
+        self.dispatcher.register(b'8', ExecutionReport)
+        self.dispatcher.validation = fix.ValidationLevel.FULL
+        assert_raises(ValueError, self.dispatcher.parse, msg(b'8', (37, b'1')))
+        er = self.dispatcher.parse(msg(b'8', (37, b'1'), (17, b'1')))
+        assert type(er) is ExecutionReport
+        assert self.dispatcher[b'8'].msgtype_cls is ExecutionReport
+
+
+class TestClientDispatch():
+
+    def setup(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING)
+
+    def test_logon_logout(self):
+        with self.cli as cli:
+            assert cli.logged_on
+        assert not cli.logged_on
+
+    def test_unexpected(self):
+        self.cli.connect()
+        self.acceptor.on_message = lambda raw: self.acceptor.send(
+            [(35, b'3'), (45, b'1')])
+        assert_raises(UnexpectedMessageException,
+                      self.cli.logon_recv_response)
+
+    def test_extra_handler(self):
+        # e.g. tolerate news while waiting for the logon
+        news = []
+        self.cli.logon_dispatcher.register(b'B', handler=news.append)
+        orig = self.acceptor.on_message
+
+        def on_message(raw):
+            self.acceptor.send([(35, b'B'), (148, b'hello')])
+            orig(raw)
+        self.acceptor.on_message = on_message
+        self.cli.connect()
+        self.cli.logon_recv_response()
+        assert news[0][148] == b'hello'
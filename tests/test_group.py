@@ -39,6 +39,24 @@ class TestGroup():
     def test_build2(self):
         fix.Group().build()
 
+    def test_build_into(self):
+        g = fix.Group(OrderedDict({8: b'FIX v.lol', 350: None}))
+        g.add_inner_group(fix.Group({350: b'1', 351: b'22'}))
+        g.add_inner_group(fix.Group({350: b'aa', 351: b'bb'}))
+        buf = bytearray(b'xx')
+        n = g.build_into(buf, 2)
+        assert buf[2:] == g.build() and n == len(g.build())
+        # inside a bytearray the message is copied over what is there
+        buf = bytearray(b'x' * (n + 4))
+        assert g.build_into(buf, 2) == n
+        assert buf == b'xx' + g.build() + b'xx'
+        # memoryviews do not grow
+        view = memoryview(bytearray(n))
+        assert g.build_into(view) == n and bytes(view) == g.build()
+        assert_raises(ValueError, g.build_into, view, 1)
+        assert_raises(ValueError, g.build_into, bytearray(), 1)
+        assert_raises(ValueError, fix.Group().build_into, bytearray())
+
     def test_id_tag(self):
         g = fix.Group({8: b'8'})
         assert g.id_tag == 8
@@ -93,6 +111,90 @@ class TestGroup():
         g[350, 1, 351] = b'bbb'
         assert_raises(ValueError, g.build)
 
+    def test_validation_levels(self):
+        g = fix.Group({8: b'8'}, req_tags={9})
+        assert not g.is_valid_semantics()
+        assert not g.is_valid_semantics(fix.ValidationLevel.FULL)
+        assert g.is_valid_semantics(fix.ValidationLevel.STRUCTURAL)
+        assert g.is_valid_semantics(fix.ValidationLevel.NONE)
+        g.build(validation=fix.ValidationLevel.STRUCTURAL)
+        assert_raises(ValueError, g.build)
+        g = fix.Group({8: 8})
+        assert not g.is_valid_semantics(fix.ValidationLevel.STRUCTURAL)
+
+    def test_validation_level_coercion(self):
+        assert fix.validation_level(True) == fix.ValidationLevel.FULL
+        assert fix.validation_level(False) == fix.ValidationLevel.NONE
+        assert fix.validation_level(' Structural') == \
+            fix.ValidationLevel.STRUCTURAL
+        assert fix.validation_level(0) == fix.ValidationLevel.NONE
+        assert_raises(ValueError, fix.validation_level, 'strict')
+
+    def test_validity_cache(self):
+        calls = []
+
+        def cond(self_):
+            calls.append(1)
+            return self_[8] != b'bad'
+        g = fix.Group({8: b'8'}, req_cond=[(cond, '8 is bad')])
+        assert g.is_valid_semantics()
+        assert g.is_valid_semantics()
+        assert len(calls) == 1
+        g[8] = b'bad'
+        assert not g.is_valid_semantics()
+        assert g.error_msg == '8 is bad'
+        g[8] = b'good'
+        assert g.is_valid_semantics()
+        assert g.error_msg == ''
+
+    def test_validity_cache_inner_group(self):
+        g = fix.Group(OrderedDict({8: b'FIX v.lol', 350: None}))
+        inner = fix.Group({350: b'1', 351: b'22'}, req_tags={351})
+        g.add_inner_group(inner)
+        assert g.is_valid_semantics()
+        # mutation of the inner group drops the cache of the outer one
+        del inner[351]
+        assert not g.is_valid_semantics()
+        inner[351] = b'1'
+        assert g.is_valid_semantics()
+        del g[350, 0, 351]
+        assert not g.is_valid_semantics()
+
+    def test_validity_cache_inner_group_after_merge(self):
+        g = fix.Group(OrderedDict([(49, b'C'), (56, b'O'), (34, b'2'),
+                                   (38, b'100'), (40, b'1'), (54, b'1'),
+                                   (55, b'5')]))
+        g.add_inner_group(fix.Group(OrderedDict([(448, b'P'), (447, b'D')]),
+                                    req_tags={447}))
+        o = fix.NewOrderMessage(g)
+        assert o.is_valid_semantics()
+        # the inner group now belongs to o as well as to g
+        del o[448][0][447]
+        assert not o.is_valid_semantics()
+        assert not g.is_valid_semantics()
+
+    def test_validity_cache_shared_inner_group(self):
+        inner = fix.Group({350: b'1', 351: b'22'}, req_tags={351})
+        g1 = fix.Group(OrderedDict({8: b'a', 350: None}))
+        g2 = fix.Group(OrderedDict({8: b'b', 350: None}))
+        g1.add_inner_group(inner)
+        g2[350] = [inner]
+        assert g1.is_valid_semantics()
+        assert g2.is_valid_semantics()
+        del inner[351]
+        assert not g1.is_valid_semantics()
+        assert not g2.is_valid_semantics()
+
+    def test_deepcopy_drops_validity_cache(self):
+        g = fix.Group(OrderedDict({8: b'FIX v.lol', 350: None}))
+        g.add_inner_group(fix.Group({350: b'1', 351: b'22'}, req_tags={351}))
+        assert g.is_valid_semantics()
+        g2 = copy.deepcopy(g)
+        assert g2.is_valid_semantics()
+        del g2[350][0][351]
+        assert not g2.is_valid_semantics()
+        assert g.is_valid_semantics()
+
 
 class TestGroupStructure():
 
@@ -0,0 +1,110 @@
+import configparser
+import logging
+import os
+import nose
+from nose.tools import *
+import fix
+from fix.hooks import Hooks, HOOKS, TimingHook, TraceRing, ProfileWindow
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+ORDER = {38: b'100', 40: b'2', 44: b'10', 54: b'1', 55: b'5', 59: b'0'}
+
+
+class Recorder():
+
+    def __init__(self):
+        self.calls = []
+
+    def before(self, point, subject):
+        self.calls.append(('before', point))
+        return len(self.calls)
+
+    def after(self, point, token, result):
+        self.calls.append(('after', point, token))
+
+
+class TestHooks():
+
+    def setup(self):
+        self.hooks = Hooks()
+
+    def test_register(self):
+        assert self.hooks.build is None
+        recorder = self.hooks.register(Recorder(), ['build'])
+        assert self.hooks.parse is None
+        assert self.hooks.build.call(b'', lambda x: x * 2, 2) == 4
+        assert recorder.calls == [('before', 'build'), ('after', 'build', 1)]
+        self.hooks.unregister(recorder)
+        assert self.hooks.build is None
+        assert_raises(ValueError, self.hooks.register, recorder, ['nope'])
+
+    def test_after_on_error(self):
+        timing = self.hooks.register(TimingHook(), ['send'])
+        assert_raises(ZeroDivisionError, self.hooks.send.call, b'',
+                      lambda: 1 / 0)
+        assert timing.stats()['send']['count'] == 1
+
+
+class TestBuiltinHooks():
+
+    def setup(self):
+        HOOKS.clear()
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING)
+
+    def teardown(self):
+        HOOKS.clear()
+        self.cli.close()
+
+    def round_trip(self):
+        with self.cli as cli:
+            cli.send(cli.new_msg(fix.NewOrderMessage, ORDER))
+            cli.parse_inbound(cli.recv_fix())
+
+    def test_timing_and_trace(self):
+        timing = HOOKS.register(TimingHook())
+        trace = HOOKS.register(TraceRing(8))
+        self.round_trip()
+        stats = timing.stats()
+        assert set(stats) == {'parse', 'build', 'validate', 'send',
+                              'receive', 'log'}
+        # logon, order and logout
+        assert stats['send']['count'] == 3
+        assert stats['receive']['count'] == 3
+        # the logon and logout responses as well
+        assert stats['parse']['count'] == 3
+        assert all(s['max_ns'] <= s['total_ns'] for s in stats.values())
+        entries = list(trace)
+        assert len(entries) == 8
+        assert ('receive', b'5') in [(e.point, e.msgtype) for e in entries]
+        assert trace.slowest(1)[0].elapsed_ns == \
+            max(e.elapsed_ns for e in entries)
+
+    def test_profile_window(self):
+        window = ProfileWindow(trace_malloc=True, points=['build']).start()
+        assert HOOKS.build is not None and HOOKS.parse is None
+        self.round_trip()
+        window.stop()
+        assert HOOKS.build is None
+        assert window.stats().total_calls > 0
+        assert '_build' in window.report()
+        assert window.snapshot is not None
+
+    def test_profile_window_seconds(self):
+        window = ProfileWindow(seconds=0).start()
+        self.round_trip()
+        assert not window.active
+        assert all(getattr(HOOKS, p) is None for p in fix.hooks.POINTS)
+
+
+if __name__ == '__main__':
+    nose.runmodule()
@@ -0,0 +1,141 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import nose
+from nose.tools import *
+from fixclient.acceptor import frame_message
+from fixclient.journal import Journal, TrafficLog, INBOUND, OUTBOUND
+from fixclient.latency import LogHistogram, LatencyAnalyzer, main
+
+MS = 1000000
+
+
+def request(msgtype, clordid, sending_time, symbol=b'5', orig=None):
+    fields = [(35, msgtype), (49, b'Client'), (56, b'OMS'), (34, b'2'),
+              (52, sending_time), (11, clordid), (55, symbol)]
+    if orig is not None:
+        fields.append((41, orig))
+    return frame_message(fields)
+
+
+def report(clordid, sending_time, transact_time, orig=None):
+    fields = [(35, b'8'), (49, b'OMS'), (56, b'Client'), (34, b'2'),
+              (52, sending_time), (37, b'1'), (11, clordid)]
+    if orig is not None:
+        fields.append((41, orig))
+    fields += [(39, b'0'), (60, transact_time)]
+    return frame_message(fields)
+
+
+class TestLogHistogram():
+
+    def test_percentiles(self):
+        hist = LogHistogram()
+        assert hist.percentile(50) is None
+        for v in range(1, 10001):
+            hist.add(v)
+        for p in (50, 90, 99):
+            assert abs(hist.percentile(p) / (p * 100) - 1) < 0.02
+        assert hist.percentile(100) == 10000
+        assert hist.percentile(0) >= 1
+        # size depends on the range of the values only
+        assert len(hist) < 500
+
+    def test_signs(self):
+        hist = LogHistogram()
+        for v in (-100, 0, 0, 100):
+            hist.add(v)
+        assert abs(hist.percentile(25) + 100) < 2
+        assert hist.percentile(50) == 0
+        assert hist.percentile(100) == 100
+        assert hist.min == -100
+
+
+class TestLatencyAnalyzer():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.journal = os.path.join(self.tmpdir, 'journal')
+        journal = Journal(self.journal)
+        traffic = [
+            (OUTBOUND, 0, request(b'D', b'A', b'20240102-09:30:00.000')),
+            (OUTBOUND, 1 * MS, request(b'D', b'B', b'20240102-09:30:00.001',
+                                       symbol=b'6')),
+            (INBOUND, 4 * MS, report(b'A', b'20240102-09:30:00.004',
+                                     b'20240102-09:30:00.003')),
+            # a fill of A, not a first response
+            (INBOUND, 5 * MS, report(b'A', b'20240102-09:30:00.005',
+                                     b'20240102-09:30:00.005')),
+            (INBOUND, 9 * MS, report(b'B', b'20240102-09:30:00.009',
+                                     b'20240102-09:30:00.006')),
+            # acked under the OrigClOrdID only
+            (OUTBOUND, 10 * MS, request(b'F', b'C', b'20240102-09:36:00.000',
+                                        orig=b'A')),
+            (INBOUND, 12 * MS, report(b'X', b'20240102-09:36:00.002',
+                                      b'20240102-09:36:00.001', orig=b'C')),
+            # never answered
+            (OUTBOUND, 13 * MS, request(b'G', b'D', b'20240102-09:36:00.003',
+                                        orig=b'A')),
+        ]
+        for direction, ts_ns, raw in traffic:
+            journal.write(direction, raw, ts_ns)
+        journal.close()
+        self.log = os.path.join(self.tmpdir, 'traffic.log')
+        log = TrafficLog(self.log)
+        for direction, _, raw in traffic:
+            log.write(direction, raw)
+        log.close()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def stats(self, analyzer, key, metric):
+        rows = {(r[0], r[1], r[2]): r[3:] for r in analyzer.table((50, 100))}
+        return rows.get(key + (metric,))
+
+    def test_journal(self):
+        analyzer = LatencyAnalyzer(bucket_seconds=300).run([self.journal])
+        assert (analyzer.requests, analyzer.matched, analyzer.pending) == \
+            (4, 3, 1)
+        count, p50, p100 = self.stats(analyzer, ('all', ''), 'rtt')
+        assert count == 3 and p100 == 8 * MS
+        # within the 2% of a histogram bucket
+        assert abs(p50 / (4 * MS) - 1) < 0.02
+        assert self.stats(analyzer, ('msgtype', 'F'), 'rtt') == \
+            (1, 2 * MS, 2 * MS)
+        assert self.stats(analyzer, ('symbol', '6'), 'sending_rtt') == \
+            (1, 8 * MS, 8 * MS)
+        count, _, p100 = self.stats(analyzer, ('all', ''), 'to_venue')
+        assert p100 == 5 * MS
+        assert self.stats(analyzer, ('all', ''), 'from_venue')[2] == 3 * MS
+        assert self.stats(analyzer, ('time', '09:30:00'), 'rtt')[0] == 2
+        assert self.stats(analyzer, ('time', '09:35:00'), 'rtt')[0] == 1
+
+    def test_traffic_log(self):
+        # no capture times, SendingTime/TransactTime deltas only
+        analyzer = LatencyAnalyzer().run([self.log])
+        assert analyzer.matched == 3
+        assert self.stats(analyzer, ('all', ''), 'rtt') is None
+        assert self.stats(analyzer, ('all', ''), 'sending_rtt')[0] == 3
+
+    def test_max_pending(self):
+        analyzer = LatencyAnalyzer(max_pending=1).run([self.journal])
+        # B pushed A out before A's report came
+        assert analyzer.unanswered == 1
+        assert analyzer.matched == 2
+
+    def test_cli(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main([self.journal, '--bucket', '60'])
+        lines = out.getvalue().splitlines()
+        assert lines[0].split()[:4] == ['dimension', 'key', 'metric',
+                                        'count']
+        assert any(line.startswith('time       09:36:00') for line in lines)
+        assert lines[-1] == '4 requests, 3 answered, 0 unanswered, 1 pending'
+
+
+if __name__ == '__main__':
+    nose.runmodule()
@@ -0,0 +1,162 @@
+import configparser
+import contextlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+import nose
+from nose.tools import *
+import fix
+from fix.util import peek_tag
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor, frame_message
+from fixclient.journal import iter_capture, Journal, INBOUND, OUTBOUND
+from fixclient.logindex import LogIndex, main
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+ORDER = {38: b'100', 40: b'2', 44: b'10', 54: b'1', 55: b'5', 59: b'0'}
+
+
+class TestLogIndex():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.log = os.path.join(self.tmpdir, 'traffic.log')
+        self.journal = os.path.join(self.tmpdir, 'journal')
+        self.db = os.path.join(self.tmpdir, 'index.db')
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = self.log
+        config['default']['TrafficJournal'] = self.journal
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING)
+        self.chain = self.session()
+
+    def teardown(self):
+        self.cli.close()
+        shutil.rmtree(self.tmpdir)
+
+    def session(self):
+        """ an order amended then cancelled among other orders """
+        cli = self.cli
+        with cli:
+            send = lambda cls, extra: cli.send_msg(
+                bytes(cli.new_msg(cls, extra))) or cli.recv_fix()
+            order = cli.new_msg(fix.NewOrderMessage, ORDER)
+            cli.send_msg(bytes(order))
+            cli.recv_fix()
+            for _ in range(3):
+                send(fix.NewOrderMessage, ORDER)
+            amend = cli.new_msg(fix.AmendOrderMessage,
+                                {**ORDER, 38: b'50', 41: order[11]})
+            cli.send_msg(bytes(amend))
+            cli.recv_fix()
+            send(fix.NewOrderMessage, ORDER)
+            cancel = cli.new_msg(fix.CancelOrderMessage,
+                                 {54: b'1', 55: b'5', 41: amend[11]})
+            cli.send_msg(bytes(cancel))
+            cli.recv_fix()
+        return [order[11], amend[11], cancel[11]]
+
+    def test_order_chain(self):
+        for path in (self.log, self.journal):
+            db = path + '.db'
+            with LogIndex(db) as index:
+                assert index.update([path]) == 18
+                rows = index.order_chain(self.chain[0])
+                msgs = [raw for _, raw in index.messages(rows)]
+                assert [peek_tag(m, b'35') for m in msgs] == \
+                    [b'D', b'8', b'G', b'8', b'F', b'8']
+                assert {peek_tag(m, b'11') for m in msgs} == set(self.chain)
+                # from any id of the chain, or the OrderID of the acks
+                assert index.order_chain(self.chain[2]) == rows
+                assert index.order_chain(orderid=rows[1]['orderid']) == rows
+                # the messages as captured
+                captured = [m for _, _, m in iter_capture(path)]
+                assert all(m in captured for m in msgs)
+
+    def test_order_chain_rejects(self):
+        # rejects of unrelated orders all carry 37=NONE
+        path = os.path.join(self.tmpdir, 'rejects')
+        journal = Journal(path)
+        for seq, clordid in enumerate((b'R1', b'R2'), 1):
+            journal.write(OUTBOUND, frame_message(
+                [(35, b'D'), (34, b'%d' % seq), (11, clordid), *(
+                    (t, v) for t, v in ORDER.items())]), ts_ns=seq)
+            journal.write(INBOUND, frame_message(
+                [(35, b'8'), (34, b'%d' % seq), (11, clordid), (37, b'NONE'),
+                 (39, b'8'), (150, b'8')]), ts_ns=seq)
+        journal.close()
+        with LogIndex(path + '.db') as index:
+            index.update([path])
+            rows = index.order_chain(b'R1')
+            assert [r['clordid'] for r in rows] == [b'R1', b'R1']
+            assert len(index.order_chain(b'R2')) == 2
+
+    def test_find(self):
+        with LogIndex(self.db) as index:
+            index.update([self.journal])
+            rows = index.find(seqnum=2, direction=OUTBOUND)
+            assert [r['msgtype'] for r in rows] == [b'D']
+            everything = index.find()
+            assert len(everything) == 18
+            ts = [r['ts_ns'] for r in everything]
+            assert index.find(since=ts[5], until=ts[10]) == \
+                [r for r in everything if ts[5] <= r['ts_ns'] < ts[10]]
+
+    def test_incremental(self):
+        with LogIndex(self.db) as index:
+            assert index.update([self.log, self.journal]) == 36
+            assert index.update([self.log, self.journal]) == 0
+            # a line still being written is left for later
+            with open(self.log, 'a') as f:
+                f.write('client sent >> OMS session:8=FIX.4.2')
+            assert index.update([self.log]) == 0
+            with open(self.log, 'a') as f:
+                f.write('\x0135=0\x0134=99\x0110=000\x01\n')
+            assert index.update([self.log]) == 1
+            assert index.find(seqnum=99)[0]['msgtype'] == b'0'
+            chain = self.session()
+            assert index.update([self.log, self.journal]) == 36
+            # in the log and in the journal
+            assert len(index.order_chain(chain[1])) == 12
+        # persisted
+        with LogIndex(self.db) as index:
+            assert len(index.find()) == 73
+
+    def test_truncated(self):
+        with LogIndex(self.db) as index:
+            index.update([self.log])
+            open(self.log, 'w').close()
+            with open(self.log, 'a') as f:
+                f.write('client sent >> OMS session:8=FIX.4.2\x0135=0\x01\n')
+            assert index.update([self.log]) == 1
+            assert len(index.find()) == 1
+
+    def test_parallel(self):
+        with LogIndex(self.db) as index:
+            index.update([self.log, self.journal], workers=1)
+            serial = index.find()
+        os.remove(self.db)
+        with LogIndex(self.db) as index:
+            index.update([self.log, self.journal], workers=2, chunk_size=512)
+            assert index.find() == serial
+
+    def test_cli(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main(['index', self.db, self.log])
+            main(['chain', self.db, self.chain[1].decode()])
+        lines = out.getvalue().splitlines()
+        assert lines[0] == '18 messages indexed'
+        assert len(lines) == 7
+        assert lines[1].startswith('>> traffic.log:')
+
+
+if __name__ == '__main__':
+    nose.runmodule()
@@ -0,0 +1,153 @@
+import nose
+from nose.tools import *
+import fix
+from fix.marketdata import MarketDataBooks, BookSide
+from fixclient.acceptor import frame_message
+
+
+def snapshot(symbol, seq, *levels):
+    fields = [(35, b'W'), (49, b'MD'), (56, b'C'), (34, b'1'), (55, symbol),
+              (83, seq), (268, str(len(levels)).encode())]
+    for side, px, size in levels:
+        fields += [(269, side), (270, px), (271, size)]
+    return frame_message(fields)
+
+
+def incremental(*entries):
+    fields = [(35, b'X'), (49, b'MD'), (56, b'C'), (34, b'2'),
+              (268, str(len(entries)).encode())]
+    for action, side, symbol, px, size, seq in entries:
+        fields += [(279, action), (269, side), (55, symbol), (270, px)]
+        if size is not None:
+            fields.append((271, size))
+        fields.append((83, seq))
+    return frame_message(fields)
+
+
+class TestBookSide():
+
+    def test_order(self):
+        bids, offers = BookSide(-1), BookSide(1)
+        for px in (100, 102, 101):
+            bids.set(px, px * 10)
+            offers.set(px, px * 10)
+        assert bids.best() == (102, 1020)
+        assert offers.best() == (100, 1000)
+        assert [p for p, _ in bids.levels()] == [102, 101, 100]
+        bids.set(102, 5)
+        bids.delete(102)
+        bids.delete(99)
+        assert bids.levels(1) == [(101, 1010)]
+        bids.clear()
+        assert bids.best() is None
+
+
+class TestMarketDataBooks():
+
+    def setup(self):
+        self.gaps = []
+        self.books = MarketDataBooks(
+            price_scale=2, size_scale=0,
+            on_gap=lambda book, *seqs: self.gaps.append((book.symbol, seqs)))
+        self.books.apply(snapshot(b'ABC', b'10',
+                                  (b'0', b'99.5', b'100'),
+                                  (b'0', b'99', b'200'),
+                                  (b'1', b'100.25', b'300')))
+
+    def test_snapshot(self):
+        assert self.books.top(b'ABC') == (9950, 100, 10025, 300)
+        assert self.books.top(b'XYZ') is None
+        book = self.books[b'ABC']
+        assert book.seq == 10 and not book.stale
+        assert book.bids.levels() == [(9950, 100), (9900, 200)]
+        # a new snapshot replaces the book
+        self.books.apply(snapshot(b'ABC', b'20', (b'1', b'101', b'1')))
+        assert book.top() == (None, None, 10100, 1)
+
+    def test_incremental(self):
+        touched = self.books.apply(incremental(
+            (b'0', b'0', b'ABC', b'99.75', b'50', b'11'),
+            (b'1', b'1', b'ABC', b'100.25', b'10', b'12'),
+            (b'2', b'0', b'ABC', b'99.5', None, b'13'),
+            (b'0', b'1', b'XYZ', b'5', b'1', b'1')))
+        assert [b.symbol for b in touched] == [b'ABC', b'XYZ']
+        assert self.books.top(b'ABC') == (9975, 50, 10025, 10)
+        assert self.books[b'ABC'].bids.levels() == [(9975, 50), (9900, 200)]
+        assert self.books.tops()[b'XYZ'] == (None, None, 500, 1)
+        assert self.gaps == []
+
+    def test_gap(self):
+        self.books.apply(incremental(
+            (b'0', b'0', b'ABC', b'99.75', b'50', b'13')))
+        assert self.gaps == [(b'ABC', (11, 13))]
+        assert self.books.gaps == [(b'ABC', 11, 13)]
+        assert self.books[b'ABC'].stale
+        # already applied sequence numbers are skipped
+        self.books.apply(incremental(
+            (b'2', b'0', b'ABC', b'99.75', None, b'12')))
+        assert self.books.top(b'ABC')[:2] == (9975, 50)
+        self.books.apply(snapshot(b'ABC', b'14', (b'0', b'1', b'1')))
+        assert not self.books[b'ABC'].stale
+
+    def test_delete_without_price(self):
+        raw = frame_message([
+            (35, b'X'), (34, b'2'), (268, b'4'),
+            (279, b'0'), (269, b'0'), (278, b'id1'), (55, b'ABC'),
+            (270, b'99.75'), (271, b'5'), (83, b'11'),
+            (279, b'2'), (269, b'0'), (278, b'id1'), (55, b'ABC'),
+            (83, b'12'),
+            (279, b'2'), (269, b'1'), (55, b'ABC'), (290, b'1'),
+            (83, b'13'),
+            (279, b'2'), (269, b'0'), (55, b'ABC'), (83, b'14')])
+        self.books.apply(raw)
+        book = self.books[b'ABC']
+        assert book.bids.levels() == [(9950, 100), (9900, 200)]
+        assert book.offers.levels() == []
+        assert book.entry_ids == {}
+        # the entry with neither 270, 278 nor 290 is skipped
+        assert self.books.malformed == 1
+        assert book.seq == 14
+
+    def test_malformed_entry(self):
+        self.books.apply(incremental(
+            (b'0', b'0', b'ABC', b'abc', b'50', b'11'),
+            (b'0', b'0', b'ABC', b'99.75', b'50', b'12')))
+        assert self.books.malformed == 1
+        assert self.books.top(b'ABC')[:2] == (9975, 50)
+
+    def test_security_id(self):
+        raw = frame_message([(35, b'W'), (34, b'1'), (48, b'ISIN1'),
+                             (83, b'1'), (268, b'1'),
+                             (269, b'0'), (270, b'1'), (271, b'2')])
+        assert [b.symbol for b in self.books.apply(raw)] == [b'ISIN1']
+        raw = frame_message([(35, b'X'), (34, b'2'), (268, b'2'),
+                             (279, b'0'), (269, b'1'), (48, b'ISIN1'),
+                             (270, b'2'), (271, b'3'), (83, b'2'),
+                             (279, b'0'), (269, b'1'), (270, b'2'),
+                             (271, b'3')])
+        assert [b.symbol for b in self.books.apply(raw)] == [b'ISIN1']
+        assert self.books.top(b'ISIN1') == (100, 2, 200, 3)
+        # no instrument at all
+        assert self.books.malformed == 1
+        raw = frame_message([(35, b'W'), (34, b'3'), (268, b'1'),
+                             (269, b'0'), (270, b'1'), (271, b'2')])
+        assert self.books.apply(raw) == []
+        assert self.books.malformed == 2
+        assert None not in self.books
+
+    def test_other_msgtypes(self):
+        raw = frame_message([(35, b'8'), (55, b'ABC'), (268, b'1'),
+                             (269, b'0'), (270, b'1')])
+        assert self.books.apply(raw) == []
+        assert self.books.top(b'ABC') == (9950, 100, 10025, 300)
+
+    def test_dispatcher_group_struct(self):
+        raw = incremental((b'0', b'0', b'ABC', b'1', b'2', b'11'),
+                          (b'0', b'1', b'ABC', b'3', b'4', b'12'))
+        msg = fix.Dispatcher().parse(raw)
+        assert [g[270] for g in msg[279]] == [b'1', b'3']
+        assert bytes(msg) == raw
+
+
+if __name__ == '__main__':
+    nose.runmodule()
@@ -1,6 +1,7 @@
 import fix
 import nose
 from nose.tools import *
+from collections import OrderedDict
 
 
 class TestMessage2():
@@ -130,6 +131,25 @@ class TestMessage():
         del m[9]
         assert m.is_valid_semantics()
 
+    def test_parse_validation_none(self):
+        tlg = fix.GroupStructure({350: fix.GroupStructure([350, 351])})
+        m = fix.Message.parse(self.byte_msg, tlg, validation='none',
+                              reset_id_time=False, reset_ht=False)
+        assert m.validation == fix.ValidationLevel.NONE
+        assert bytes(m) == self.byte_msg
+
+    def test_parse_no_reset(self):
+        tlg = fix.GroupStructure({350: fix.GroupStructure([350, 351])})
+        m = fix.Message.parse(self.byte_msg, tlg,
+                              reset_id_time=False, reset_ht=False)
+        assert 11 not in m
+        assert bytes(m) == self.byte_msg
+        bad = self.byte_msg.replace(b'34=1', b'34=2')
+        assert_raises(ValueError, fix.Message.parse, bad, tlg,
+                      reset_id_time=False, reset_ht=False)
+        fix.Message.parse(bad, tlg, validation=fix.ValidationLevel.STRUCTURAL,
+                          reset_id_time=False, reset_ht=False)
+
 
 class TestMessageWithHeader():
 
@@ -168,6 +188,12 @@ class TestMessageWithHeader():
         del self.msg2[34]
         assert not self.msg2.is_valid_cond()
 
+    def test_bytes_validation_level(self):
+        self.msg[9] = b'99999'
+        assert_raises(ValueError, bytes, self.msg)
+        self.msg.validation = fix.ValidationLevel.STRUCTURAL
+        assert b'\x019=99999\x01' in bytes(self.msg)
+
 
 class TestNewOrderMessage():
 
@@ -184,3 +210,65 @@ class TestNewOrderMessage():
         self.msg.auto_reset = True
         self.msg.qty = 200
         assert self.msg.is_valid_semantics()
+
+    def test_derive_amend(self):
+        amend = self.msg.derive_amend(px=2.5, qty=50, seqnum=2)
+        assert isinstance(amend, fix.AmendOrderMessage)
+        assert amend[35] == b'G' and amend[41] == self.msg[11]
+        assert amend[11] != self.msg[11]
+        assert (amend.px, amend.qty, amend.seqnum) == (b'2.5', b'50', b'2')
+        # BodyLength/CheckSum as a full reset would set them
+        assert amend.is_valid_header_trailer()
+        assert amend.is_valid_cond()
+        assert list(amend)[-1] == 10
+        # the order itself is untouched
+        assert (self.msg[35], self.msg.px, self.msg.seqnum) == \
+            (b'D', b'1', b'1')
+        assert 41 not in self.msg
+        # the seqnum is not carried over unless asked for; without one the
+        # amend can't go out until stamped
+        amend2 = amend.derive_amend({58: b'again'})
+        assert amend2[41] == amend[11] and 34 not in amend2
+        assert amend2.is_valid_header_trailer()
+        assert_raises(ValueError, bytes, amend2)
+        amend2.reset_bodylen_checksum(seqnum=3)
+        assert b'\x0134=3\x01' in bytes(amend2)
+        amend3 = amend.derive_amend({58: b'again'}, keep_seqnum=True)
+        assert amend3.seqnum == b'2' and amend3.is_valid_header_trailer()
+        assert_raises(ValueError, self.msg.derive_amend, {9: b'1'})
+        assert_raises(TypeError, self.msg.derive_amend, price=1)
+        # 40=2 without 44
+        assert_raises(ValueError, self.msg.derive_amend, px=None)
+
+    def test_derive_inner_groups(self):
+        g = fix.Group(OrderedDict([(49, b'S'), (56, b'T'), (34, b'1'),
+                                   (38, b'100'), (40, b'2'), (44, b'1'),
+                                   (54, b'1'), (55, b'fja')]))
+        g.add_inner_group(fix.Group(OrderedDict([(448, b'P'), (447, b'D')]),
+                                    req_tags={447}))
+        msg = fix.NewOrderMessage(g)
+        raw = bytes(msg)
+        amend = msg.derive_amend(qty=50)
+        amend[448, 0, 447] = b'CHANGED'
+        del amend[448][0][448]
+        assert msg[448][0][447] == b'D'
+        assert bytes(msg) == raw
+        assert msg.is_valid_header_trailer() and msg.is_valid_semantics()
+        # inner group edits invalidate the amend, not the order
+        assert not amend.is_valid_semantics()
+
+    def test_derive_validates(self):
+        # a new inner group list is not incremental, still validated
+        assert_raises(ValueError, self.msg.derive_amend,
+                      {44: None, 448: [fix.Group({448: b'P'})]})
+        amend = self.msg.derive_amend({448: [fix.Group({448: b'P'})]})
+        assert amend.is_valid_header_trailer()
+
+    def test_derive_cancel(self):
+        cancel = self.msg.derive_amend(qty=50).derive_cancel(seqnum=3)
+        assert isinstance(cancel, fix.CancelOrderMessage)
+        assert cancel[35] == b'F'
+        assert all(t not in cancel for t in (40, 44))
+        assert cancel.qty == b'50'
+        assert cancel.is_valid_header_trailer()
+        assert b'\x0135=F\x01' in bytes(cancel)
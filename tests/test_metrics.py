@@ -0,0 +1,165 @@
+import configparser
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import urllib.request
+import nose
+from nose.tools import *
+import fix
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor, frame_message
+from fixclient.metrics import MetricsRegistry
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+ORDER = {38: b'100', 40: b'2', 44: b'10', 54: b'1', 55: b'5', 59: b'0'}
+
+
+class TestMetricsRegistry():
+
+    def setup(self):
+        self.metrics = MetricsRegistry()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        self.metrics.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_threads(self):
+        def count():
+            for _ in range(1000):
+                self.metrics.inc('fix_messages_out_total', 'D')
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.metrics.inc('fix_reconnects_total')
+        snapshot = self.metrics.snapshot()
+        assert snapshot['fix_messages_out_total'] == {'D': 4000}
+        assert snapshot['fix_reconnects_total'] == {'': 1}
+
+    def test_prometheus_text(self):
+        self.metrics.inc('fix_bytes_in_total', 'D', 120)
+        self.metrics.observe('fix_parse_seconds', .5, '8')
+        self.metrics.observe('fix_parse_seconds', .25, '8')
+        self.metrics.gauge('fix_queue_depth', lambda: 3, 's1')
+        self.metrics.gauge('fix_queue_depth', lambda: 0, 's2')
+        self.metrics.inc('custom', 'x"y')
+        lines = self.metrics.prometheus_text().splitlines()
+        assert 'fix_bytes_in_total{msgtype="D"} 120' in lines
+        assert lines.count('# TYPE fix_parse_seconds summary') == 1
+        assert 'fix_parse_seconds_sum{msgtype="8"} 0.75' in lines
+        assert 'fix_parse_seconds_count{msgtype="8"} 2' in lines
+        assert 'fix_queue_depth{session="s1"} 3' in lines
+        assert 'fix_queue_depth{session="s2"} 0' in lines
+        assert '# TYPE custom untyped' in lines
+        assert 'custom{label="x\\"y"} 1' in lines
+
+    def test_dump(self):
+        path = os.path.join(self.tmpdir, 'metrics.json')
+        self.metrics.inc('fix_reconnects_total')
+        self.metrics.start_dump(path, 60)
+        # a last dump when stopped
+        self.metrics.stop_dump()
+        with open(path) as f:
+            dumped = json.load(f)
+        assert dumped['metrics'] == {'fix_reconnects_total': {'': 1}}
+
+    def test_serve(self):
+        self.metrics.inc('fix_reconnects_total')
+        host, port = self.metrics.serve().server_address
+        url = 'http://{}:{}/metrics'.format(host, port)
+        with urllib.request.urlopen(url) as response:
+            assert b'fix_reconnects_total 1\n' in response.read()
+        assert_raises(urllib.error.HTTPError, urllib.request.urlopen,
+                      url[:-len('metrics')])
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        assert MetricsRegistry.from_config(config['default']) is None
+        config['default']['Metrics'] = '1'
+        assert MetricsRegistry.from_config(config['default']) is not None
+
+
+class TestFixClientMetrics():
+
+    def setup(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        config['default']['Metrics'] = '1'
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING)
+
+    def teardown(self):
+        self.cli.close()
+
+    def test_session(self):
+        with self.cli as cli:
+            order = cli.new_msg(fix.NewOrderMessage, ORDER)
+            cli.send(order)
+            cli.parse_inbound(cli.recv_fix())
+            batch = [cli.new_msg(fix.NewOrderMessage, ORDER)
+                     for _ in range(2)]
+            cli.send_batch(batch)
+            cli.recv_fix()
+            cli.recv_fix()
+            self.acceptor.send([(35, b'3'), (45, b'2')])
+            cli.recv_fix()
+            # no Logout on a reconnect
+            cli.reconnect()
+        snapshot = cli.metrics.snapshot()
+        assert snapshot['fix_messages_out_total'] == \
+            {'A': 2, 'D': 3, '5': 1}
+        assert snapshot['fix_messages_in_total'] == \
+            {'A': 2, '8': 3, '3': 1, '5': 1}
+        assert snapshot['fix_bytes_out_total']['D'] == \
+            sum(len(bytes(m)) for m in [order] + batch)
+        assert snapshot['fix_rejects_total'] == {'3': 1}
+        assert snapshot['fix_reconnects_total'] == {'': 1}
+        assert snapshot['fix_build_seconds_count']['D'] == 3
+        assert snapshot['fix_parse_seconds_count'] == {'8': 1}
+
+    def test_send_batch_releases_pooled(self):
+        with self.cli as cli:
+            batch = [cli.new_msg(fix.NewOrderMessage, ORDER, pooled=True)
+                     for _ in range(2)]
+            pool = batch[0]._pool
+            assert pool.stats()['in_use'] == 2
+            cli.send_batch(batch, release=True)
+            assert pool.stats()['in_use'] == 0
+            cli.recv_fix()
+            cli.recv_fix()
+        snapshot = cli.metrics.snapshot()
+        assert snapshot['fix_build_seconds_count']['D'] == 2
+
+    def test_shared_registry_gauges(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        config['default']['ThrottleRate'] = '1'
+        config['default']['ThrottleBurst'] = '1'
+        config['other'] = dict(config['default'])
+        registry = MetricsRegistry()
+        clients = [FixClient(config, conn_name=conn_name,
+                             transport=loopback_pair()[0],
+                             log_level=logging.WARNING, metrics=registry)
+                   for conn_name in ('default', 'other')]
+        clients[0].throttle.submit(b'', b'D')
+        clients[0].throttle.submit(b'', b'D')
+        assert registry.snapshot()['fix_queue_depth'] == \
+            {'default': 2, 'other': 0}
+        for cli in clients:
+            cli.close()
+
+
+if __name__ == '__main__':
+    nose.runmodule()
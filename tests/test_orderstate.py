@@ -0,0 +1,82 @@
+import fix
+import nose
+from nose.tools import *
+
+
+def er(fields):
+    return b'8=FIX.4.2\x019=0\x01' + b''.join(
+        str(t).encode() + b'=' + v + b'\x01' for t, v in fields) + \
+        b'10=000\x01'
+
+
+class TestOrderStateStore():
+
+    def setup(self):
+        self.store = fix.OrderStateStore()
+        self.transitions = []
+        self.store.subscribe(
+            lambda state, prev, fields: self.transitions.append(
+                (prev, state.status)))
+
+    def test_new_fill_amend_cancel(self):
+        store = self.store
+        store.on_outbound(er([(35, b'D'), (11, b'c1'), (38, b'100'),
+                              (44, b'10'), (55, b'5'), (54, b'1')]))
+        assert store[b'c1'].status is None
+        store.on_message(er([(35, b'8'), (11, b'c1'), (37, b'o1'),
+                             (39, b'0'), (150, b'0'), (14, b'0'),
+                             (151, b'100'), (38, b'100'), (44, b'10')]))
+        store.on_message(er([(35, b'8'), (11, b'c1'), (37, b'o1'),
+                             (39, b'1'), (150, b'1'), (14, b'40'),
+                             (151, b'60'), (6, b'10')]))
+        state = store[b'o1']
+        assert state is store[b'c1']
+        assert state.cum_qty == b'40'
+        assert state.leaves_qty == b'60'
+        assert state.avg_px == b'10'
+
+        store.on_outbound(er([(35, b'G'), (11, b'c2'), (41, b'c1'),
+                              (38, b'200'), (44, b'11')]))
+        assert store[b'c2'] is state
+        store.on_message(er([(35, b'8'), (11, b'c2'), (41, b'c1'),
+                             (37, b'o1'), (39, b'5'), (150, b'5'),
+                             (14, b'40'), (151, b'160'), (38, b'200'),
+                             (44, b'11')]))
+        assert state.clordid == b'c2'
+        assert state.clordids == [b'c1', b'c2']
+        assert state.qty == b'200'
+        assert state.px == b'11'
+
+        store.on_message(er([(35, b'9'), (11, b'c3'), (41, b'c2'),
+                             (37, b'o1'), (39, b'5'), (434, b'1')]))
+        assert store[b'c3'] is state
+        assert state.clordid == b'c2'
+        store.on_message(er([(35, b'8'), (11, b'c4'), (41, b'c2'),
+                             (37, b'o1'), (39, b'4'), (150, b'4'),
+                             (14, b'40'), (151, b'0')]))
+        assert state.is_terminal
+        assert state.clordid == b'c4'
+        assert len(store) == 1
+        assert self.transitions == [
+            (None, b'0'), (b'0', b'1'), (b'1', b'5'), (b'5', b'5'),
+            (b'5', b'4')]
+
+    def test_ignored(self):
+        assert self.store.on_message(er([(35, b'0'), (11, b'x')])) is None
+        assert self.store.on_outbound(er([(35, b'8'), (11, b'x')])) is None
+        assert b'x' not in self.store
+
+    def test_parsed_message(self):
+        raw = er([(35, b'8'), (34, b'2'), (11, b'c1'), (37, b'o1'),
+                  (39, b'2'), (150, b'2'), (14, b'100'), (151, b'0')])
+        msg = fix.Message.parse(raw, validation='none', reset_id_time=False)
+        state = self.store.on_message(msg)
+        assert state is self.store.get(b'o1')
+        assert state.is_terminal
+
+    def test_discard(self):
+        self.store.on_message(er([(35, b'8'), (11, b'c1'), (37, b'o1'),
+                                  (39, b'0')]))
+        self.store.discard(self.store[b'c1'])
+        assert b'c1' not in self.store
+        assert b'o1' not in self.store
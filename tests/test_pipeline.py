@@ -0,0 +1,118 @@
+import os
+import nose
+from nose.tools import *
+import fix
+from fixclient.acceptor import frame_message
+from fixclient.pipeline import ShmRing, InboundPipeline, RingFull, WorkerDied
+
+
+def handle(msg):
+    return os.getpid(), msg[11], int(msg[34])
+
+
+def handle_odd(msg):
+    if int(msg[34]) % 2 == 0:
+        raise ValueError('even')
+    return int(msg[34])
+
+
+def handle_big(msg):
+    return int(msg[34]), b'x' * 1000
+
+
+def die(msg):
+    os._exit(3)
+
+
+def order(seq):
+    return frame_message([(35, b'8'), (34, str(seq).encode()), (11, b'c')])
+
+
+class TestShmRing():
+
+    def setup(self):
+        self.ring = ShmRing(64)
+        self.consumer = ShmRing(name=self.ring.name)
+
+    def teardown(self):
+        self.consumer.close()
+        self.ring.close()
+        self.ring.unlink()
+
+    def test_push_pop(self):
+        assert self.consumer.try_pop() is None
+        self.ring.push(b'abc')
+        self.ring.push(b'')
+        assert len(self.ring) == 11
+        assert self.consumer.pop() == b'abc'
+        assert self.consumer.pop() == b''
+        assert self.consumer.pop(timeout=0.01, spin=0) is None
+        assert len(self.ring) == 0
+
+    def test_wrap(self):
+        frames = [bytes([i]) * (i % 20 + 1) for i in range(200)]
+        out = []
+        for frame in frames:
+            while not self.ring.try_push(frame):
+                out.append(self.consumer.try_pop())
+        while len(self.ring):
+            out.append(self.consumer.try_pop())
+        assert out == frames
+
+    def test_full(self):
+        assert self.ring.try_push(b'x' * 28)
+        assert self.ring.try_push(b'x' * 28)
+        assert not self.ring.try_push(b'')
+        assert_raises(RingFull, self.ring.push, b'', timeout=0.01, spin=0)
+        assert self.consumer.pop() == b'x' * 28
+        assert self.ring.try_push(b'')
+        assert_raises(ValueError, self.ring.try_push, b'x' * 29)
+
+
+class TestInboundPipeline():
+
+    def test_per_key_order(self):
+        msgs = [frame_message([(35, b'8'), (34, str(seq).encode()),
+                               (11, 'c{}'.format(seq % 7).encode())])
+                for seq in range(1, 501)]
+        with InboundPipeline(handle, 3, ring_size=4096) as pipeline:
+            for raw in msgs:
+                pipeline.feed(raw)
+            results = pipeline.close()
+        assert len(results) == 500
+        by_key = {}
+        for pid, clordid, seq in results:
+            by_key.setdefault(clordid, []).append((pid, seq))
+        assert len(by_key) == 7
+        for handled in by_key.values():
+            # one worker per key, in sequence order
+            assert len({pid for pid, _ in handled}) == 1
+            assert [seq for _, seq in handled] == \
+                sorted(seq for _, seq in handled)
+
+    def test_handler_error(self):
+        with InboundPipeline(handle_odd, 1, ring_size=4096) as pipeline:
+            for seq in range(1, 101):
+                pipeline.feed(order(seq))
+            results = pipeline.close()
+        assert results == list(range(1, 101, 2))
+        assert len(pipeline.errors) == 50
+        raw, tb = pipeline.errors[0]
+        assert raw == order(2)
+        assert 'ValueError: even' in tb
+
+    def test_results_not_read(self):
+        # far more results than the pipe to the parent holds; feed() must
+        # drain them or the worker stops emptying its ring
+        with InboundPipeline(handle_big, 1, ring_size=4096) as pipeline:
+            for seq in range(1, 501):
+                pipeline.feed(order(seq), timeout=10)
+            results = pipeline.close(timeout=10)
+        assert [seq for seq, _ in results] == list(range(1, 501))
+
+    def test_dead_worker(self):
+        pipeline = InboundPipeline(die, 1, ring_size=256)
+        assert_raises(WorkerDied, lambda: [pipeline.feed(order(seq))
+                                           for seq in range(1, 1000)])
+        assert_raises(WorkerDied, pipeline.close)
+        assert pipeline.rings == []
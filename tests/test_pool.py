@@ -0,0 +1,63 @@
+import fix
+import nose
+from nose.tools import *
+from collections import OrderedDict
+
+
+class TestMessagePool():
+
+    def setup(self):
+        self.header = {8: b'FIX.4.2', 49: b'S', 56: b'T'}
+        self.order = OrderedDict([(38, b'100'), (40, b'2'), (44, b'1'),
+                                  (54, b'1'), (55, b'fja')])
+        self.pool = fix.MessagePool(fix.NewOrderMessage, maxsize=2)
+
+    def test_reuse(self):
+        m = self.pool.acquire(self.header, {34: b'1'}, self.order)
+        bytes(m)
+        self.pool.release(m)
+        m2 = self.pool.acquire(self.header, {34: b'2'}, {**self.order,
+                                                         38: b'200'})
+        assert m2 is m
+        assert m2[34] == b'2'
+        assert m2.qty == b'200'
+        assert m2.is_valid_cond()
+        assert self.pool.stats()['hits'] == 1
+        assert self.pool.stats()['misses'] == 1
+
+    def test_same_layout_as_new_message(self):
+        m = self.pool.acquire(self.header, {34: b'1'}, self.order)
+        self.pool.release(m)
+        m = self.pool.acquire(self.header, {34: b'1'}, self.order)
+        fresh = fix.NewOrderMessage(fix.Group(OrderedDict(
+            [*self.header.items(), (34, b'1'), *self.order.items()])))
+        assert list(m.keys()) == list(fresh.keys())
+        changing = {9, 10, 11, 52, 60}
+        assert [(k, v) for k, v in m.items() if k not in changing] == \
+            [(k, v) for k, v in fresh.items() if k not in changing]
+
+    def test_validation_on_recycle(self):
+        m = self.pool.acquire(self.header, {34: b'1'}, self.order)
+        self.pool.release(m)
+        limit_without_px = {k: v for k, v in self.order.items() if k != 44}
+        assert_raises(ValueError, self.pool.acquire,
+                      self.header, {34: b'1'}, limit_without_px)
+
+    def test_high_water_and_discard(self):
+        msgs = [self.pool.acquire(self.header, {34: b'1'}, self.order)
+                for _ in range(3)]
+        for m in msgs:
+            self.pool.release(m)
+        stats = self.pool.stats()
+        assert stats['high_water'] == 3
+        assert stats['in_use'] == 0
+        assert stats['free'] == 2
+        assert stats['discarded'] == 1
+
+    def test_release_twice(self):
+        m = self.pool.acquire(self.header, {34: b'1'}, self.order)
+        self.pool.release(m)
+        assert_raises(ValueError, self.pool.release, m)
+        other = fix.MessagePool(fix.NewOrderMessage)
+        m = self.pool.acquire(self.header, {34: b'1'}, self.order)
+        assert_raises(ValueError, other.release, m)
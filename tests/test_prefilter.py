@@ -0,0 +1,125 @@
+import configparser
+import logging
+import os
+import shutil
+import tempfile
+import nose
+from nose.tools import *
+import fix
+from fix import Tag, compile_predicate
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor, frame_message
+from fixclient.journal import TrafficLog, Journal, iter_capture, INBOUND
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+ORDER = {38: b'100', 40: b'2', 44: b'10', 54: b'1', 55: b'5', 59: b'0'}
+
+
+def report(clordid, msgtype=b'8'):
+    return frame_message([(35, msgtype), (49, b'OMS'), (56, b'C'),
+                          (34, b'1'), (37, b'O' + clordid), (11, clordid),
+                          (39, b'0')])
+
+
+class TestPredicate():
+
+    def setup(self):
+        self.raw = report(b'ABC')
+
+    def test_tag(self):
+        assert (Tag(11) == b'ABC')(self.raw)
+        # delimiter anchored: neither a prefix of the value nor another tag
+        assert not (Tag(11) == b'AB')(self.raw)
+        assert not (Tag(1) == b'ABC')(self.raw)
+        assert (Tag(11) != b'AB')(self.raw)
+        assert Tag(35).isin([b'8', b'9'])(self.raw)
+        assert not Tag(35).isin([])(self.raw)
+        assert (Tag(8) == b'FIX.4.2')(self.raw)
+        assert Tag(8).exists()(self.raw)
+        assert not Tag(58).exists()(self.raw)
+        assert (Tag(39) == 0)(self.raw)
+
+    def test_combine(self):
+        pred = Tag(35).isin([b'8', b'9']) & (Tag(11) == b'ABC')
+        # needle only predicates stay one scan, longest needle first
+        assert pred.clauses[0] == (b'\x0111=ABC\x01',)
+        assert pred(self.raw)
+        assert not pred(report(b'ABC', b'9').replace(b'ABC', b'ABD'))
+        assert ((Tag(11) == b'X') | (Tag(11) == b'ABC')).clauses == \
+            ((b'\x0111=X\x01', b'\x0111=ABC\x01'),)
+        assert (~(Tag(11) == b'X') & Tag(37).exists())(self.raw)
+        assert list(pred.filter([self.raw, report(b'X')])) == [self.raw]
+
+    def test_compile(self):
+        pred = compile_predicate('35 in {8,9} and 11 == $clordid',
+                                 clordid=b'ABC')
+        assert pred(self.raw)
+        assert not pred(report(b'X'))
+        assert compile_predicate(
+            "not (58 or 39 != '0') and 8 == FIX.4.2")(self.raw)
+        assert compile_predicate('11 in {$ids}', ids=['X', 'ABC'])(self.raw)
+        assert compile_predicate('11 == X or 37 == "OABC"')(self.raw)
+        assert compile_predicate('35 == 8 and 11 == ABC').clauses == \
+            compile_predicate('11 == ABC and 35 == 8').clauses
+
+    def test_compile_errors(self):
+        for expr in ('35 ==', '35 in {8', 'and', '35 = 8', '(35', '35 39'):
+            assert_raises(ValueError, compile_predicate, expr)
+        assert_raises(ValueError, compile_predicate, '11 == $x')
+
+    def test_delim(self):
+        raw = self.raw.replace(b'\x01', b'^')
+        assert compile_predicate('11 == ABC', delim=b'^')(raw)
+        assert not compile_predicate('11 == ABC')(raw)
+
+
+class TestFiltering():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING)
+
+    def teardown(self):
+        self.cli.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_captures(self):
+        for cls in (TrafficLog, Journal):
+            path = os.path.join(self.tmpdir, cls.__name__)
+            w = cls(path)
+            for clordid in (b'1', b'2', b'3'):
+                w.write(INBOUND, report(clordid))
+            w.close()
+            found = list(iter_capture(path, compile_predicate('11 == 2')))
+            assert [m for _, _, m in found] == [report(b'2')]
+            assert len(list(iter_capture(path, Tag(8) == b'FIX.4.2'))) == 3
+
+    def test_recv_linked_ack(self):
+        with self.cli as cli:
+            orders = [cli.new_msg(fix.NewOrderMessage, ORDER)
+                      for _ in range(3)]
+            for order in orders:
+                cli.send_msg(bytes(order))
+            ack = cli.recv_linked_ack_dic(orders[0][11], orders[0][34])
+            assert ack[11] == orders[0][11]
+            # the second report is skipped without being parsed
+            ack = cli.recv_linked_ack_use_id(orders[2][11])
+            assert ack[11] == orders[2][11]
+            amend = cli.new_msg(fix.AmendOrderMessage,
+                                {**ORDER, 38: b'50', 41: orders[2][11]})
+            cli.send_msg(bytes(amend))
+            amend_ack = cli.recv_linked_ack_use_clientorderid(ack[37])
+            assert amend_ack[11] == amend[11]
+            assert amend_ack[41] == orders[2][11]
+
+
+if __name__ == '__main__':
+    nose.runmodule()
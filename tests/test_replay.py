@@ -0,0 +1,203 @@
+import configparser
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import nose
+from nose.tools import *
+import fix
+from fix.codec import TimestampCodec
+from fix.util import peek_tag, parse_fix_time
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor
+from fixclient.journal import (
+    TrafficLog, Journal, iter_capture, iter_journal, iter_traffic_log,
+    INBOUND, OUTBOUND)
+from fixclient.replay import load_capture, Replayer, percentiles
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+ORDER = {38: b'100', 40: b'2', 44: b'10', 54: b'1', 55: b'5', 59: b'0'}
+
+
+def client(tmpdir, **keys):
+    config = configparser.ConfigParser()
+    config.read(CONFIG)
+    config['default']['TrafficLog'] = os.path.join(tmpdir, 'traffic.log')
+    for k, v in keys.items():
+        config['default'][k] = v
+    client_end, acceptor_end = loopback_pair()
+    acceptor = SimulatedAcceptor(acceptor_end)
+    return FixClient(config, transport=client_end,
+                     log_level=logging.WARNING), acceptor
+
+
+class TestJournal():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        log_path = os.path.join(self.tmpdir, 'traffic.log')
+        journal_path = os.path.join(self.tmpdir, 'journal')
+        log, journal = TrafficLog(log_path), Journal(journal_path)
+        for w in (log, journal):
+            w.write(OUTBOUND, b'8=FIX.4.2\x0135=D\x01', ts_ns=1)
+            w.write(INBOUND, b'8=FIX.4.2\x0135=8\x01', ts_ns=2)
+            w.close()
+        with open(log_path, 'a') as f:
+            f.write('\nstart executing a scenario\n')
+        assert list(iter_journal(journal_path)) == [
+            (OUTBOUND, 1, b'8=FIX.4.2\x0135=D\x01'),
+            (INBOUND, 2, b'8=FIX.4.2\x0135=8\x01')]
+        assert list(iter_traffic_log(log_path)) == [
+            (OUTBOUND, None, b'8=FIX.4.2\x0135=D\x01'),
+            (INBOUND, None, b'8=FIX.4.2\x0135=8\x01')]
+        assert list(iter_capture(journal_path))[0][1] == 1
+        assert list(iter_capture(log_path))[0][1] is None
+        assert_raises(ValueError, list, iter_journal(log_path))
+
+    def test_truncated_journal(self):
+        path = os.path.join(self.tmpdir, 'journal')
+        journal = Journal(path)
+        journal.write(OUTBOUND, b'35=D\x01', ts_ns=1)
+        journal.write(OUTBOUND, b'35=G\x01', ts_ns=2)
+        journal.close()
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 2)
+        assert [m for _, _, m in iter_journal(path)] == [b'35=D\x01']
+
+    def test_client_captures(self):
+        journal_path = os.path.join(self.tmpdir, 'journal')
+        cli, _ = client(self.tmpdir, TrafficJournal=journal_path)
+        with cli:
+            cli.send_msg(bytes(cli.new_msg(fix.NewOrderMessage, ORDER)))
+            cli.recv_fix()
+        cli.close()
+        log = list(iter_traffic_log(os.path.join(self.tmpdir, 'traffic.log')))
+        journal = list(iter_journal(journal_path))
+        assert [(d, m) for d, _, m in log] == [(d, m) for d, _, m in journal]
+        assert [peek_tag(m, b'35') for _, _, m in log] == \
+            [b'A', b'A', b'D', b'8', b'5', b'5']
+
+    def test_capture_disabled(self):
+        cli, _ = client(self.tmpdir, TrafficLog='')
+        assert cli.captures == []
+
+
+class TestReplay():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.journal = os.path.join(self.tmpdir, 'journal')
+        cli, _ = client(self.tmpdir, TrafficJournal=self.journal)
+        with cli:
+            for _ in range(3):
+                order = cli.new_msg(fix.NewOrderMessage, ORDER)
+                cli.send_msg(bytes(order))
+                cli.recv_fix()
+            amend = cli.new_msg(fix.AmendOrderMessage,
+                                {**ORDER, 38: b'50', 41: order[11]})
+            cli.send_msg(bytes(amend))
+            cli.recv_fix()
+        cli.close()
+        self.amended = order[11]
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse_fix_time(self):
+        assert parse_fix_time(b'20200101-00:00:01.5') - \
+            parse_fix_time(b'20200101-00:00:00') == 1500000000
+        assert parse_fix_time(b'20200101-00:00:00.000001') % 10 ** 9 == 1000
+        # UTC, whatever the local timezone
+        assert parse_fix_time(b'19700101-00:00:01') == 10 ** 9
+        value = b'20240229-23:59:59.123456'
+        assert parse_fix_time(value) == TimestampCodec().decode(value)
+
+    def test_send_lock_keeps_seqnums_in_order(self):
+        cli, _ = client(self.tmpdir)
+        writes = []
+        sendall = cli.transport.sendall
+        cli.transport.sendall = lambda data: \
+            writes.append(bytes(data)) or sendall(data)
+        with cli:
+            stop = threading.Event()
+
+            def heartbeats():
+                while not stop.is_set():
+                    cli.send_heartbeat()
+            thread = threading.Thread(target=heartbeats)
+            thread.start()
+            try:
+                for _ in range(50):
+                    with cli.send_lock:
+                        order = cli.new_msg(fix.NewOrderMessage, ORDER)
+                        cli.send_msg(bytes(order))
+            finally:
+                stop.set()
+                thread.join()
+        cli.close()
+        seqnums = [int(peek_tag(w, b'34')) for w in writes]
+        assert seqnums == sorted(seqnums)
+
+    def test_percentiles(self):
+        assert percentiles([]) == {}
+        pct = percentiles(list(range(1, 101)))
+        assert pct[50] == 50
+        assert pct[99] == 99
+        assert pct[100] == 100
+
+    def test_load_capture(self):
+        for path in (self.journal, os.path.join(self.tmpdir, 'traffic.log')):
+            sent, latencies = load_capture(path)
+            assert [m.msgtype for m in sent] == [b'D', b'D', b'D', b'G']
+            assert all(m.ts_ns is not None for m in sent)
+            assert len(latencies) == 4
+
+    def test_replay(self):
+        sent, latencies = load_capture(self.journal)
+        replay_dir = os.path.join(self.tmpdir, 'replay')
+        os.mkdir(replay_dir)
+        cli, acceptor = client(replay_dir)
+        report = Replayer(cli, speed=None).run(sent, latencies)
+        assert report.sent == 4
+        assert report.acked == 4
+        assert len(report.replay_latency) == 4
+        assert len(report.original_latency) == 4
+        assert report.drift == []
+        assert 'acked' in str(report)
+        replayed = [m for d, _, m in iter_capture(
+            os.path.join(replay_dir, 'traffic.log')) if d == OUTBOUND]
+        assert [int(peek_tag(m, b'34')) for m in replayed] == \
+            list(range(1, 7))
+        new_ids = [peek_tag(m, b'11') for m in replayed[1:5]]
+        assert not set(new_ids) & {m.clordid for m in sent}
+        # the amend points at the replayed order, not the captured one
+        assert peek_tag(replayed[4], b'41') == new_ids[2]
+        assert peek_tag(replayed[4], b'41') != self.amended
+        for m in replayed:
+            assert fix.Message.parse(m, reset_id_time=False,
+                                     reset_ht=False).is_valid_header_trailer()
+
+    def test_paced_replay(self):
+        sent, _ = load_capture(self.journal)
+        # spread the captured orders 1s apart
+        for i, m in enumerate(sent):
+            m.ts_ns = i * 10 ** 9
+        slept = []
+        cli, _ = client(self.tmpdir, TrafficLog='')
+        replayer = Replayer(cli, speed=100., sleep=slept.append)
+        report = replayer.run(sent)
+        assert report.sent == 4
+        assert len(report.drift) == 4
+        # due every 10ms; sleep() is a no-op here so they all go out early
+        assert len(slept) == 3
+        assert all(0 < s <= 0.03 for s in slept)
+        assert all(d <= 0 for d in report.drift[1:])
+        assert_raises(ValueError, Replayer, cli, speed=0)
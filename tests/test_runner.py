@@ -0,0 +1,130 @@
+import configparser
+import os
+import shutil
+import tempfile
+import nose
+from nose.tools import *
+from fix.util import peek_tag
+from fixclient import FixClient
+from fixclient.journal import iter_journal
+from fixclient.runner import (
+    collect, run_scenarios, sessions_from_config, PASS, FAIL, ERROR)
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+
+SCENARIO = '''
+import configparser
+import fix
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor
+from fixclient.transport import loopback_pair
+
+config = configparser.ConfigParser()
+config.read({ini!r})
+
+
+class TestOrders():
+
+    def setup(self):
+        client_end, acceptor_end = loopback_pair()
+        SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end)
+
+    def teardown(self):
+        self.cli.close()
+
+    def test_order(self):
+        print('sender', self.cli.sendercompid.decode())
+        with self.cli as cli:
+            cli.send_msg(bytes(cli.new_msg(fix.NewOrderMessage, {{
+                38: b'100', 40: b'2', 44: b'10', 54: b'1', 55: b'5'}})))
+            assert cli.parse_inbound(cli.recv_fix())[150] == b'0'
+
+    def test_reject(self):
+        assert False, 'rejected'
+
+    def helper(self):
+        pass
+
+
+def test_error():
+    raise RuntimeError('boom')
+'''
+
+
+class TestRunner():
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        for i in (1, 2):
+            config['s{}'.format(i)] = config['default']
+            config['s{}'.format(i)]['OMSSender'] = 'C{}'.format(i)
+        self.ini = os.path.join(self.tmpdir, 'sessions.ini')
+        with open(self.ini, 'w') as f:
+            config.write(f)
+        self.config = config
+        os.mkdir(os.path.join(self.tmpdir, 'scenarios'))
+        for name in ('test_a.py', 'test_b.py'):
+            with open(os.path.join(self.tmpdir, 'scenarios', name), 'w') as f:
+                f.write(SCENARIO.format(ini=self.ini))
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_collect(self):
+        tests = collect([os.path.join(self.tmpdir, 'scenarios')])
+        assert [name for _, name in tests] == [
+            'TestOrders.test_order', 'TestOrders.test_reject',
+            'test_error'] * 2
+
+    def test_sessions_from_config(self):
+        assert sessions_from_config(self.config) == ['default', 's1', 's2']
+
+    def test_run(self):
+        tests = collect([os.path.join(self.tmpdir, 'scenarios')])
+        captures = os.path.join(self.tmpdir, 'captures')
+        finished = []
+        results = run_scenarios(tests, ['s1', 's2'], capture_dir=captures,
+                                on_result=finished.append)
+        assert len(finished) == 6
+        assert [(r.path, r.name) for r in results] == tests
+        assert [r.status for r in results] == [PASS, FAIL, ERROR] * 2
+        assert 'rejected' in results[1].traceback
+        assert 'boom' in results[2].traceback
+        for r in results[::3]:
+            # the scenario's FixClient(config) used the worker's session
+            assert 'sender C{}'.format(r.session[1]) in r.output
+        per_session = []
+        for s in ('s1', 's2'):
+            path = os.path.join(captures, '{}.journal'.format(s))
+            if os.path.exists(path):
+                per_session += list(iter_journal(path))
+        merged = list(iter_journal(os.path.join(captures, 'merged.journal')))
+        assert sorted(merged) == sorted(per_session)
+        assert [ts for _, ts, _ in merged] == sorted(ts for _, ts, _ in merged)
+        assert {peek_tag(m, b'35') for _, _, m in merged} == \
+            {b'A', b'D', b'8', b'5'}
+
+    def test_rerun_replaces_captures(self):
+        tests = collect([os.path.join(self.tmpdir, 'scenarios', 'test_a.py')])
+        captures = os.path.join(self.tmpdir, 'captures')
+        merged_path = os.path.join(captures, 'merged.journal')
+        counts = []
+        for _ in range(2):
+            run_scenarios(tests, ['s1'], capture_dir=captures)
+            counts.append((len(list(iter_journal(merged_path))),
+                           len(list(iter_journal(
+                               os.path.join(captures, 's1.journal'))))))
+        assert counts[0] == counts[1]
+        assert counts[0][0] == counts[0][1] > 0
+
+    def test_no_session(self):
+        assert_raises(ValueError, run_scenarios, [], [])
+
+    def test_defaults(self):
+        # the parent process is untouched by the workers
+        assert FixClient.default_conn_name == 'default'
+        assert FixClient.config_overrides == {}
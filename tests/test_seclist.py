@@ -0,0 +1,101 @@
+import fix
+import nose
+from nose.tools import *
+import os
+import tempfile
+
+
+def security_list(req_id, entries, last_fragment=None, total=None):
+    body = b'35=y\x0134=1\x0149=OMS\x0156=Client\x01320=' + req_id + b'\x01'
+    if total is not None:
+        body += b'393=' + str(total).encode() + b'\x01'
+    body += b'146=' + str(len(entries)).encode() + b'\x01'
+    for symbol, security_id in entries:
+        body += b'55=' + symbol + b'\x0148=' + security_id + \
+            b'\x01167=CS\x011206=1\x011207=1\x01'
+    if last_fragment is not None:
+        body += b'893=' + last_fragment + b'\x01'
+    header = b'8=FIX.4.2\x019=' + str(len(body)).encode() + b'\x01'
+    checksum = str(sum(header + body) % 256).zfill(3).encode()
+    return header + body + b'10=' + checksum + b'\x01'
+
+
+class TestSecurityListAssembler():
+
+    def setup(self):
+        self.fragments = [
+            security_list(b'r1', [(b'5', b'HK5'), (b'700', b'HK700')],
+                          last_fragment=b'N', total=3),
+            security_list(b'r1', [(b'2800', b'HK2800')],
+                          last_fragment=b'Y', total=3)]
+
+    def test_fragments(self):
+        asm = fix.SecurityListAssembler()
+        state = asm.add(self.fragments[0])
+        assert not asm.is_complete(b'r1')
+        assert state.entries == 2
+        assert asm.lookup(b'700')[48] == b'HK700'
+        state = asm.add(self.fragments[1])
+        assert asm.is_complete(b'r1')
+        assert state.fragments == 2
+        assert len(asm) == 3
+        assert asm.lookup_security_id(b'HK2800')[55] == b'2800'
+        assert asm.lookup_security_id(b'HK2800')[1206][0][1207] == b'1'
+        assert asm.lookup(b'9999') is None
+
+    def test_single_message(self):
+        asm = fix.SecurityListAssembler()
+        asm.add(security_list(b'r2', [(b'5', b'HK5')]))
+        assert asm.is_complete(b'r2')
+        assert not asm.is_complete(b'r3')
+
+    def test_parsed_message(self):
+        asm = fix.SecurityListAssembler()
+        msg = fix.Message.parse(self.fragments[0],
+                                fix.SecurityListMessage.GROUP_STRUCT,
+                                reset_id_time=False, reset_ht=False)
+        asm.add(msg)
+        assert asm.lookup(b'5')[48] == b'HK5'
+        assert asm.requests[b'r1'].total == 3
+
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'seclist.json')
+            asm = fix.SecurityListAssembler(path)
+            asm.add(self.fragments[0])
+            assert not os.path.exists(path)
+            asm.add(self.fragments[1])
+            assert os.path.exists(path)
+            restored = fix.SecurityListAssembler(path)
+            assert restored.is_complete(b'r1')
+            assert restored.lookup(b'700') == asm.lookup(b'700')
+            assert restored.lookup(b'700') is \
+                restored.lookup_security_id(b'HK700')
+
+    def test_restart_drops_instruments(self):
+        asm = fix.SecurityListAssembler()
+        for fragment in self.fragments:
+            asm.add(fragment)
+        asm.add(security_list(b'r2', [(b'700', b'HK700')]))
+        # the venue's new r1 list no longer has 5
+        state = asm.add(security_list(b'r1', [(b'2800', b'HK2800')],
+                                      last_fragment=b'N', total=2))
+        assert state.fragments == 1 and state.entries == 1
+        assert asm.lookup(b'5') is None
+        assert asm.lookup_security_id(b'HK5') is None
+        # indexed again by r2 since
+        assert asm.lookup(b'700')[48] == b'HK700'
+        assert asm.lookup(b'2800')[48] == b'HK2800'
+        assert len(asm) == 2
+
+    def test_snapshot_restart(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'seclist.json')
+            asm = fix.SecurityListAssembler(path)
+            for fragment in self.fragments:
+                asm.add(fragment)
+            restored = fix.SecurityListAssembler(path)
+            restored.add(security_list(b'r1', [(b'700', b'HK700')]))
+            assert restored.lookup(b'5') is None
+            assert len(restored) == 1
+
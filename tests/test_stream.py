@@ -0,0 +1,65 @@
+import fix
+import nose
+from nose.tools import *
+
+
+class TestIterGroupEntries():
+
+    def setup(self):
+        body = (b'35=y\x0134=5\x0149=OMS\x0156=Client\x01320=req1\x01'
+                b'146=3\x01'
+                b'55=2905\x0148=2905\x01107=MAIN\x01167=CS\x01'
+                b'1206=1\x011207=1\x011208=100\x011206=2\x011207=2\x01'
+                b'55=4068\x0148=4068\x01167=CS\x01'
+                b'55=0005\x0148=0005\x011206=1\x011208=5\x01'
+                b'893=Y\x01')
+        header = b'8=FIX.4.2\x019=' + str(len(body)).encode() + b'\x01'
+        checksum = str(sum(header + body) % 256).zfill(3).encode()
+        self.raw = header + body + b'10=' + checksum + b'\x01'
+
+    def test_entries(self):
+        entries = list(fix.SecurityListMessage.iter_entries(self.raw))
+        assert [e[55] for e in entries] == [b'2905', b'4068', b'0005']
+        assert entries[0][1206, 1, 1207] == b'2'
+        assert entries[0][1206, 0, 1208] == b'100'
+        assert 1206 not in entries[1]
+        assert entries[2][1206, 0, 1208] == b'5'
+
+    def test_same_as_parse(self):
+        m = fix.Message.parse(self.raw, fix.SecurityListMessage.GROUP_STRUCT,
+                              reset_id_time=False, reset_ht=False)
+        entries = list(fix.SecurityListMessage.iter_entries(self.raw))
+        assert entries == m[55]
+
+    def test_top_level(self):
+        top_level = {}
+        for _ in fix.SecurityListMessage.iter_entries(
+                self.raw, top_level=top_level):
+            pass
+        assert top_level[320] == b'req1'
+        assert top_level[893] == b'Y'
+        assert 10 in top_level
+        assert 55 not in top_level
+
+    def test_early_stop(self):
+        top_level = {}
+        it = fix.SecurityListMessage.iter_entries(
+            self.raw, top_level=top_level)
+        first = next(it)
+        assert first[55] == b'2905'
+        assert 893 not in top_level
+        it.close()
+
+    def test_validation(self):
+        raw = self.raw.replace(b'55=4068\x0148=4068', b'55=4068\x0148=4068'
+                               b'\x0148=4069')
+        it = fix.SecurityListMessage.iter_entries(raw)
+        next(it)
+        assert_raises(fix.RepeatedTagError, next, it)
+        gs = fix.GroupStructure({55: fix.GroupStructure([55, 48])},
+                                req_tags=set())
+        gs[55].req_tags = {48}
+        raw = self.raw.replace(b'55=4068\x0148=4068', b'55=4068')
+        entries = fix.iter_group_entries(raw, gs, validation='full')
+        next(entries)
+        assert_raises(ValueError, next, entries)
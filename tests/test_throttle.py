@@ -0,0 +1,215 @@
+import configparser
+import logging
+import os
+import nose
+from nose.tools import *
+from collections import OrderedDict
+import fix
+from fix.util import peek_tag
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor
+from fixclient.throttle import TokenBucket, Throttle
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+
+
+class FakeClock():
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, dt):
+        self.now += dt
+
+
+class TestTokenBucket():
+
+    def test_bucket(self):
+        clock = FakeClock()
+        b = TokenBucket(10, 2, clock=clock)
+        assert b.try_consume()
+        assert b.try_consume()
+        assert not b.try_consume()
+        assert abs(b.wait_time() - 0.1) < 1e-9
+        clock.sleep(0.1)
+        assert b.try_consume()
+        clock.sleep(10)
+        assert b.tokens <= 2 and b.wait_time() == 0
+
+    @raises(ValueError)
+    def test_bad_rate(self):
+        TokenBucket(0)
+
+
+class TestThrottle():
+
+    def setup(self):
+        self.clock = FakeClock()
+        self.sent = []
+        self.throttle = Throttle(
+            lambda payload, arg: self.sent.append((self.clock.now, payload)),
+            rate=2, burst=1, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_priority(self):
+        t = self.throttle
+        t.submit(b'new1', b'D')
+        t.submit(b'new2', b'D')
+        t.submit(b'amend', b'G')
+        t.submit(b'cancel', b'F')
+        assert t.pump() == 0.5
+        assert [p for _, p in self.sent] == [b'cancel']
+        t.drain()
+        assert [p for _, p in self.sent] == \
+            [b'cancel', b'amend', b'new1', b'new2']
+        assert [when for when, _ in self.sent] == [0., 0.5, 1., 1.5]
+        stats = t.stats()
+        assert stats['depth'] == 0
+        assert stats['max_depth'] == 4
+        assert stats['wait_max'] == 1.5
+        assert stats['sent'] == 4
+
+    def test_chain_keeps_fifo(self):
+        t = self.throttle
+        t.submit(b'new1', b'D', clordid=b'1')
+        t.submit(b'new2', b'D', clordid=b'2')
+        t.submit(b'amend2', b'G', clordid=b'3', origclordid=b'2')
+        t.submit(b'cancel3', b'F', clordid=b'4', origclordid=b'3')
+        t.submit(b'cancel9', b'F', clordid=b'5', origclordid=b'9')
+        assert t.queued(b'3')
+        t.drain()
+        assert [p for _, p in self.sent] == \
+            [b'cancel9', b'new1', b'new2', b'amend2', b'cancel3']
+        assert not t.queued(b'3')
+
+    def test_send_now(self):
+        t = self.throttle
+        t.submit(b'new1', b'D')
+        t.submit(b'new2', b'D')
+        t.send_now(b'hb', b'0')
+        assert [p for _, p in self.sent] == [b'hb']
+        t.send_now(b'hb2', b'0')
+        assert self.sent[-1] == (0.5, b'hb2')
+        assert len(t) == 2
+        t.drain()
+        assert [p for _, p in self.sent] == \
+            [b'hb', b'hb2', b'new1', b'new2']
+
+    def test_msgtype_limit(self):
+        t = Throttle(lambda payload, arg: self.sent.append(
+            (self.clock.now, payload)), msgtype_limits={b'D': (1, None)},
+            clock=self.clock, sleep=self.clock.sleep)
+        for i in range(3):
+            t.submit(b'D%d' % i, b'D')
+        t.submit(b'hb', b'0')
+        t.drain()
+        assert [(w, p) for w, p in self.sent] == \
+            [(0., b'hb'), (0., b'D0'), (1., b'D1'), (2., b'D2')]
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        config.read_string('[s]\nThrottleRate=\nThrottleMsgTypes=\n'
+                           '[t]\nThrottleRate=100\nThrottleBurst=10\n'
+                           'ThrottleMsgTypes=D:50/20, G:5\n'
+                           '[u]\nThrottleMsgTypes=D\n')
+        assert Throttle.from_config(config['s'], None) is None
+        t = Throttle.from_config(config['t'], None)
+        assert t.bucket.rate == 100 and t.bucket.capacity == 10
+        assert t.msgtype_buckets[b'D'].capacity == 20
+        assert t.msgtype_buckets[b'G'].capacity == 5
+        assert_raises(ValueError, Throttle.from_config, config['u'], None)
+
+
+class TestClientThrottle():
+
+    def setup(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        config['default']['ThrottleRate'] = '100'
+        config['default']['ThrottleBurst'] = '1'
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING)
+        self.writes = []
+        sendall = client_end.sendall
+        client_end.sendall = lambda data: \
+            self.writes.append(bytes(data)) or sendall(data)
+        self.order = OrderedDict([(38, b'100'), (40, b'2'), (44, b'10'),
+                                  (54, b'1'), (55, b'5'), (59, b'0')])
+
+    def teardown(self):
+        self.cli.close()
+
+    def test_cancel_behind_queued_order(self):
+        with self.cli as cli:
+            del self.writes[:]
+            orders = [cli.new_msg(fix.NewOrderMessage, self.order, seq=False)
+                      for _ in range(2)]
+            for o in orders:
+                cli.queue(o)
+            fields = {41: orders[1][11], 38: b'100', 54: b'1', 55: b'5'}
+            # stamped already, it could only go out of seqnum order
+            seqnum = cli.seqnum
+            stamped = cli.new_msg(fix.CancelOrderMessage, fields)
+            assert_raises(ValueError, cli.send, stamped)
+            cli.seqnum = seqnum
+            cancel = cli.new_msg(fix.CancelOrderMessage, fields, seq=False)
+            cli.queue(cancel)
+            cli.flush()
+            msgtypes = [peek_tag(w, b'35') for w in self.writes]
+            assert msgtypes == [b'D', b'D', b'F']
+            seqnums = [int(peek_tag(w, b'34')) for w in self.writes]
+            assert seqnums == list(range(seqnums[0], seqnums[0] + 3))
+            assert cli.seqnum == seqnums[-1] + 1
+            assert all(fix.Message.parse(w, received=True)
+                       .is_valid_header_trailer() for w in self.writes)
+
+    def test_send_keeps_seqnums(self):
+        with self.cli as cli:
+            del self.writes[:]
+            orders = [cli.new_msg(fix.NewOrderMessage, self.order, seq=False)
+                      for _ in range(3)]
+            for o in orders:
+                cli.queue(o)
+            # both stamped before either is sent; the queue must not go
+            # out in between with higher seqnums
+            cancels = [cli.new_msg(fix.CancelOrderMessage, {
+                41: b'gone', 38: b'100', 54: b'1', 55: b'5'})
+                for _ in range(2)]
+            for c in cancels:
+                cli.send(c)
+            cli.flush()
+            seqnums = [int(peek_tag(w, b'34')) for w in self.writes]
+            assert seqnums == list(range(seqnums[0], seqnums[0] + 5))
+
+    def test_recv_pumps_queue(self):
+        with self.cli as cli:
+            del self.writes[:]
+            orders = [cli.new_msg(fix.NewOrderMessage, self.order, seq=False)
+                      for _ in range(3)]
+            for o in orders:
+                cli.queue(o)
+            assert len(cli.throttle)
+            # no flush(): waiting for the acks sends the rest of the queue
+            for _ in orders:
+                assert peek_tag(cli.recv_fix(), b'35') == b'8'
+            assert len(cli.throttle) == 0
+            assert [peek_tag(w, b'35') for w in self.writes] == [b'D'] * 3
+
+    def test_heartbeat_does_not_drain(self):
+        with self.cli as cli:
+            orders = [cli.new_msg(fix.NewOrderMessage, self.order, seq=False)
+                      for _ in range(3)]
+            for o in orders:
+                cli.queue(o)
+            queued = len(cli.throttle)
+            assert queued >= 2
+            cli.send_heartbeat()
+            assert len(cli.throttle) == queued
+            cli.flush()
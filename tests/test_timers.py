@@ -0,0 +1,175 @@
+import asyncio
+import configparser
+import logging
+import os
+import nose
+from nose.tools import *
+from fix.util import peek_tag
+from fixclient import FixClient
+from fixclient.acceptor import SimulatedAcceptor
+from fixclient.timers import TimerWheel, SessionTimers
+from fixclient.transport import loopback_pair
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+
+
+class FakeClock():
+
+    def __init__(self):
+        self.now = 1000.
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimerWheel():
+
+    def setup(self):
+        self.clock = FakeClock()
+        self.wheel = TimerWheel(tick=0.1, slots=8, clock=self.clock)
+        self.fired = []
+
+    def run_until(self, t):
+        while self.clock.now < t:
+            self.clock.now = round(self.clock.now + 0.05, 6)
+            self.wheel.advance()
+
+    def test_fire_in_order(self):
+        self.wheel.schedule(0.35, self.fired.append, 'b')
+        self.wheel.schedule(0.1, self.fired.append, 'a')
+        # more than one turn of the wheel (8 slots * 0.1s)
+        self.wheel.schedule(2.0, self.fired.append, 'c')
+        assert len(self.wheel) == 3
+        self.run_until(1000.5)
+        assert self.fired == ['a', 'b']
+        self.run_until(1001.9)
+        assert self.fired == ['a', 'b']
+        self.run_until(1002.1)
+        assert self.fired == ['a', 'b', 'c']
+        assert len(self.wheel) == 0
+
+    def test_cancel(self):
+        t = self.wheel.schedule(0.2, self.fired.append, 'a')
+        self.wheel.schedule(0.2, self.fired.append, 'b')
+        t.cancel()
+        t.cancel()
+        assert len(self.wheel) == 1
+        self.run_until(1001)
+        assert self.fired == ['b']
+
+    def test_catch_up(self):
+        for i in range(20):
+            self.wheel.schedule(i * 0.1, self.fired.append, i)
+        self.clock.now += 5
+        assert self.wheel.advance() == 20
+        assert self.fired == list(range(20))
+
+    def test_reschedule_from_callback(self):
+        def again():
+            self.fired.append(self.clock.now)
+            if len(self.fired) < 3:
+                self.wheel.schedule(0.5, again)
+        self.wheel.schedule(0.5, again)
+        self.run_until(1002)
+        assert len(self.fired) == 3
+
+    def test_event_loop(self):
+        wheel = TimerWheel(tick=0.01)
+        fired = []
+
+        async def main():
+            wheel.attach_to_loop(asyncio.get_running_loop())
+            wheel.schedule(0.03, fired.append, 1)
+            await asyncio.sleep(0.1)
+            wheel.detach()
+        asyncio.run(main())
+        assert fired == [1]
+
+
+class TestSessionTimers():
+
+    def setup(self):
+        self.clock = FakeClock()
+        self.wheel = TimerWheel(tick=0.1, slots=64, clock=self.clock)
+        self.events = []
+        self.timers = SessionTimers(
+            self.wheel, 1.,
+            on_heartbeat=lambda: self.events.append('hb'),
+            on_test_request=lambda: self.events.append('testreq'),
+            on_timeout=self.events.append)
+
+    def run_until(self, t, traffic=()):
+        while self.clock.now < t:
+            self.clock.now = round(self.clock.now + 0.05, 6)
+            for f in traffic:
+                f()
+            self.wheel.advance()
+
+    def test_heartbeat_and_test_request(self):
+        self.timers.start()
+        self.run_until(1001.05)
+        assert self.events == ['hb']
+        self.run_until(1001.3)
+        assert self.events == ['hb', 'testreq']
+        self.timers.on_recv()
+        self.run_until(1002.45)
+        assert self.events == ['hb', 'testreq', 'hb']
+        self.run_until(1003.9)
+        assert self.events == ['hb', 'testreq', 'hb', 'testreq', 'hb',
+                               'TestRequest not answered']
+        assert len(self.wheel) == 1  # the heartbeat timer
+
+    def test_traffic_resets_timers(self):
+        self.timers.start()
+        self.run_until(1005, traffic=(self.timers.on_send,
+                                      self.timers.on_recv))
+        assert self.events == []
+
+    def test_logon_timeout(self):
+        self.timers.start_logon(2.)
+        self.run_until(1001)
+        self.timers.logon_complete()
+        self.run_until(1003)
+        assert self.events == []
+        self.timers.start_logon(2.)
+        self.run_until(1006)
+        assert self.events == ['logon timed out']
+
+    def test_stop(self):
+        self.timers.start()
+        self.timers.stop()
+        assert len(self.wheel) == 0
+
+
+class TestClientTimers():
+
+    def setup(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        config['default']['AutoHeartbeat'] = '1'
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.clock = FakeClock()
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING,
+                             timer_wheel=TimerWheel(0.1, clock=self.clock))
+        self.writes = []
+        sendall = client_end.sendall
+        client_end.sendall = lambda data: \
+            self.writes.append(bytes(data)) or sendall(data)
+
+    def teardown(self):
+        self.cli.close()
+
+    def test_heartbeat_under_inbound_traffic(self):
+        with self.cli as cli:
+            del self.writes[:]
+            interval = float(cli.heartbeat)
+            # a message always waiting, recv never times out
+            for _ in range(int(interval) + 5):
+                self.acceptor.send([(35, b'0')])
+                self.clock.now += 1
+                cli.recv_fix()
+            assert [peek_tag(w, b'35') for w in self.writes] == [b'0']
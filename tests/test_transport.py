@@ -0,0 +1,225 @@
+import os
+import socket
+import tempfile
+import threading
+import nose
+from nose.tools import *
+from fixclient.transport import (
+    loopback_pair, UnixTransport, transport_from_config, TcpTransport,
+    SocketProfile)
+from fixclient.acceptor import SimulatedAcceptor, frame_message
+from fix.util import iter_rawmsg
+import configparser
+import logging
+from collections import OrderedDict
+import fix
+from fixclient import FixClient
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', 'config_files', 'fo_fix.ini')
+
+
+class TestLoopbackTransport():
+
+    def setup(self):
+        self.a, self.b = loopback_pair()
+
+    def test_send_recv(self):
+        self.a.sendall(b'hello')
+        self.a.sendall(b' world')
+        assert self.b.recv(3) == b'hel'
+        assert self.b.recv(100) == b'lo world'
+
+    def test_timeout(self):
+        self.b.settimeout(0.01)
+        assert_raises(socket.timeout, self.b.recv, 1)
+
+    def test_close(self):
+        self.a.sendall(b'x')
+        self.a.close()
+        assert self.b.recv(10) == b'x'
+        assert self.b.recv(10) == b''
+        assert_raises(BrokenPipeError, self.a.sendall, b'y')
+        self.a.connect()
+        self.a.sendall(b'y')
+        assert self.b.recv(10) == b'y'
+
+    def test_threaded_recv(self):
+        t = threading.Timer(0.01, self.a.sendall, (b'late',))
+        t.start()
+        assert self.b.recv(10) == b'late'
+        t.join()
+
+
+class TestSimulatedAcceptor():
+
+    def setup(self):
+        self.client, end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(end)
+
+    def recv_fields(self):
+        return dict(iter_rawmsg(self.client.recv(4096)))
+
+    def test_logon_and_order(self):
+        self.client.sendall(frame_message(
+            [(35, b'A'), (49, b'C'), (56, b'OMS'), (34, b'1'), (108, b'30')]))
+        assert self.recv_fields()[b'35'] == b'A'
+        order = frame_message(
+            [(35, b'D'), (49, b'C'), (56, b'OMS'), (34, b'2'), (11, b'c1'),
+             (38, b'100'), (40, b'2'), (44, b'5'), (54, b'1'), (55, b'5')])
+        # split writes are reassembled
+        self.client.sendall(order[:10])
+        self.client.sendall(order[10:])
+        ack = self.recv_fields()
+        assert ack[b'35'] == b'8'
+        assert ack[b'11'] == b'c1'
+        assert ack[b'150'] == b'0'
+        assert ack[b'151'] == b'100'
+        self.client.sendall(frame_message(
+            [(35, b'G'), (49, b'C'), (56, b'OMS'), (34, b'3'), (11, b'c2'),
+             (41, b'c1'), (38, b'50'), (40, b'2'), (44, b'5'), (54, b'1'),
+             (55, b'5')]))
+        amend_ack = self.recv_fields()
+        assert amend_ack[b'150'] == b'5'
+        assert amend_ack[b'37'] == ack[b'37']
+        assert self.acceptor.received == 3
+
+
+class TestSendBatch():
+
+    def setup(self):
+        config = configparser.ConfigParser()
+        config.read(CONFIG)
+        config['default']['TrafficLog'] = ''
+        client_end, acceptor_end = loopback_pair()
+        self.acceptor = SimulatedAcceptor(acceptor_end)
+        self.cli = FixClient(config, transport=client_end,
+                             log_level=logging.WARNING)
+        self.writes = []
+        sendall = client_end.sendall
+        client_end.sendall = lambda data: \
+            self.writes.append(bytes(data)) or sendall(data)
+
+    def teardown(self):
+        self.cli.close()
+
+    def test_send_batch(self):
+        order = OrderedDict([(38, b'100'), (40, b'2'), (44, b'10'),
+                             (54, b'1'), (55, b'5'), (59, b'0')])
+        with self.cli as cli:
+            received = self.acceptor.received
+            msgs = [cli.new_msg(fix.NewOrderMessage, order)
+                    for _ in range(3)]
+            msgs.append(bytes(cli.new_msg(fix.NewOrderMessage, order)))
+            del self.writes[:]
+            n = cli.send_batch(msgs)
+            assert self.writes == [b''.join(bytes(m) for m in msgs)]
+            assert n == len(self.writes[0])
+            assert self.acceptor.received == received + 4
+            acks = [cli.recv_fix() for _ in msgs]
+            assert all(b'\x0135=8\x01' in ack for ack in acks)
+            assert cli.send_batch([]) == 0
+
+    def test_pooled_new_msg_kwargs(self):
+        order = OrderedDict([(38, b'100'), (40, b'2'), (44, b'10'),
+                             (54, b'1'), (55, b'5'), (59, b'0')])
+        m = self.cli.new_msg(fix.NewOrderMessage, order, seq=False,
+                             pooled=True, validation='none')
+        assert m.validation == fix.ValidationLevel.NONE
+        m._pool.release(m)
+        # same kwargs, or none, get the same pool
+        m = self.cli.new_msg(fix.NewOrderMessage, order, seq=False,
+                             pooled=True, validation=fix.ValidationLevel.NONE)
+        m._pool.release(m)
+        m = self.cli.new_msg(fix.NewOrderMessage, order, seq=False,
+                             pooled=True)
+        m._pool.release(m)
+        assert_raises(ValueError, self.cli.new_msg, fix.NewOrderMessage,
+                      order, seq=False, pooled=True, validation='full')
+        assert_raises(ValueError, self.cli.new_msg, fix.NewOrderMessage,
+                      order, seq=False, pooled=True, reset_ht=False)
+
+
+class TestSocketTransports():
+
+    def test_unix(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'fix.sock')
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(path)
+            server.listen(1)
+            t = UnixTransport(path)
+            t.connect()
+            conn, _ = server.accept()
+            t.sendall(b'abc')
+            assert conn.recv(10) == b'abc'
+            conn.sendall(b'def')
+            assert t.recv(10) == b'def'
+            t.close()
+            conn.close()
+            server.close()
+
+    def test_unix_busy_spin(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'fix.sock')
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(path)
+            server.listen(1)
+            t = UnixTransport(path, profile=SocketProfile(
+                busy_spin=True, rcvbuf=65536))
+            t.connect()
+            conn, _ = server.accept()
+            assert not t.sock.getblocking()
+            t.settimeout(0.01)
+            assert_raises(socket.timeout, t.recv, 10)
+            conn.sendall(b'def')
+            assert t.recv(10) == b'def'
+            t.sendall(b'x' * 100000)
+            received = b''
+            while len(received) < 100000:
+                received += conn.recv(100000)
+            t.close()
+            conn.close()
+            server.close()
+
+    def test_tcp_low_latency(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        t = TcpTransport(*server.getsockname(),
+                         profile=SocketProfile.low_latency(sndbuf=65536))
+        t.connect()
+        conn, _ = server.accept()
+        assert t.sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        conn.sendall(b'ack')
+        assert t.recv(10) == b'ack'
+        t.close()
+        conn.close()
+        server.close()
+
+    def test_profile_from_config(self):
+        config = configparser.ConfigParser()
+        config.read_string('[DEFAULT]\nTCPNoDelay=1\n'
+                           '[d]\n'
+                           '[l]\nSocketProfile=low_latency\nBusySpin=0\n'
+                           'SoRcvBuf=1024\nCpuAffinity=0,1\n'
+                           '[x]\nSocketProfile=fast\n')
+        d = SocketProfile.from_config(config['d'])
+        assert d.nodelay and not d.busy_spin and not d.quickack
+        low = SocketProfile.from_config(config['l'])
+        assert low.quickack and low.busy_poll == 50
+        assert not low.busy_spin
+        assert low.rcvbuf == 1024
+        assert low.cpu_affinity == {0, 1}
+        assert_raises(ValueError, SocketProfile.from_config, config['x'])
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        config.read_string('[t]\nOMSIP=127.0.0.1\nOMSPort=9\n'
+                           '[u]\nTransport=unix\nUnixPath=/tmp/x.sock\n'
+                           '[v]\nTransport=udp\n')
+        t = transport_from_config(config['t'])
+        assert isinstance(t, TcpTransport)
+        assert t.address == ('127.0.0.1', 9)
+        assert transport_from_config(config['u']).address == '/tmp/x.sock'
+        assert_raises(ValueError, transport_from_config, config['v'])